@@ -0,0 +1,2 @@
+from .actuation import ActuationDynamics
+from .torque import TorqueActionController, load_muscle_params
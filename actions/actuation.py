@@ -0,0 +1,70 @@
+# actions/actuation.py
+#
+# 空気圧バルブの遅れ（むだ時間）と、筋肉内の圧力が一次遅れで上がっていく様子を
+# 全環境まとめて計算するステージ。TorqueActionController の「指令圧力 → 実際の圧力」の間に入る。
+#   - 環境ごとのリングバッファ (num_envs, history, 3) に指令圧力を貯め、筋肉ごとの遅れ分だけ前の値を読む
+#   - 一次遅れ  p += (p_delayed - p) * (1 - exp(-dt / tau))
+# 遅れ（ティック数）と時定数は環境ごと・筋肉 (DF / F / G) ごとに変えられます。
+# 1ティック = step() 1回（コントローラの compute() 1回）です。
+
+import torch
+
+
+class ActuationDynamics:
+    """むだ時間 + 一次遅れ の圧力ダイナミクス"""
+
+    def __init__(self, dt, history=8, delay_ticks=(2, 2, 2), tau=(0.05, 0.05, 0.05)):
+        self.dt = dt
+        self.history = history
+        self.delay_ticks = delay_ticks  # 筋肉ごとの遅れ [ティック]
+        self.tau = tau                  # 筋肉ごとの時定数 [s]
+        self.num_envs = 0
+        self._head = 0
+
+    def allocate(self, n_envs, device):
+        """全環境分のバッファを確保する"""
+        self.num_envs = n_envs
+        self.device = torch.device(device)
+        self.buffer = torch.zeros((n_envs, self.history, 3), device=self.device)  # 指令圧力の履歴
+        self.pressure = torch.zeros((n_envs, 3), device=self.device)              # 実際の圧力
+        self.delay = torch.zeros((n_envs, 3), dtype=torch.long, device=self.device)
+        self.alpha = torch.zeros((n_envs, 3), device=self.device)
+        self._idx = torch.zeros((n_envs, 1, 3), dtype=torch.long, device=self.device)
+        self._delayed = torch.zeros((n_envs, 1, 3), device=self.device)
+        self.set_params(delay_ticks=self.delay_ticks, tau=self.tau)
+
+    def set_params(self, delay_ticks=None, tau=None, env_ids=None):
+        """遅れと時定数を書き換える（(3,) で全環境共通、(len(env_ids), 3) で環境ごと）"""
+        rows = slice(None) if env_ids is None else env_ids
+        if delay_ticks is not None:
+            delay = torch.as_tensor(delay_ticks, device=self.device)
+            self.delay[rows] = delay.round().clamp_(0, self.history - 1).long()
+        if tau is not None:
+            tau = torch.as_tensor(tau, dtype=torch.float32, device=self.device)
+            # alpha = 1 - exp(-dt / tau)。tau = 0 なら遅れ無し（alpha = 1）。作業用のテンソルはその場で使い回す
+            self.alpha[rows] = tau.clamp(min=1e-9).reciprocal_().mul_(-self.dt).expm1_().neg_()
+
+    def step(self, command):
+        """指令圧力 (num_envs, 3) を1ティック分進め、実際の圧力を command にその場で書き戻す"""
+        self.buffer[:, self._head].copy_(command)
+        # 遅れ分だけ前の指令を読む  index = (head - delay) mod history
+        # remainder は整数の割り算で遅く、遅れが環境ごとにばらばらだとさらに遅くなるので、負の分だけ1周足す
+        torch.sub(self._head, self.delay, out=self._idx[:, 0])
+        self._idx.add_(self._idx < 0, alpha=self.history)
+        torch.gather(self.buffer, 1, self._idx, out=self._delayed)
+        self.pressure.lerp_(self._delayed[:, 0], self.alpha)
+        self._head = (self._head + 1) % self.history
+        command.copy_(self.pressure)
+        return command
+
+    def reset(self, env_ids=None):
+        """指定した環境の圧力の履歴と実際の圧力をゼロに戻す"""
+        if env_ids is not None:
+            env_ids = torch.as_tensor(env_ids, device=self.device)
+        for buf in (self.buffer, self.pressure):
+            if env_ids is None:
+                buf.zero_()
+            elif env_ids.dtype == torch.bool:
+                buf.masked_fill_(env_ids.view(-1, *([1] * (buf.dim() - 1))), 0.0)
+            else:
+                buf.index_fill_(0, env_ids, 0.0)
@@ -0,0 +1,120 @@
+# actions/fused.py
+#
+# 推論専用の高速経路。_pre_physics_step のクリップから TorqueActionController の
+# 圧力 → 張力 → トルクの計算までを1つの関数にまとめ、TorchScript（または torch.compile）で
+# 1つのグラフとして実行します。結果は事前に確保した出力バッファに書き込みます。
+# コントローラに圧力の遅れ (actuation) があれば、遅れの計算も同じグラフに入れます。
+# 実機で1環境ずつ動かすとき（バッチサイズ1）の遅延を小さくするためのものです。
+
+import torch
+
+from .torque import TorqueActionController
+
+COMPILE_RTOL = 1e-6  # "compile" と compute() のトルクの差の上限（トルクの最大値に対する比）
+
+
+def _command_pressure(actions, Pmax):
+    """アクション -> 指令圧力"""
+    pressure = torch.clamp(actions[:, :3], -1.0, 1.0)
+    return (pressure + 1.0) * 0.5 * Pmax
+
+
+def _torque(pressure, q_wrist, q_grip, r, L, area: float, a: float, b: float,
+            max_stretch: float, max_contraction: float):
+    """圧力 -> 張力 -> トルク"""
+    # 関節角度 -> 収縮率 [DF, F, G]
+    contraction = torch.stack((q_wrist, -q_wrist, q_grip), dim=1)
+    contraction = contraction * r / L
+    contraction = torch.clamp(contraction, -max_stretch, max_contraction)
+    # 収縮率 -> 張力
+    force = torch.square(1.0 - contraction) * a - b
+    force = torch.clamp(force * pressure * area, min=0.0)
+    # 張力 -> トルク [手首, 握り]
+    wrist = (force[:, 0] - force[:, 1]) * r[:, 0]
+    grip = force[:, 2] * r[:, 0]
+    return torch.stack((wrist, grip), dim=1)
+
+
+def fused_torque(actions, q_wrist, q_grip, r, L, Pmax, area: float, a: float, b: float,
+                 max_stretch: float, max_contraction: float):
+    """TorqueActionController.compute と同じ計算を、同じ順番の演算で行う"""
+    pressure = _command_pressure(actions, Pmax)
+    return _torque(pressure, q_wrist, q_grip, r, L, area, a, b, max_stretch, max_contraction)
+
+
+def fused_torque_actuated(actions, q_wrist, q_grip, r, L, Pmax, buffer, pressure, delay, alpha, head,
+                          area: float, a: float, b: float, max_stretch: float, max_contraction: float):
+    """圧力の遅れ (ActuationDynamics.step) も含めた compute と同じ計算
+
+    遅れの状態は引数で受け取り、(トルク, 指令圧力, 実際の圧力) を返す。関数の中では状態を書き換えないので、
+    指令を buffer[:, head] に書き込んで head を進めるのは呼び出し側で行う。
+    head: 0次元の long テンソル（int で渡すと torch.compile が head の値ごとにコンパイルし直すため）
+    """
+    command = _command_pressure(actions, Pmax)
+    # 遅れ分だけ前の指令を読む  index = (head - delay) mod history。遅れ0なら今の指令
+    index = head - delay
+    index = index + (index < 0).long() * buffer.shape[1]
+    delayed = torch.gather(buffer, 1, index[:, None, :])[:, 0]
+    delayed = torch.where(delay == 0, command, delayed)
+    actual = torch.lerp(pressure, delayed, alpha)
+    torque = _torque(actual, q_wrist, q_grip, r, L, area, a, b, max_stretch, max_contraction)
+    return torque, command, actual
+
+
+class FusedTorquePath:
+    """TorqueActionController のパラメータを使って、1回の呼び出しでトルクを計算するクラス
+
+    backend: "compile"（torch.compile、既定）/ "script"（TorchScript）/ "eager"（比較用）
+
+    "eager" と "script" は compute() とビット単位で同じ結果になる。"compile" は演算をまとめて
+    1つのカーネルにするので、GPUでは乗算と加算が FMA になって最後の桁が変わることがある。
+    許容誤差は COMPILE_RTOL（トルクの最大値に対する相対誤差）で、tests/test_fused.py で確かめている。
+    """
+
+    def __init__(self, controller: TorqueActionController, joint_ids, backend="compile"):
+        self.controller = controller
+        self.wrist_id, self.grip_id = joint_ids
+        self.backend = backend
+        fn = fused_torque if controller.actuation is None else fused_torque_actuated
+        if backend == "script":
+            self._fn = torch.jit.script(fn)
+        elif backend == "compile":
+            self._fn = torch.compile(fn, dynamic=False)
+        elif backend == "eager":
+            self._fn = fn
+        else:
+            raise ValueError(f"不明なバックエンドです: {backend}")
+        # 出力バッファ（controller.torque とは別に持ち、呼び出し側が使い回せるようにする）
+        self.out = torch.zeros_like(controller.torque)
+        self._head = torch.zeros((), dtype=torch.long, device=controller.device)
+
+    @torch.inference_mode()
+    def __call__(self, actions, q):
+        c = self.controller
+        if c.actuation is None:
+            torque = self._fn(
+                actions, q[:, self.wrist_id], q[:, self.grip_id],
+                c.r_buf, c.L_buf, c.Pmax_buf, c._area, c._a, c._b, c.max_stretch, c.max_contraction,
+            )
+        else:
+            act = c.actuation
+            self._head.fill_(act._head)
+            torque, command, actual = self._fn(
+                actions, q[:, self.wrist_id], q[:, self.grip_id], c.r_buf, c.L_buf, c.Pmax_buf,
+                act.buffer, act.pressure, act.delay, act.alpha, self._head,
+                c._area, c._a, c._b, c.max_stretch, c.max_contraction,
+            )
+            # 遅れの状態を ActuationDynamics.step() と同じように進める
+            act.buffer[:, act._head].copy_(command)
+            act.pressure.copy_(actual)
+            act._head = (act._head + 1) % act.history
+            c.pressure_cmd.copy_(command)
+            c.pressure.copy_(actual)
+        self.out.copy_(torque)
+        return self.out
+
+    def apply(self, actions, q, robot):
+        """トルクを計算してロボットの関節に設定する（TorqueActionController.apply と同じ使い方）"""
+        torque = self(actions, q)
+        robot.set_joint_effort_target(torque, joint_ids=[self.wrist_id, self.grip_id])
+        return torque
@@ -0,0 +1,160 @@
+# actions/torque.py
+#
+# 空気圧人工筋（McKibben型）3本 DF（背屈）/ F（屈曲）/ G（握り）の
+# 圧力 → 張力 → 関節トルク を全環境まとめて計算するコントローラ。
+# Pythonのループを使わず、バッファは allocate() で確保したものを使い回します。
+
+import json
+import math
+from pathlib import Path
+
+import torch
+
+# 筋肉の並び順（アクション・圧力・張力の列の順番）
+DF, F, G = 0, 1, 2
+NUM_MUSCLES = 3
+
+# 筋肉パラメータの既定値。sysid.py で同定した値があれば muscle_params.json で上書きされる
+DEFAULT_MUSCLE_PARAMS = {"r": 0.014, "L": 0.150, "Pmax": 0.6, "damping": 0.02}
+MUSCLE_PARAMS_PATH = Path(__file__).resolve().parents[1] / "muscle_params.json"
+
+
+def load_muscle_params(path=MUSCLE_PARAMS_PATH):
+    """muscle_params.json があれば読み込み、既定値に上書きした辞書を返す"""
+    params = dict(DEFAULT_MUSCLE_PARAMS)
+    path = Path(path)
+    if path.exists():
+        with open(path) as f:
+            fitted = json.load(f)
+        params.update({k: float(v) for k, v in fitted.items() if k in DEFAULT_MUSCLE_PARAMS})
+    return params
+
+
+class TorqueActionController:
+    """アクション[-1, 1]を筋肉の圧力に変換し、手首と握りのトルクを計算するクラス"""
+
+    def __init__(self, dt_ctrl, r=0.014, L=0.150, Pmax=0.6, D0=0.01, theta0_deg=25.0, max_stretch=0.1,
+                 actuation=None, num_envs=None, device="cpu"):
+        self.dt_ctrl = dt_ctrl
+        # r: モーメントアーム[m], L: 筋肉の自然長[m], Pmax: 最大圧力[MPa]
+        # 環境ごとに変えたい場合は allocate() の後に set_params() で上書きする
+        self.r = r
+        self.L = L
+        self.Pmax = Pmax
+
+        # Chou-Hannafordモデル F = P*A0*(a*(1-ε)^2 - b) の定数
+        theta0 = math.radians(theta0_deg)
+        self._area = math.pi * D0 ** 2 / 4.0 * 1.0e6  # MPa -> N に換算するため 1e6 を掛けておく
+        self._a = 3.0 / math.tan(theta0) ** 2
+        self._b = 1.0 / math.sin(theta0) ** 2
+        self.max_contraction = 1.0 - math.sqrt(self._b / self._a)  # 張力が0になる収縮率
+        self.max_stretch = max_stretch
+        # 指令圧力から実際の圧力までの遅れ（actions/actuation.py）。None なら指令がすぐ効く
+        self.actuation = actuation
+
+        self.num_envs = 0
+        self.device = None
+        if num_envs is not None:
+            self.allocate(num_envs, device)
+
+    def allocate(self, n_envs, device):
+        """全環境分のバッファを確保する（起動時に一度だけ呼ぶ）"""
+        self.num_envs = n_envs
+        self.device = torch.device(device)
+
+        # --- 1. 環境ごとのパラメータ (n_envs, 1) ---
+        self.r_buf = torch.full((n_envs, 1), float(self.r), device=self.device)
+        self.L_buf = torch.full((n_envs, 1), float(self.L), device=self.device)
+        self.Pmax_buf = torch.full((n_envs, 1), float(self.Pmax), device=self.device)
+
+        # --- 2. 毎ステップ上書きする作業用バッファ ---
+        self.pressure_cmd = torch.zeros((n_envs, NUM_MUSCLES), device=self.device)  # 指令圧力 [MPa]
+        self.pressure = torch.zeros((n_envs, NUM_MUSCLES), device=self.device)      # 実際の圧力 [MPa]
+        self.contraction = torch.zeros((n_envs, NUM_MUSCLES), device=self.device)  # 収縮率ε
+        self.force = torch.zeros((n_envs, NUM_MUSCLES), device=self.device)        # 張力[N]
+        self.torque = torch.zeros((n_envs, 2), device=self.device)                 # [手首, 握り] [Nm]
+        if self.actuation is not None:
+            self.actuation.allocate(n_envs, self.device)
+
+    def reset(self, env_ids=None):
+        """指定した環境の内部状態だけをその場でゼロに戻す（形状は変えず、確保もしない）
+
+        env_ids: 環境IDのテンソル・リスト、(num_envs,) のboolマスク、または None（全環境）
+        """
+        if env_ids is not None:
+            env_ids = torch.as_tensor(env_ids, device=self.device)
+        for buf in (self.pressure_cmd, self.pressure, self.contraction, self.force, self.torque):
+            if env_ids is None:
+                buf.zero_()
+            elif env_ids.dtype == torch.bool:
+                buf.masked_fill_(env_ids[:, None], 0.0)
+            else:
+                buf.index_fill_(0, env_ids, 0.0)
+        if self.actuation is not None:
+            self.actuation.reset(env_ids)
+
+    def set_params(self, r=None, L=None, Pmax=None, env_ids=None):
+        """筋肉パラメータをその場で書き換える（スカラー or 環境ごとのテンソル）"""
+        for value, buf in ((r, self.r_buf), (L, self.L_buf), (Pmax, self.Pmax_buf)):
+            if value is None:
+                continue
+            if not torch.is_tensor(value):
+                value = torch.tensor(float(value), device=self.device)
+            value = value.to(device=self.device, dtype=buf.dtype).reshape(-1, 1)
+            if env_ids is None:
+                buf.copy_(value.expand_as(buf))
+            else:
+                buf[env_ids] = value
+
+    def bind_params(self, r, L, Pmax):
+        """r_buf / L_buf / Pmax_buf を外の (num_envs, 1) のテンソル（ランダム化の表の列など）に置き換える
+
+        以降はそのテンソルを直接読むので、外で値を書き換えれば set_params() を呼ばなくてもそのまま効く。
+        """
+        for value, buf in ((r, self.r_buf), (L, self.L_buf), (Pmax, self.Pmax_buf)):
+            if value.shape != buf.shape or value.device != buf.device or value.dtype != buf.dtype:
+                raise ValueError(f"{tuple(buf.shape)} で {buf.dtype}・{buf.device} のテンソルが必要です: "
+                                 f"{tuple(value.shape)} {value.dtype}・{value.device}")
+        self.r_buf, self.L_buf, self.Pmax_buf = r, L, Pmax
+
+    def compute(self, actions, q, joint_ids):
+        """全環境の圧力・張力・トルクを一度に計算して self.torque を返す"""
+        wrist_id, grip_id = joint_ids
+
+        # --- 1. アクション -> 圧力  P = (a + 1) * 0.5 * Pmax ---
+        torch.clamp(actions[:, :NUM_MUSCLES], -1.0, 1.0, out=self.pressure_cmd)
+        self.pressure_cmd.add_(1.0).mul_(0.5).mul_(self.Pmax_buf)
+        # 指令圧力は pressure_cmd に残しておく（テレメトリの記録と sysid.py で使う）
+        self.pressure.copy_(self.pressure_cmd)
+        if self.actuation is not None:
+            # バルブの遅れと圧力の立ち上がりを通した、実際の圧力に置き換える
+            self.actuation.step(self.pressure)
+
+        # --- 2. 関節角度 -> 筋肉の収縮率  ε = r * q / L ---
+        # DFは手首が正に回ると縮み、Fは逆に伸びる
+        self.contraction[:, DF].copy_(q[:, wrist_id])
+        torch.neg(q[:, wrist_id], out=self.contraction[:, F])
+        self.contraction[:, G].copy_(q[:, grip_id])
+        self.contraction.mul_(self.r_buf).div_(self.L_buf)
+        self.contraction.clamp_(-self.max_stretch, self.max_contraction)
+
+        # --- 3. 収縮率に依存する張力  F = P * A0 * (a*(1-ε)^2 - b) ---
+        torch.sub(1.0, self.contraction, out=self.force)
+        self.force.square_().mul_(self._a).sub_(self._b)
+        self.force.mul_(self.pressure).mul_(self._area)
+        self.force.clamp_(min=0.0)  # 筋肉は引っ張る力しか出せない
+
+        # --- 4. 張力 -> 関節トルク ---
+        torch.sub(self.force[:, DF], self.force[:, F], out=self.torque[:, 0])
+        torch.mul(self.force[:, G], self.r_buf[:, 0], out=self.torque[:, 1])
+        self.torque[:, 0].mul_(self.r_buf[:, 0])
+        return self.torque
+
+    def apply(self, actions, q, robot, joint_ids):
+        """トルクを計算してロボットの関節に設定する"""
+        if self.num_envs == 0:
+            self.allocate(actions.shape[0], actions.device)
+
+        torque = self.compute(actions, q, joint_ids)
+        robot.set_joint_effort_target(torque, joint_ids=list(joint_ids))
+        return torque
@@ -0,0 +1,334 @@
+# asset_cache.py
+#
+# porcaro.usd / sneadrum.usd / sneadrumstand.usd を前もって1つずつのUSDに平坦化（flatten）して
+# キャッシュしておくツール。ドラムは StandArm_link の子として、ドラムスタンドのUSDに焼き込みます。
+#   - キャッシュは元のUSD（参照しているレイヤーやテクスチャも含む）の内容のハッシュで管理し、
+#     元のファイルが変わったときだけ作り直す
+#   - マニフェストにはファイルごとの (mtime_ns, サイズ) も残し、これが変わったファイルだけハッシュを計算し直す
+#     （起動のたびに全ファイルを読み直さない）
+#   - env_cfg.py は cached_assets() で最新のキャッシュがあればそちらを読み込む
+#   - USDの読み書きは pxr (usd-core) だけで行うので、Isaac Sim が無いCPUマシンでも動く
+#
+# 使い方:
+#   python asset_cache.py                    # 必要ならキャッシュを作り直す
+#   python asset_cache.py --force            # 必ず作り直す
+#   python asset_cache.py --bench 1 64 1024  # 元のUSDとキャッシュで、スポーン（クローン）の時間を比べる
+
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ASSETS_DIR = Path(__file__).resolve().parents[2] / "assets"  # env_cfg.py と同じ場所
+SOURCES = {
+    "robot": "porcaro.usd",
+    "drum": "sneadrum.usd",
+    "drum_stand": "sneadrumstand.usd",
+}
+CACHE_DIRNAME = ".baked"
+MANIFEST = "manifest.json"
+
+# ドラムを取り付けるリンクと、そのリンクから見たドラムの位置（env_cfg.py の DRUM_CFG と同じ）
+DRUM_PARENT_LINK = "StandArm_link"
+DRUM_PRIM_NAME = "Drum"
+DRUM_LOCAL_POS = (0.0, 0.0, 0.1)
+
+# 焼き方を変えたときはこの番号を上げて、古いキャッシュを使わないようにする
+# 2: ドラムのUSDのルートが持つ変換を捨てずに、取り付け位置と合成する
+BAKE_VERSION = 2
+
+
+# --- 1. 内容のハッシュ ---
+def _file_hash(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _stamp(path):
+    """内容が変わったかを安く調べるための [mtime_ns, サイズ]（JSONと比べるのでリストで返す）"""
+    st = os.stat(path)
+    return [st.st_mtime_ns, st.st_size]
+
+
+def _dependencies(usd_path):
+    """USDが読み込む全てのファイル（サブレイヤー・参照・テクスチャなど）"""
+    from pxr import UsdUtils
+    layers, assets, _unresolved = UsdUtils.ComputeAllDependencies(str(usd_path))
+    files = {os.path.abspath(layer.realPath) for layer in layers if layer.realPath}
+    files |= {os.path.abspath(a) for a in assets}
+    return sorted(files)
+
+
+def _combined_hash(file_hashes):
+    """ファイルごとのハッシュと焼き方の設定から、キャッシュ全体のキーを作る"""
+    h = hashlib.sha256()
+    h.update(json.dumps([BAKE_VERSION, DRUM_PARENT_LINK, DRUM_LOCAL_POS]).encode())
+    for path in sorted(file_hashes):
+        h.update(path.encode())
+        h.update(file_hashes[path].encode())
+    return h.hexdigest()
+
+
+# --- 2. キャッシュの確認（pxr を使わないので env_cfg.py から毎回呼んでも軽い） ---
+def cached_assets(assets_dir=ASSETS_DIR):
+    """最新のキャッシュがあれば {"robot": パス, "drum_stand": パス, "drum_prim": リンク下のパス} を返す"""
+    cache_dir = Path(assets_dir) / CACHE_DIRNAME
+    try:
+        with open(cache_dir / MANIFEST) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("version") != BAKE_VERSION:
+        return None
+    stamps = manifest.setdefault("stamps", {})
+    restamped = False
+    for path, digest in manifest["files"].items():
+        try:
+            stamp = _stamp(path)
+        except OSError:
+            return None
+        if stamps.get(path) == stamp:
+            continue
+        # mtime かサイズが変わったファイルだけ中身を読んで確かめる
+        if _file_hash(path) != digest:
+            return None
+        stamps[path] = stamp  # 中身は同じ（touch されただけなど）。次からはハッシュを計算しない
+        restamped = True
+    outputs = {name: str(cache_dir / file) for name, file in manifest["outputs"].items()}
+    if not all(os.path.isfile(p) for p in outputs.values()):
+        return None
+    if restamped:
+        try:
+            _write_manifest(cache_dir, manifest)
+        except OSError:
+            pass  # 書き込めない場所でもキャッシュは使える（次もハッシュを計算するだけ）
+    outputs["drum_prim"] = manifest["drum_prim"]
+    return outputs
+
+
+def _write_manifest(cache_dir, manifest):
+    # 書きかけのマニフェストを読まれないように、一時ファイルに書いてから置き換える
+    with open(Path(cache_dir) / (MANIFEST + ".tmp"), "w") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(Path(cache_dir) / (MANIFEST + ".tmp"), Path(cache_dir) / MANIFEST)
+
+
+# --- 3. 焼き込み ---
+def find_prim(stage, name):
+    """名前が name の最初のプリム（見つからなければ None）"""
+    for prim in stage.Traverse():
+        if prim.GetName() == name:
+            return prim
+    return None
+
+
+def drum_root_transform(drum_usd):
+    """ドラムのUSDのルート（デフォルトプリム）自身の変換 (Gf.Matrix4d)"""
+    from pxr import Usd, UsdGeom
+    stage = Usd.Stage.Open(str(drum_usd))  # プリムを使い終わるまでステージを開いておく
+    return UsdGeom.Xformable(stage.GetDefaultPrim()).GetLocalTransformation()
+
+
+def drum_mount_transform(drum_usd):
+    """リンクから見たドラムの変換。ドラムのルート自身の変換のあとに DRUM_LOCAL_POS だけ動かす
+
+    USDの行列は行ベクトルに右から掛けるので、先に効く変換が左に来る。
+    """
+    from pxr import Gf
+    return drum_root_transform(drum_usd) * Gf.Matrix4d().SetTranslate(Gf.Vec3d(*DRUM_LOCAL_POS))
+
+
+def add_drum(stage, link, drum_usd):
+    """link の下にドラムを参照で追加し、取り付け位置を書き込む
+
+    参照したルートの xformOp はそのままだと取り付け位置で上書きされて消えるので、
+    ルート自身の変換と取り付け位置を合成した1つの行列にして書き込む。
+    """
+    from pxr import UsdGeom
+    drum = UsdGeom.Xform.Define(stage, link.GetPath().AppendChild(DRUM_PRIM_NAME))
+    drum.GetPrim().GetReferences().AddReference(str(drum_usd))
+    drum.ClearXformOpOrder()
+    # 参照先の xformOp:translate などと名前が重ならないよう、接尾辞を付けた op にする
+    drum.AddTransformOp(opSuffix="mount").Set(drum_mount_transform(drum_usd))
+    return drum
+
+
+def bake_drum_stand(stand_usd, drum_usd, out_path):
+    """ドラムスタンドの StandArm_link の下にドラムを参照で追加し、1つのレイヤーに平坦化して保存する"""
+    from pxr import Usd
+
+    stage = Usd.Stage.Open(str(stand_usd))
+    link = find_prim(stage, DRUM_PARENT_LINK)
+    if link is None:
+        raise ValueError(f"{stand_usd} に {DRUM_PARENT_LINK} がありません")
+    drum = add_drum(stage, link, drum_usd)
+    stage.Flatten().Export(str(out_path))
+
+    # スタンドのルートから見たドラムのパス（env_cfg.py の prim_path に使う）
+    root = stage.GetDefaultPrim()
+    return str(drum.GetPath())[len(str(root.GetPath())) + 1:]
+
+
+def flatten(usd_path, out_path):
+    """参照やサブレイヤーを全て展開した1つのレイヤーとして保存する"""
+    from pxr import Usd
+    Usd.Stage.Open(str(usd_path)).Flatten().Export(str(out_path))
+
+
+def build_cache(assets_dir=ASSETS_DIR, force=False):
+    """キャッシュが古ければ作り直し、cached_assets() と同じ辞書を返す"""
+    assets_dir = Path(assets_dir)
+    if not force:
+        cached = cached_assets(assets_dir)
+        if cached is not None:
+            return cached
+
+    # --- 3-1. 元のUSDと、それが読み込む全ファイルのハッシュ ---
+    sources = {name: assets_dir / file for name, file in SOURCES.items()}
+    file_hashes, stamps = {}, {}
+    for path in sources.values():
+        for dep in _dependencies(path):
+            stamps[dep] = _stamp(dep)  # ハッシュより先に取る（読んでいる間に書き換えられたら次回に気づける）
+            file_hashes[dep] = _file_hash(dep)
+    key = _combined_hash(file_hashes)[:16]
+
+    # --- 3-2. 平坦化して保存（古いキャッシュは消す） ---
+    cache_dir = assets_dir / CACHE_DIRNAME
+    cache_dir.mkdir(exist_ok=True)
+    for old in cache_dir.glob("*.usd"):
+        old.unlink()
+    outputs = {
+        "robot": f"{Path(SOURCES['robot']).stem}_{key}.usd",
+        "drum_stand": f"{Path(SOURCES['drum_stand']).stem}_{key}.usd",
+    }
+    flatten(sources["robot"], cache_dir / outputs["robot"])
+    drum_prim = bake_drum_stand(sources["drum_stand"], sources["drum"], cache_dir / outputs["drum_stand"])
+
+    # マニフェストは最後に書く（途中で止まっても、古い・壊れたキャッシュを使わないように）
+    manifest = {"version": BAKE_VERSION, "key": key, "files": file_hashes, "stamps": stamps,
+                "outputs": outputs, "drum_prim": drum_prim}
+    _write_manifest(cache_dir, manifest)
+    return cached_assets(assets_dir)
+
+
+# --- 4. 形状の確認 ---
+def check_drum_placement(baked_stand_usd, drum_usd=None, tol=1e-6):
+    """焼いたUSDでドラムが StandArm_link から DRUM_LOCAL_POS の位置にあるか確かめ、ずれ [m] を返す
+
+    drum_usd を渡すと、ドラムのルート自身の変換（位置と向き）も残っているかを確かめる。
+    ずれはドラムの原点と、そこから各軸に1 m の点の位置の差のうち最大のもの。
+    """
+    from pxr import Gf, Usd, UsdGeom
+    stage = Usd.Stage.Open(str(baked_stand_usd))
+    link = find_prim(stage, DRUM_PARENT_LINK)
+    drum = stage.GetPrimAtPath(link.GetPath().AppendChild(DRUM_PRIM_NAME))
+    if not drum.IsValid():
+        raise ValueError(f"{baked_stand_usd} に焼き込まれたドラムがありません")
+    cache = UsdGeom.XformCache(Usd.TimeCode.Default())
+    if drum_usd is None:
+        mount = Gf.Matrix4d().SetTranslate(Gf.Vec3d(*DRUM_LOCAL_POS))
+        points = [Gf.Vec3d(0.0)]
+    else:
+        mount = drum_mount_transform(drum_usd)
+        points = [Gf.Vec3d(0.0), Gf.Vec3d(1, 0, 0), Gf.Vec3d(0, 1, 0), Gf.Vec3d(0, 0, 1)]
+    expected = mount * cache.GetLocalToWorldTransform(link)
+    actual = cache.GetLocalToWorldTransform(drum)
+    error = max((actual.Transform(p) - expected.Transform(p)).GetLength() for p in points)
+    if error > tol:
+        raise ValueError(f"ドラムの位置が {error:.6f} m ずれています")
+    return error
+
+
+# --- 5. スポーン時間のベンチマーク ---
+def spawn_scene(robot_usd, stand_usd, drum_usd, num_envs):
+    """Isaac Lab と同じく env_0 を組み立ててから Sdf.CopySpec で複製し、全プリムを合成する。(かかった時間 [s], プリム数) を返す"""
+    from pxr import Sdf, Usd, UsdGeom
+
+    t0 = time.perf_counter()
+    stage = Usd.Stage.CreateInMemory()
+    env0 = "/World/envs/env_0"
+    UsdGeom.Xform.Define(stage, env0)
+    stage.DefinePrim(env0 + "/Robot").GetReferences().AddReference(str(robot_usd))
+    stand = stage.DefinePrim(env0 + "/DrumStand")
+    stand.GetReferences().AddReference(str(stand_usd))
+    if drum_usd is not None:
+        # キャッシュが無いときは、起動のたびにドラムをリンクの下へ組み込む
+        add_drum(stage, find_prim(stage, DRUM_PARENT_LINK), drum_usd)
+
+    layer = stage.GetRootLayer()
+    with Sdf.ChangeBlock():
+        for i in range(1, num_envs):
+            Sdf.CreatePrimInLayer(layer, f"/World/envs/env_{i}")
+            Sdf.CopySpec(layer, env0, layer, f"/World/envs/env_{i}")
+    count = sum(1 for _ in stage.Traverse())
+    return time.perf_counter() - t0, count
+
+
+def _spawn_once(mode, num_envs, assets_dir):
+    """別プロセスで1回だけスポーンする（レイヤーのキャッシュが残らないように）"""
+    out = subprocess.check_output(
+        [sys.executable, __file__, "--_spawn_once", mode, str(num_envs), "--assets_dir", str(assets_dir)], text=True,
+    )
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def bench(num_envs_list, assets_dir=ASSETS_DIR, repeats=3):
+    """元のUSDから組み立てる場合と、キャッシュを読む場合のスポーン時間を比べる"""
+    t0 = time.perf_counter()
+    build_cache(assets_dir, force=True)
+    print(f"bake: {time.perf_counter() - t0:.3f} s")
+    results = []
+    for n in num_envs_list:
+        row = {"num_envs": n}
+        for mode in ("cold", "cached"):
+            runs = [_spawn_once(mode, n, assets_dir) for _ in range(repeats)]
+            row[mode + "_s"] = min(r["seconds"] for r in runs)
+            row["prims"] = runs[0]["prims"]
+        row["speedup"] = row["cold_s"] / row["cached_s"]
+        results.append(row)
+        print(f"num_envs={n:6d} | cold {row['cold_s']:.3f} s | cached {row['cached_s']:.3f} s | "
+              f"x{row['speedup']:.2f} | {row['prims']} prims")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Flatten and cache the Porcaro USD assets.")
+    parser.add_argument("--assets_dir", default=str(ASSETS_DIR))
+    parser.add_argument("--force", action="store_true", help="Rebuild even if the cache is up to date.")
+    parser.add_argument("--bench", type=int, nargs="*", default=None, metavar="NUM_ENVS",
+                        help="Compare cold and cached spawn times for these env counts.")
+    parser.add_argument("--_spawn_once", nargs=2, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    assets_dir = Path(args.assets_dir)
+
+    if args._spawn_once is not None:
+        mode, n = args._spawn_once[0], int(args._spawn_once[1])
+        if mode == "cold":
+            seconds, prims = spawn_scene(*(assets_dir / SOURCES[k] for k in ("robot", "drum_stand", "drum")), n)
+        else:
+            cached = cached_assets(assets_dir)
+            seconds, prims = spawn_scene(cached["robot"], cached["drum_stand"], None, n)
+        print(json.dumps({"seconds": seconds, "prims": prims}))
+        return
+
+    if args.bench is not None:
+        bench(args.bench or [1, 64, 1024], assets_dir)
+        return
+
+    t0 = time.perf_counter()
+    cached = build_cache(assets_dir, force=args.force)
+    error = check_drum_placement(cached["drum_stand"], assets_dir / SOURCES["drum"])
+    print(f"robot:      {cached['robot']}")
+    print(f"drum_stand: {cached['drum_stand']} (drum at {cached['drum_prim']}, placement error {error:.2e} m)")
+    print(f"done in {time.perf_counter() - t0:.3f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+# bench_env.py
+#
+# PorcaroRLEnvCfg の _pre_physics_step / _apply_action / _reset_idx の流れを
+# CPU上のサロゲートモデル（surrogate.py）で回し、環境数ごとのスループットを測るベンチマーク。
+# 測る処理は本物の環境と共通の PorcaroTask（porcaro_task.py）なので、Isaac Lab が入っていない
+# CIマシンでも同じコードの速さを比べられます。
+# ピークメモリが前の環境数の結果を引きずらないように、環境数ごとに別プロセスで測ります。
+#
+# 使い方:
+#   python bench_env.py --num_envs 1 64 1024 8192 --steps 500 --out bench_results.json
+
+import argparse
+import json
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+import torch
+
+from surrogate import SurrogateEnv
+
+
+class BenchEnv(SurrogateEnv):
+    """ベンチマーク用の環境。サロゲートモデルの上で env_cfg.py と同じ PorcaroTask の処理を回す"""
+
+    def __init__(self, num_envs, device, episode_length_s=5.0):
+        super().__init__(num_envs, device=device, episode_length_s=episode_length_s)
+        self.reset()
+        # 環境ごとに開始位置をずらして、毎ステップ少しずつリセットが起こるようにする
+        self.episode_length_buf.copy_(torch.arange(num_envs, device=self.device) % self.max_episode_length)
+
+
+def _sync(device):
+    if device.type == "cuda":
+        torch.cuda.synchronize(device)
+
+
+def _peak_rss_mb():
+    # Linuxでは KB 単位。プロセス全体の最大値なので、run_isolated() で環境数ごとに別プロセスにして測る
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def run_case(num_envs, steps, warmup, device):
+    """1つの環境数でベンチマークを実行して結果の辞書を返す"""
+    baseline_rss = _peak_rss_mb()  # torch などを読み込んだだけの分
+    env = BenchEnv(num_envs, device)
+    actions = torch.rand((num_envs, 3), device=device) * 2.0 - 1.0
+    if device.type == "cuda":
+        torch.cuda.reset_peak_memory_stats(device)
+
+    for _ in range(warmup):
+        env.step(actions)
+    _sync(device)
+
+    latencies = torch.empty(steps, dtype=torch.float64)
+    start = time.perf_counter()
+    for i in range(steps):
+        t0 = time.perf_counter()
+        env.step(actions)
+        _sync(device)
+        latencies[i] = time.perf_counter() - t0
+    total = time.perf_counter() - start
+
+    result = {
+        "num_envs": num_envs,
+        "steps": steps,
+        "env_steps_per_sec": num_envs * steps / total,
+        "p50_step_ms": torch.quantile(latencies, 0.50).item() * 1e3,
+        "p99_step_ms": torch.quantile(latencies, 0.99).item() * 1e3,
+        "peak_rss_mb": _peak_rss_mb(),
+        "baseline_rss_mb": baseline_rss,
+    }
+    if device.type == "cuda":
+        result["peak_cuda_mb"] = torch.cuda.max_memory_allocated(device) / 2 ** 20
+    return result
+
+
+def run_isolated(num_envs, steps, warmup, device):
+    """run_case() を新しいプロセスで実行し、その環境数だけのピークメモリを含む結果を返す"""
+    cmd = [sys.executable, __file__, "--case", str(num_envs), "--steps", str(steps),
+           "--warmup", str(warmup), "--device", str(device)]
+    out = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput benchmark for the Porcaro env step path.")
+    parser.add_argument("--num_envs", type=int, nargs="+", default=[1, 64, 1024, 8192])
+    parser.add_argument("--steps", type=int, default=500)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--out", default="bench_results.json", help="Path of the JSON result file.")
+    parser.add_argument("--case", type=int, default=None, help=argparse.SUPPRESS)  # run_isolated() の子プロセス用
+    args = parser.parse_args()
+
+    device = torch.device(args.device)
+    if args.case is not None:
+        print(json.dumps(run_case(args.case, args.steps, args.warmup, device)))
+        return
+
+    results = []
+    for n in args.num_envs:
+        r = run_isolated(n, args.steps, args.warmup, device)
+        results.append(r)
+        print(f"num_envs={n:6d} | {r['env_steps_per_sec']:12.0f} env-steps/s | "
+              f"p50 {r['p50_step_ms']:.3f} ms | p99 {r['p99_step_ms']:.3f} ms | RSS {r['peak_rss_mb']:.0f} MB "
+              f"(+{r['peak_rss_mb'] - r['baseline_rss_mb']:.0f} MB over startup)")
+
+    report = {
+        "commit": _git_commit(),
+        "device": str(device),
+        "torch": torch.__version__,
+        "python": platform.python_version(),
+        "results": results,
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved results to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
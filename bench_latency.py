@@ -0,0 +1,92 @@
+# bench_latency.py
+#
+# 推論時の「方策のアクション → クリップ → 圧力 → トルク」の遅延を測るベンチマーク。
+# 通常の経路（_pre_physics_step のクリップ + TorqueActionController.compute）と、
+# actions/fused.py の1つにまとめた経路を比べ、結果が一致することも確認します。
+# --actuation を付けると、環境と同じく圧力の遅れ (ActuationDynamics) を含めて測ります。
+#
+# 使い方:
+#   python bench_latency.py --num_envs 1 --iters 20000
+
+import argparse
+import time
+
+import torch
+
+from actions.actuation import ActuationDynamics
+from actions.fused import FusedTorquePath
+from actions.torque import TorqueActionController
+
+
+def make_controller(num_envs, actuation=False):
+    """ベンチマーク用のコントローラ（actuation=True なら圧力の遅れを含める）"""
+    dynamics = ActuationDynamics(dt=0.005) if actuation else None
+    return TorqueActionController(dt_ctrl=0.02, actuation=dynamics, num_envs=num_envs)
+
+
+def eager_step(controller, actions, q, joint_ids):
+    """これまでの経路（env_cfg.py の _pre_physics_step と _apply_action と同じ計算）"""
+    clipped = actions.clamp(-1.0, 1.0)
+    return controller.compute(clipped, q, joint_ids)
+
+
+def check_equivalence(num_envs, backend, trials=100, seed=0, actuation=False):
+    """ランダムな入力で通常の経路と一致するか確認する（script/eager はビット単位で一致）"""
+    # 圧力の遅れは状態を持つので、通常の経路と fused は別々のコントローラで動かす
+    reference, controller = make_controller(num_envs, actuation), make_controller(num_envs, actuation)
+    gen = torch.Generator().manual_seed(seed)
+    r = 0.012 + 0.004 * torch.rand(num_envs, generator=gen)
+    Pmax = 0.5 + 0.2 * torch.rand(num_envs, generator=gen)
+    for c in (reference, controller):
+        c.set_params(r=r, Pmax=Pmax)
+    fused = FusedTorquePath(controller, (0, 1), backend=backend)
+    for _ in range(trials):
+        actions = torch.randn((num_envs, 3), generator=gen) * 1.5
+        q = torch.randn((num_envs, 2), generator=gen)
+        expected = eager_step(reference, actions, q, (0, 1)).clone()
+        got = fused(actions, q)
+        if backend == "compile":
+            torch.testing.assert_close(got, expected)
+        elif not torch.equal(got, expected):
+            raise AssertionError(f"{backend}: max diff {(got - expected).abs().max().item()}")
+
+
+def measure(fn, iters, warmup=200):
+    for _ in range(warmup):
+        fn()
+    samples = torch.empty(iters, dtype=torch.float64)
+    for i in range(iters):
+        t0 = time.perf_counter_ns()
+        fn()
+        samples[i] = time.perf_counter_ns() - t0
+    return torch.quantile(samples, 0.5).item() / 1e3, torch.quantile(samples, 0.99).item() / 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency benchmark of the controller inference path.")
+    parser.add_argument("--num_envs", type=int, default=1)
+    parser.add_argument("--iters", type=int, default=20000)
+    parser.add_argument("--backends", nargs="+", default=["eager", "script", "compile"], help="Fused backends to compare.")
+    parser.add_argument("--threads", type=int, default=1, help="torch.set_num_threads (1 is best for batch size 1).")
+    parser.add_argument("--actuation", action="store_true", help="Include the valve delay / pressure lag stage.")
+    args = parser.parse_args()
+
+    torch.set_num_threads(args.threads)
+    n = args.num_envs
+    controller = make_controller(n, args.actuation)
+    actions = torch.rand((n, 3)) * 2.0 - 1.0
+    q = torch.rand((n, 2)) - 0.5
+
+    with torch.inference_mode():
+        p50, p99 = measure(lambda: eager_step(controller, actions, q, (0, 1)), args.iters)
+    print(f"{'controller (eager)':22s} p50 {p50:8.1f} us | p99 {p99:8.1f} us")
+
+    for backend in args.backends:
+        check_equivalence(n, backend, actuation=args.actuation)
+        fused = FusedTorquePath(controller, (0, 1), backend=backend)
+        p50, p99 = measure(lambda: fused(actions, q), args.iters)
+        print(f"{'fused (' + backend + ')':22s} p50 {p50:8.1f} us | p99 {p99:8.1f} us | equivalence OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+# cpu_articulation.py
+#
+# Isaac Simを起動せずにコントローラや環境のロジックを動かすための、
+# Articulation の軽量な代用品（CPU上の簡単な関節ダイナミクス）。
+# find_joints / data.joint_pos / set_joint_effort_target など、使っている部分だけ真似しています。
+
+import re
+
+import torch
+
+# porcaro.usd の関節（ROBOT_CFGのアクチュエータ設定に合わせる）
+JOINT_NAMES = ["Base_link_Wrist_joint", "Hand_link_Grip_joint"]
+
+
+class CpuArticulationData:
+    """Articulation.data の代わり。全環境分の状態テンソルを持つ"""
+
+    def __init__(self, num_envs, num_joints, device):
+        self.joint_pos = torch.zeros((num_envs, num_joints), device=device)
+        self.joint_vel = torch.zeros((num_envs, num_joints), device=device)
+        self.applied_torque = torch.zeros((num_envs, num_joints), device=device)
+        # [位置(3), 姿勢クォータニオン(4), 速度(3), 角速度(3)]
+        self.root_state_w = torch.zeros((num_envs, 13), device=device)
+        self.root_state_w[:, 3] = 1.0
+        self.default_root_state = self.root_state_w.clone()
+
+
+class CpuArticulation:
+    """トルクを受け取り、減衰つきの関節を半陰的オイラー法で進めるだけの代用品"""
+
+    def __init__(self, num_envs, joint_names=JOINT_NAMES, device="cpu",
+                 damping=0.02, inertia=0.01, effort_limit=500.0):
+        self.num_envs = num_envs
+        self.joint_names = list(joint_names)
+        self.device = torch.device(device)
+        # 関節ごと・環境ごとの減衰（write_joint_damping_to_sim で書き換えられる）
+        self.damping = torch.full((num_envs, len(self.joint_names)), float(damping), device=self.device)
+        self.inertia = inertia
+        self.effort_limit = effort_limit
+
+        self.data = CpuArticulationData(num_envs, len(self.joint_names), self.device)
+        self._effort_target = torch.zeros((num_envs, len(self.joint_names)), device=self.device)
+        self._acc = torch.zeros_like(self._effort_target)
+
+    def find_joints(self, name_keys):
+        """正規表現に一致する関節の (ID一覧, 名前一覧) を返す"""
+        if isinstance(name_keys, str):
+            name_keys = [name_keys]
+        ids, names = [], []
+        for i, name in enumerate(self.joint_names):
+            if any(re.fullmatch(key, name) for key in name_keys):
+                ids.append(i)
+                names.append(name)
+        return ids, names
+
+    def set_joint_effort_target(self, target, joint_ids=None, env_ids=None):
+        """関節トルクの目標値を設定する"""
+        if joint_ids is None:
+            joint_ids = slice(None)
+        if env_ids is None:
+            self._effort_target[:, joint_ids] = target
+        else:
+            self._effort_target[env_ids[:, None], joint_ids] = target
+
+    def write_joint_damping_to_sim(self, damping, joint_ids=None, env_ids=None):
+        """関節の減衰を書き換える"""
+        if joint_ids is None:
+            joint_ids = slice(None)
+        if env_ids is None:
+            self.damping[:, joint_ids] = damping
+        else:
+            self.damping[env_ids[:, None], joint_ids] = damping
+
+    def write_root_pose_to_sim(self, root_pose, env_ids=None):
+        """ルートの位置と姿勢 (位置3 + クォータニオン4) を書き換える"""
+        if env_ids is None:
+            env_ids = slice(None)
+        self.data.root_state_w[env_ids, :7] = root_pose
+
+    def write_root_velocity_to_sim(self, root_velocity, env_ids=None):
+        """ルートの速度 (並進3 + 角速度3) を書き換える"""
+        if env_ids is None:
+            env_ids = slice(None)
+        self.data.root_state_w[env_ids, 7:] = root_velocity
+
+    def write_joint_state_to_sim(self, position, velocity, joint_ids=None, env_ids=None):
+        """関節の角度と角速度を書き換える"""
+        rows = slice(None) if env_ids is None else env_ids
+        if joint_ids is None:
+            self.data.joint_pos[rows] = position
+            self.data.joint_vel[rows] = velocity
+        else:
+            rows = rows if env_ids is None else env_ids[:, None]
+            self.data.joint_pos[rows, joint_ids] = position
+            self.data.joint_vel[rows, joint_ids] = velocity
+
+    def write_data_to_sim(self):
+        pass
+
+    def update(self, dt):
+        """1ステップ分だけ関節を進める"""
+        data = self.data
+        torch.clamp(self._effort_target, -self.effort_limit, self.effort_limit, out=data.applied_torque)
+        # qdd = (tau - c * qd) / I
+        torch.mul(data.joint_vel, self.damping, out=self._acc)
+        self._acc.neg_().add_(data.applied_torque).div_(self.inertia)
+        data.joint_vel.add_(self._acc, alpha=dt)
+        data.joint_pos.add_(data.joint_vel, alpha=dt)
+
+    def reset(self, env_ids=None):
+        """指定した環境の関節状態をゼロに戻す"""
+        if env_ids is None:
+            env_ids = slice(None)
+        self.data.joint_pos[env_ids] = 0.0
+        self.data.joint_vel[env_ids] = 0.0
+        self._effort_target[env_ids] = 0.0
+
+
+class CpuScene(dict):
+    """InteractiveScene の代わり。scene["robot"] のように名前でアセットを引ける"""
+
+    def __init__(self, num_envs, device="cpu", env_spacing=3.0, **assets):
+        super().__init__(**assets)
+        # 環境の原点をx方向に並べる
+        self.env_origins = torch.zeros((num_envs, 3), device=device)
+        self.env_origins[:, 0] = torch.arange(num_envs, device=device) * env_spacing
+
+
+class CpuContactSensorData:
+    """ContactSensor.data の代わり"""
+
+    def __init__(self, num_envs, history_length, num_bodies, device):
+        # インデックス0が最新（Isaac Labと同じ）
+        self.net_forces_w_history = torch.zeros((num_envs, history_length, num_bodies, 3), device=device)
+        self.net_forces_w = self.net_forces_w_history[:, 0]
+
+
+class CpuContactSensor:
+    """接触力の履歴だけを持つ ContactSensor の代用品。push() で新しい接触力を書き込む"""
+
+    def __init__(self, num_envs, history_length=5, num_bodies=1, device="cpu"):
+        self.data = CpuContactSensorData(num_envs, history_length, num_bodies, torch.device(device))
+
+    def push(self, forces):
+        """(num_envs, ボディ数, 3) の接触力を履歴の先頭に追加する"""
+        hist = self.data.net_forces_w_history
+        hist[:, 1:] = hist[:, :-1].clone()
+        hist[:, 0] = forces
+
+    def reset(self, env_ids=None):
+        if env_ids is None:
+            env_ids = slice(None)
+        self.data.net_forces_w_history[env_ids] = 0.0
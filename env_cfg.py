@@ -11,12 +11,26 @@ from isaaclab.terrains import TerrainImporterCfg
 from isaaclab.utils import configclass
 from isaaclab.sensors import ContactSensorCfg
 
-from .actions.torque import TorqueActionController
+from .actions.torque import load_muscle_params
+from .asset_cache import cached_assets
+from .porcaro_task import PorcaroTask
 
 ASSETS_DIR = Path(__file__).resolve().parents[2] / "assets" #Path(__file__)このファイルのある場所をオブジェクトでとる．resolve()絶対パスにして迷子にならない．parents[2]/"assets"２つ上の階層のassetsフォルダに入る
 ROBOT_USD = str(ASSETS_DIR / "porcaro.usd")  #命名したASSETS_DIRのなかにあるusdファイルを取得し命名
 DRUM_USD  = str(ASSETS_DIR / "sneadrum.usd")
 DRUMSTAND_USD  = str(ASSETS_DIR / "sneadrumstand.usd")
+DRUM_PRIM_PATH = "{ENV_REGEX_NS}/DrumStand/Drum"
+
+# asset_cache.py で作ったキャッシュ（平坦化済み・ドラムは StandArm_link の下に組み込み済み）が
+# 最新ならそちらを読み込む。元のUSDが変わっていればキャッシュは使わない
+BAKED_ASSETS = cached_assets(ASSETS_DIR)
+if BAKED_ASSETS is not None:
+    ROBOT_USD = BAKED_ASSETS["robot"]
+    DRUMSTAND_USD = BAKED_ASSETS["drum_stand"]
+    DRUM_PRIM_PATH = "{ENV_REGEX_NS}/DrumStand/" + BAKED_ASSETS["drum_prim"]
+
+# 筋肉パラメータ（sysid.py で同定した muscle_params.json があればその値を使う）
+MUSCLE_PARAMS = load_muscle_params()
 
 # --- ロボットの設定 ---
 ROBOT_CFG = ArticulationCfg(
@@ -29,13 +43,13 @@ ROBOT_CFG = ArticulationCfg(
         "wrist": ImplicitActuatorCfg(
             joint_names_expr=[r"Base_link_Wrist_joint"],#rはrow string \がでたときに正規表現として読み込むためのもの
             stiffness=0,   # 例：必要なら上書き
-            damping=0.02,
+            damping=MUSCLE_PARAMS["damping"],
             effort_limit=500.0,
         ),
         "grip": ImplicitActuatorCfg(
             joint_names_expr=[r"Hand_link_Grip_joint"],
             stiffness=0,   # 例
-            damping=0.02,
+            damping=MUSCLE_PARAMS["damping"],
             effort_limit=500.0,
     ),
     },
@@ -43,9 +57,10 @@ ROBOT_CFG = ArticulationCfg(
 
 # --- ドラムの設定 ---
 DRUM_CFG = RigidObjectCfg(
-    prim_path="{ENV_REGEX_NS}/DrumStand/Drum",
+    prim_path=DRUM_PRIM_PATH,
     parent="{ENV_REGEX_NS}/DrumStand/StandArm_link",
-    spawn=sim_utils.UsdFileCfg(
+    # キャッシュを使うときはドラムスタンドのUSDに入っているので、ここではスポーンしない
+    spawn=None if BAKED_ASSETS is not None else sim_utils.UsdFileCfg(
         usd_path=DRUM_USD,
         init_state=sim_utils.AssetCfg.InitialStateCfg(
             pos=(0.0, 0.0, 0.1),
@@ -54,6 +69,13 @@ DRUM_CFG = RigidObjectCfg(
     ),
 )
 
+# --- ドラムの接触センサの設定（打撃の検出に使う） ---
+DRUM_CONTACT_CFG = ContactSensorCfg(
+    prim_path=DRUM_PRIM_PATH,
+    history_length=5,       # decimation(4)ステップ分の履歴が入るように
+    update_period=0.0,      # 物理ステップごとに更新
+    track_air_time=False,
+)
 
 # --- ドラムスタンドの設定 ---
 DRUMSTAND_CFG = ArticulationCfg(
@@ -83,56 +105,19 @@ DRUMSTAND_CFG = ArticulationCfg(
 
 
 @configclass
-class PorcaroRLEnvCfg(DirectRLEnvCfg):
+class PorcaroRLEnvCfg(PorcaroTask, DirectRLEnvCfg):
+    # リズム・ランダム化・_pre_physics_step などのタスクの処理は porcaro_task.py の PorcaroTask にあり、
+    # surrogate.py の SurrogateEnv も同じものを使う
     
     def __init__(self, cfg: PorcaroRLEnvCfg, **kwargs):
         super().__init__(cfg, **kwargs)
 
-        dt_ctrl = self.cfg.sim.dt * self.cfg.decimation
+        # --- 1. コントローラ・関節ID・リズム・ランダム化・打撃検出・観測の正規化 ---
+        self._setup_task(MUSCLE_PARAMS, seed=self.cfg.seed or 0)
 
-        self.action_controller = TorqueActionController(
-            dt_ctrl=dt_ctrl,
-            r=0.014, L=0.150,
-            Pmax=0.6,
-        )
-
-        # --- 2. 関節IDの取得 ---
-        # コントローラがどの関節を操作するかをIDで覚えておく
-        wrist_ids, _ = self.robot.find_joints(r"Base_link_Wrist_joint")
-        grip_ids, _ = self.robot.find_joints(r"Hand_link_Grip_joint")
-        self._wrist_id = wrist_ids[0]
-        self._grip_id = grip_ids[0]
-
-
-    def _reset_idx(self, env_ids: torch.Tensor):
-        """特定環境IDのリセット"""
-        # 環境がリセットされる際にコントローラもリセットする
-        if env_ids is None:
-            n_envs = self.num_envs
-        else:
-            n_envs = len(env_ids)
-        self.action_controller.reset(n_envs, self.device)
-        # (他のリセット処理...)
-
-    # --- トルク計算のインスタンス化とメソッド作成 ---
-    def _pre_physics_step(self, actions: torch.Tensor):
-        """物理シミュレーションの直前に呼ばれる"""
-        # エージェントからのアクションを[-1, 1]の範囲にクリップして保持
-        self.actions = actions.clamp(-1.0, 1.0)
-
-
-    def _apply_action(self):
-        """保持されたアクションを適用する"""
-        # --- 3. コントローラを実行してトルクを計算・適用 ---
-        self.action_controller.apply(
-            actions=self.actions,
-            q=self.robot.data.joint_pos, # 現在の関節角度を渡す
-            robot=self.robot, # robotオブジェクトを渡し、トルクを直接設定させる
-            joint_ids=(self._wrist_id, self._grip_id)
-        )   
-    # ----------------------------------------------
+        # --- 2. 打撃検出に使う接触センサ ---
+        self.contact_sensor = self.scene["contact_sensor"]
 
-    
     # env
     # episode_length_s = 5.0
     # decimation = 4
@@ -144,7 +129,7 @@ class PorcaroRLEnvCfg(DirectRLEnvCfg):
     # simulation 
     sim: SimulationCfg = SimulationCfg(
         dt=1 / 200,
-        render_interval=1,
+        render_interval=4,  # 描画は制御ステップ（物理4ステップ）に1回。物理と同じ頻度で描画しない
         physics_material=sim_utils.RigidBodyMaterialCfg(
             friction_combine_mode="multiply",
             restitution_combine_mode="multiply",
@@ -182,6 +167,7 @@ class PorcaroRLEnvCfg(DirectRLEnvCfg):
 
 
         robot=ROBOT_CFG,
+        contact_sensor=DRUM_CONTACT_CFG,
         drum_stand=DRUMSTAND_CFG.replace(
             init_state = sim_utils.AssetCfg.InitialStateCfg(
                 pos=(0.73871, 0.0, 0.0),
@@ -1,9 +1,16 @@
 # gui_converter.py
 
+import os
+import queue
+import tempfile
+import threading
 import tkinter as tk
-from tkinter import ttk
+from tkinter import filedialog, ttk
 
-INCH_TO_MM = 25.4
+from unit_engine import UNITS, convert, convert_strings, parse_quantity
+
+CHUNK_BYTES = 1 << 20   # ファイル変換で一度に読むおおよそのバイト数
+POLL_MS = 100           # ワーカーの進み具合を確認する間隔 [ms]
 
 # --- ロジック部分（計算処理など） ---
 def convert_unit():
@@ -15,33 +22,125 @@ def convert_unit():
 
     # try-exceptでエラー処理を行う
     try:
-        if input_lower.endswith('mm'):
-            value_str = input_lower.replace('mm', '')
-            mm_value = float(value_str)
-            inch_value = mm_value / INCH_TO_MM
-            result_text = f"{mm_value} mm は {inch_value:.4f} インチです。"
-
-        elif input_lower.endswith('inch'):
-            value_str = input_lower.replace('inch', '')
-            inch_value = float(value_str)
-            mm_value = inch_value * INCH_TO_MM
-            result_text = f"{inch_value} inch は {mm_value:.4f} ミリメートルです。"
-        
+        value, unit = parse_quantity(input_lower)
+        if unit == 'mm':
+            result_text = f"{value} mm は {convert(value, 'mm', 'inch'):.4f} インチです。"
         else:
-            result_text = "エラー: 'mm' または 'inch' を指定してください。"
-    
+            result_text = f"{value} {unit} は {convert(value, unit, 'mm'):.4f} ミリメートルです。"
+
     except ValueError:
         result_text = "エラー: 数値を正しく入力してください。"
 
      # 2. 結果表示ラベル(result_label)のテキストを更新する
     result_label.config(text=result_text)
 
+# --- ファイルの一括変換（別スレッドで実行し、root.after で進み具合を確認する） ---
+def convert_file_worker(in_path, out_path, to_unit, messages, cancel_event):
+    """1行1値のファイルを少しずつ読みながら変換して out_path に書き出す（ワーカースレッドで実行）
+
+    途中までの結果が残らないよう一時ファイルに書き、最後まで変換できたときだけ out_path に置き換える。
+    どんな例外で終わっても、必ず done / cancelled / error のどれかをキューに送る。
+    """
+    count = 0
+    tmp_path = None
+    try:
+        fd, tmp_path = tempfile.mkstemp(prefix=".converting_", dir=os.path.dirname(os.path.abspath(out_path)))
+        total = max(1, os.path.getsize(in_path))
+        with open(in_path, "rb") as src, open(fd, "w", encoding="utf-8") as dst:
+            while not cancel_event.is_set():
+                raw_lines = src.readlines(CHUNK_BYTES)
+                if not raw_lines:
+                    break
+                lines = [line.decode("utf-8").strip() for line in raw_lines]
+                lines = [line for line in lines if line]
+                if lines:
+                    values = convert_strings(lines, to_unit)
+                    dst.write("\n".join(f"{v:.6g}" for v in values.tolist()) + "\n")
+                    count += len(lines)
+                messages.put(("progress", src.tell() / total * 100.0, count))
+        if cancel_event.is_set():
+            result = ("cancelled", count)
+        else:
+            os.replace(tmp_path, out_path)
+            result = ("done", count)
+    except Exception as e:  # スレッドが黙って止まると、画面がボタン無効のまま待ち続けてしまう
+        result = ("error", f"{type(e).__name__}: {e}")
+    finally:
+        if tmp_path is not None and os.path.exists(tmp_path):
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+    messages.put(result)
+
+
+def start_file_conversion():
+    """入力ファイルと出力ファイルを選んで、ワーカースレッドを起動する"""
+    in_path = filedialog.askopenfilename(title="変換するファイルを選択")
+    if not in_path:
+        return
+    base, ext = os.path.splitext(in_path)
+    out_path = filedialog.asksaveasfilename(
+        title="出力ファイルを選択", initialfile=os.path.basename(base) + "_converted" + (ext or ".txt"))
+    if not out_path:
+        return
+
+    job["messages"] = queue.Queue()
+    job["cancel"] = threading.Event()
+    job["thread"] = threading.Thread(
+        target=convert_file_worker,
+        args=(in_path, out_path, unit_box.get(), job["messages"], job["cancel"]),
+        daemon=True,
+    )
+    progress_bar["value"] = 0
+    file_button.config(state="disabled")
+    cancel_button.config(state="normal")
+    file_label.config(text=f"変換中: {os.path.basename(in_path)}")
+    job["thread"].start()
+    root.after(POLL_MS, poll_file_conversion)
+
+
+def poll_file_conversion():
+    """ワーカーからのメッセージを読んで、プログレスバーとラベルを更新する"""
+    finished = False
+    try:
+        while True:
+            kind, *data = job["messages"].get_nowait()
+            if kind == "progress":
+                progress_bar["value"] = data[0]
+                file_label.config(text=f"変換中: {data[1]} 件")
+            elif kind == "done":
+                progress_bar["value"] = 100
+                file_label.config(text=f"完了: {data[0]} 件を変換しました。")
+                finished = True
+            elif kind == "cancelled":
+                file_label.config(text=f"キャンセルしました（{data[0]} 件まで変換）。")
+                finished = True
+            elif kind == "error":
+                file_label.config(text=f"エラー: {data[0]}")
+                finished = True
+    except queue.Empty:
+        pass
+
+    if finished:
+        file_button.config(state="normal")
+        cancel_button.config(state="disabled")
+    else:
+        root.after(POLL_MS, poll_file_conversion)
+
+
+def cancel_file_conversion():
+    job["cancel"].set()
+
+
+job = {}
+
 # ---GUIの組み立て部分---
 
 # 1.メインウィンドウを作成
 root = tk.Tk()      #クラス(tk.Tk())からインスタンスrootを作成
 root.title("単位変換ツール")        # インスタンスの設計を変更．tk.Tk().title()だとクラスという設計方法に対する変更になってしまい，おかしい
-root.geometry("400x150")
+root.geometry("400x300")
 
 # 2.GUIの部品（ウィジェット）を作成
 # -フレーム：ウィジェットをまとめるための容器
@@ -57,10 +156,25 @@ convert_button = ttk.Button(main_frame, text="変換実行", command=convert_uni
 #   -結果表示ラベル(Label)
 result_label = ttk.Label(main_frame, text="ここに変換結果が表示されます")
 
+#   -ファイル一括変換の部品（変換先の単位・開始ボタン・プログレスバー・キャンセルボタン）
+file_frame = ttk.Frame(main_frame)
+unit_box = ttk.Combobox(file_frame, values=sorted({u.name for u in UNITS.values()}), width=6, state="readonly")
+unit_box.set("mm")
+file_button = ttk.Button(file_frame, text="ファイルを変換", command=start_file_conversion)
+cancel_button = ttk.Button(file_frame, text="キャンセル", command=cancel_file_conversion, state="disabled")
+progress_bar = ttk.Progressbar(main_frame, length=300, maximum=100)
+file_label = ttk.Label(main_frame, text="1行に1つの値が書かれたファイルを変換できます")
+
 # 3.ウィジェットをウィンドウに配置(レイアウト)
 main_frame.pack(expand=True)
 entry.pack(pady=5)
 convert_button.pack(pady=10)
 result_label.pack(pady=5)
+file_frame.pack(pady=5)
+unit_box.pack(side="left", padx=5)
+file_button.pack(side="left", padx=5)
+cancel_button.pack(side="left", padx=5)
+progress_bar.pack(pady=5)
+file_label.pack(pady=5)
 
 root.mainloop()
\ No newline at end of file
@@ -0,0 +1,150 @@
+# normalizer.py
+#
+# 方策に渡す観測を正規化するクラス。全環境の観測から平均と分散を毎ステップ更新し、
+# (obs - 平均) / 標準偏差 をクリップして、確保済みの出力バッファに書き込みます。
+#   - 平均と分散はバッチ（全環境）ごとに Chan の並列アルゴリズム（Welford の合併）で更新する
+#   - 統計はすべてデバイス上のテンソルに置き、ループの中でメモリ確保やGPU→CPUの同期をしない
+#   - freeze() で統計の更新を止め、state_dict() / load_state_dict() で保存・復元できる
+#
+# 使い方:
+#   normalizer = ObservationNormalizer(5, num_envs, device)
+#   obs = normalizer(raw_obs)     # 統計を更新してから正規化（freeze 中は正規化だけ）
+#
+#   python normalizer.py --num_envs 8192 --steps 2000   # 1ステップあたりの時間を測る
+
+import argparse
+import time
+
+import torch
+
+
+class ObservationNormalizer:
+    """観測の平均・分散をバッチごとに更新して、その場で正規化するクラス"""
+
+    def __init__(self, size, num_envs, device, clip=5.0, eps=1e-8):
+        self.size = size
+        self.num_envs = num_envs
+        self.device = torch.device(device)
+        self.clip = clip
+        self.eps = eps
+        self.frozen = False
+
+        # --- 1. 統計（すべてデバイス上） ---
+        # これまでに見たサンプル数。float32 だと 2^24 (8192環境で約2000ステップ) を超えると増えなくなるので float64
+        self.count = torch.zeros((), dtype=torch.float64, device=self.device)
+        self.mean = torch.zeros(size, device=self.device)
+        self.var = torch.ones(size, device=self.device)
+        self.std = torch.ones(size, device=self.device)             # sqrt(var + eps) を更新のたびに計算しておく
+
+        # --- 2. 毎ステップ上書きする作業用バッファ ---
+        self.out = torch.zeros((num_envs, size), device=self.device)
+        self._batch_mean = torch.zeros(size, device=self.device)
+        self._batch_var = torch.zeros(size, device=self.device)
+        self._delta = torch.zeros(size, device=self.device)
+        self._diff = torch.zeros((num_envs, size), device=self.device)
+        self._total = torch.zeros((), dtype=torch.float64, device=self.device)
+        self._w = torch.zeros((), device=self.device)
+        self._w2 = torch.zeros((), device=self.device)
+
+    def update(self, obs):
+        """観測のバッチ (バッチの大きさ, size) で平均と分散を更新する（Chan の合併）
+
+        m_a, M2_a: これまでの統計（n_a 個）, m_b, M2_b: バッチの統計（n_b 個）
+        m  = m_a + d * n_b / n
+        M2 = M2_a + M2_b + d^2 * n_a * n_b / n      (d = m_b - m_a, n = n_a + n_b)
+        """
+        n_b = obs.shape[0]
+        # --- 1. バッチの平均と分散 ---
+        # 作業用バッファは num_envs 行分。それより小さいバッチは先頭の行だけを使う
+        diff = self._diff[:n_b] if n_b <= self._diff.shape[0] else torch.empty_like(obs)
+        torch.mean(obs, dim=0, out=self._batch_mean)
+        torch.sub(obs, self._batch_mean, out=diff)
+        diff.square_()
+        torch.mean(diff, dim=0, out=self._batch_var)
+
+        # --- 2. 合併  w = n_b / n  とすると  var = (1 - w) * var_a + w * var_b + w * (1 - w) * d^2 ---
+        torch.sub(self._batch_mean, self.mean, out=self._delta)
+        torch.add(self.count, n_b, out=self._total)
+        torch.reciprocal(self._total, out=self._w)  # w は float32 に丸める（合計の数は float64 のまま）
+        self._w.mul_(n_b)
+        torch.mul(self._w, -1.0, out=self._w2)
+        self._w2.add_(1.0).mul_(self._w)
+        self.mean.addcmul_(self._delta, self._w)
+        self.var.lerp_(self._batch_var, self._w)
+        self.var.addcmul_(self._delta.square_(), self._w2)
+        self.count.copy_(self._total)
+
+        torch.add(self.var, self.eps, out=self.std)
+        self.std.sqrt_()
+
+    def normalize(self, obs):
+        """(obs - 平均) / 標準偏差 を [-clip, clip] に収めて self.out に書き込み、self.out を返す"""
+        torch.sub(obs, self.mean, out=self.out)
+        self.out.div_(self.std)
+        self.out.clamp_(-self.clip, self.clip)
+        return self.out
+
+    def __call__(self, obs):
+        if not self.frozen:
+            self.update(obs)
+        return self.normalize(obs)
+
+    def freeze(self):
+        """統計の更新を止める（評価や方策の書き出しのとき）"""
+        self.frozen = True
+
+    def unfreeze(self):
+        self.frozen = False
+
+    def state_dict(self):
+        """チェックポイントに保存する統計"""
+        return {"count": self.count.clone(), "mean": self.mean.clone(), "var": self.var.clone(),
+                "frozen": self.frozen}
+
+    def load_state_dict(self, state):
+        """保存した統計をそのままの場所（既存のテンソル）に書き戻す"""
+        self.count.copy_(state["count"])
+        self.mean.copy_(state["mean"])
+        self.var.copy_(state["var"])
+        self.frozen = state.get("frozen", self.frozen)
+        torch.add(self.var, self.eps, out=self.std)
+        self.std.sqrt_()
+
+
+def benchmark(num_envs, steps, device):
+    """1回の更新+正規化にかかる時間と、ループ中のメモリ確保の有無を調べる"""
+    device = torch.device(device)
+    normalizer = ObservationNormalizer(5, num_envs, device)
+    obs = torch.randn((num_envs, 5), device=device) * 3.0 + 1.0
+    for _ in range(10):
+        normalizer(obs)
+    if device.type == "cuda":
+        torch.cuda.synchronize(device)
+        allocated = torch.cuda.memory_allocated(device)
+
+    start = time.perf_counter()
+    for _ in range(steps):
+        normalizer(obs)
+    if device.type == "cuda":
+        torch.cuda.synchronize(device)
+    elapsed = (time.perf_counter() - start) / steps
+
+    print(f"num_envs={num_envs} | {elapsed * 1e6:.1f} us/step | budget at 200 Hz: 5000 us")
+    if device.type == "cuda":
+        print(f"allocated during the loop: {torch.cuda.memory_allocated(device) - allocated} bytes")
+    print(f"mean {normalizer.mean.tolist()}")
+    print(f"std  {normalizer.std.tolist()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the batched observation normalizer.")
+    parser.add_argument("--num_envs", type=int, default=8192)
+    parser.add_argument("--steps", type=int, default=2000)
+    parser.add_argument("--device", default="cuda" if torch.cuda.is_available() else "cpu")
+    args = parser.parse_args()
+    with torch.inference_mode():
+        benchmark(args.num_envs, args.steps, args.device)
+
+
+if __name__ == "__main__":
+    main()
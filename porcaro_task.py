@@ -0,0 +1,218 @@
+# porcaro_task.py
+#
+# PorcaroRLEnvCfg（env_cfg.py）と SurrogateEnv（surrogate.py）で共通のタスクの処理。
+#   - 目標のリズムとドメインランダム化の範囲
+#   - _pre_physics_step / _apply_action / _reset_idx と、観測・報酬・終了判定
+# どちらの環境も PorcaroTask を継承するので、サロゲートやベンチマークで測る処理は本物の環境と同じコードです。
+# Isaac Lab には依存しないので、Isaac Sim の無いマシンでも読み込めます。
+
+import torch
+
+try:  # パッケージとして読み込まれたとき（env_cfg.py から）
+    from .actions.actuation import ActuationDynamics
+    from .actions.torque import TorqueActionController
+    from .normalizer import ObservationNormalizer
+    from .randomization import DomainRandomizer, ParamRange
+    from .rhythm import RhythmScore
+    from .strike_detector import StrikeDetector
+except ImportError:  # リポジトリ直下のスクリプト（surrogate.py, bench_env.py など）から
+    from actions.actuation import ActuationDynamics
+    from actions.torque import TorqueActionController
+    from normalizer import ObservationNormalizer
+    from randomization import DomainRandomizer, ParamRange
+    from rhythm import RhythmScore
+    from strike_detector import StrikeDetector
+
+# --- 目標のリズム（rhythm.py のテキスト形式）。環境ごとに順番に割り当てる ---
+RHYTHM_PATTERNS = [
+    "tempo=120 div=4\nx...x...|x...x...",   # 4分音符
+    "tempo=120 div=4\nx.x.x.x.|x.x.x.x.",   # 8分音符
+    "tempo=100 div=4\nX..xx.x.|X..xx.x.",   # アクセント付き
+]
+
+# --- ドメインランダム化の範囲（リセットのたびに環境ごとに選び直す） ---
+# 筋肉パラメータと減衰は、読み込んだ値（sysid.py で同定した値）に掛ける倍率の範囲で選ぶ。
+# 既定値 (r=0.014, L=0.150, Pmax=0.6, damping=0.02) のときは r 0.012~0.016, L 0.140~0.160,
+# Pmax 0.55~0.65, damping 0.01~0.04 になる
+MUSCLE_SPREAD = {
+    "r": (6 / 7, 8 / 7),                                 # モーメントアーム [m]
+    "L": (14 / 15, 16 / 15),                             # 筋肉の自然長 [m]
+    "Pmax": (11 / 12, 13 / 12),                          # 最大圧力 [MPa]
+    "damping": (0.5, 2.0),                               # 手首・握りの関節減衰（対数一様）
+}
+OTHER_RANGES = {
+    "drum_offset": ParamRange(-0.02, 0.02, width=3),     # ドラムスタンド位置のずれ [m]
+    "valve_delay": ParamRange(0.0, 4.0, width=3),        # DF/F/G のバルブの遅れ [物理ステップ]
+    "valve_tau": ParamRange(0.02, 0.08, width=3),        # DF/F/G の圧力の時定数 [s]
+}
+
+
+def randomization_ranges(muscle_params):
+    """読み込んだ筋肉パラメータを中心にしたランダム化の範囲 {名前: ParamRange}"""
+    ranges = {}
+    for name, (lo, hi) in MUSCLE_SPREAD.items():
+        distribution = "log_uniform" if name == "damping" else "uniform"
+        ranges[name] = ParamRange(muscle_params[name] * lo, muscle_params[name] * hi, distribution)
+    ranges.update(OTHER_RANGES)
+    return ranges
+
+
+OBS_SIZE = 5  # [手首角度, 握り角度, 手首角速度, 握り角速度, 次の目標打撃までの時間]
+
+
+class PorcaroTask:
+    """Porcaro の打撃タスクの処理。環境クラスに継承させて使う
+
+    継承する側で num_envs, device, cfg (sim.dt, decimation), robot, scene, contact_sensor,
+    episode_length_buf, max_episode_length を用意してから _setup_task() を呼ぶ。
+    """
+
+    def _setup_task(self, muscle_params, seed=0, env_id_offset=0):
+        """コントローラ・リズム・ランダム化・打撃検出・観測のバッファを作る
+
+        env_id_offset: 環境をプロセスに分けたときの担当範囲の先頭（リズムとランダム化は全体での環境IDで決める）
+        """
+        dt_ctrl = self.cfg.sim.dt * self.cfg.decimation
+
+        # --- 1. トルク計算 ---
+        self.action_controller = TorqueActionController(
+            dt_ctrl=dt_ctrl,
+            r=muscle_params["r"], L=muscle_params["L"],
+            Pmax=muscle_params["Pmax"],
+            # _apply_action は物理ステップごとに呼ばれるので、遅れの1ティック = sim.dt
+            actuation=ActuationDynamics(dt=self.cfg.sim.dt),
+            num_envs=self.num_envs,  # 全環境分のバッファをまとめて確保しておく
+            device=self.device,
+        )
+
+        # --- 2. 関節IDの取得 ---
+        # コントローラがどの関節を操作するかをIDで覚えておく
+        wrist_ids, _ = self.robot.find_joints(r"Base_link_Wrist_joint")
+        grip_ids, _ = self.robot.find_joints(r"Hand_link_Grip_joint")
+        self._wrist_id = wrist_ids[0]
+        self._grip_id = grip_ids[0]
+
+        # --- 3. 目標リズムの表（環境ごとにパターンと位相を割り当てる） ---
+        self.rhythm = RhythmScore(RHYTHM_PATTERNS, num_envs=self.num_envs, dt=dt_ctrl, device=self.device,
+                                  seed=seed, env_id_offset=env_id_offset)
+        if env_id_offset:
+            self.rhythm.assign(pattern_ids=(torch.arange(self.num_envs, device=self.device) + env_id_offset)
+                               % len(RHYTHM_PATTERNS))
+
+        # --- 4. ドメインランダム化 ---
+        self.randomizer = DomainRandomizer(randomization_ranges(muscle_params), num_envs=self.num_envs,
+                                           device=self.device, seed=seed, env_id_offset=env_id_offset)
+        # コントローラは r / L / Pmax をランダム化の表から直接読む（選び直しの書き込みが1回で済む）
+        values = self.randomizer.values
+        self.action_controller.bind_params(values["r"], values["L"], values["Pmax"])
+        # ドラムスタンドのずれが0のときの姿勢（環境の原点を足したもの）。リセットのたびに足し直さない
+        drum_stand = self.scene["drum_stand"]
+        self._drum_pose = drum_stand.data.default_root_state[:, :7].clone()
+        self._drum_pose[:, :3] += self.scene.env_origins
+
+        # --- 5. 打撃検出 ---
+        self.strike_detector = StrikeDetector(num_envs=self.num_envs, dt=self.cfg.sim.dt, device=self.device)
+
+        # --- 6. 観測の正規化と報酬のバッファ ---
+        self.obs_buf = torch.zeros((self.num_envs, OBS_SIZE), device=self.device)
+        self.obs_normalizer = ObservationNormalizer(OBS_SIZE, self.num_envs, device=self.device)
+        self.reward_buf = torch.zeros(self.num_envs, device=self.device)
+
+        # --- 7. コントローラの入出力の記録（start_controller_recording() で始める） ---
+        self.controller_recording = None
+
+    def start_controller_recording(self, out_dir, chunk_len=1000):
+        """コントローラの入出力の記録を始める（replay.py で再生できる）"""
+        try:
+            from .replay import ControllerRecording
+        except ImportError:
+            from replay import ControllerRecording
+
+        self.controller_recording = ControllerRecording(
+            self.action_controller, self.robot.data.joint_pos.shape[1], out_dir=out_dir,
+            joint_ids=(self._wrist_id, self._grip_id), chunk_len=chunk_len,
+        )
+        return self.controller_recording
+
+    def stop_controller_recording(self):
+        """記録を書き出して止める"""
+        if self.controller_recording is not None:
+            self.controller_recording.close()
+            self.controller_recording = None
+
+    def _reset_idx(self, env_ids: torch.Tensor):
+        """特定環境IDのリセット"""
+        # 環境がリセットされる際に、その環境の行だけコントローラの状態を戻す
+        self.action_controller.reset(env_ids)
+        if self.controller_recording is not None:
+            self.controller_recording.mark_reset(env_ids)
+        self.strike_detector.reset(env_ids)
+        self.rhythm.randomize_phase(env_ids)
+        # リセットした環境のパラメータを選び直し、選び直した行をそのまま書き込む
+        self._apply_randomization(env_ids, self.randomizer.sample(env_ids))
+
+    def _apply_randomization(self, env_ids, params=None):
+        """選び直したパラメータをコントローラとシミュレーションに書き込む
+
+        env_ids: 書き込む環境ID（None なら全環境）
+        params: env_ids の行だけの値 {名前: (len(env_ids), 幅)}（randomizer.sample() の戻り値）。
+                None なら randomizer から取り出す
+        """
+        # r / L / Pmax はコントローラが表を直接読むので、ここで書き込むのはそれ以外だけ
+        p = self.randomizer.rows(env_ids) if params is None else params
+        self.action_controller.actuation.set_params(
+            delay_ticks=p["valve_delay"], tau=p["valve_tau"], env_ids=env_ids,
+        )
+        self.robot.write_joint_damping_to_sim(
+            p["damping"].expand(-1, 2),
+            joint_ids=[self._wrist_id, self._grip_id],
+            env_ids=env_ids,
+        )
+        pose = self._drum_pose.clone() if env_ids is None else self._drum_pose[env_ids]
+        pose[:, :3] += p["drum_offset"]
+        self.scene["drum_stand"].write_root_pose_to_sim(pose, env_ids=env_ids)
+
+    def _pre_physics_step(self, actions: torch.Tensor):
+        """物理シミュレーションの直前に呼ばれる"""
+        # スケジュールが設定されているときだけ、全環境のパラメータを定期的に選び直す
+        if self.randomizer.interval_steps is not None and self.randomizer.tick():
+            self._apply_randomization(None, self.randomizer.sample())
+        # 前の制御ステップ中（decimation回の物理ステップ）の接触力から打撃を検出する
+        self.strike_detector.update(
+            self.contact_sensor.data.net_forces_w_history,
+            num_new=self.cfg.decimation,
+            target_time=self.rhythm.target_time(self.episode_length_buf),
+        )
+        # エージェントからのアクションを[-1, 1]の範囲にクリップして保持
+        self.actions = actions.clamp(-1.0, 1.0)
+
+    def _apply_action(self):
+        """保持されたアクションを適用する"""
+        self.action_controller.apply(
+            actions=self.actions,
+            q=self.robot.data.joint_pos,  # 現在の関節角度を渡す
+            robot=self.robot,  # robotオブジェクトを渡し、トルクを直接設定させる
+            joint_ids=(self._wrist_id, self._grip_id)
+        )
+        if self.controller_recording is not None:
+            self.controller_recording.record(self.actions, self.robot.data.joint_pos)
+
+    def _get_observations(self) -> dict:
+        """生の観測を obs_buf に集めてから、正規化して方策に渡す"""
+        self.obs_buf[:, 0] = self.robot.data.joint_pos[:, self._wrist_id]
+        self.obs_buf[:, 1] = self.robot.data.joint_pos[:, self._grip_id]
+        self.obs_buf[:, 2] = self.robot.data.joint_vel[:, self._wrist_id]
+        self.obs_buf[:, 3] = self.robot.data.joint_vel[:, self._grip_id]
+        self.obs_buf[:, 4] = self.rhythm.observe(self.episode_length_buf)[:, 0]
+        return {"policy": self.obs_normalizer(self.obs_buf)}
+
+    def _get_rewards(self) -> torch.Tensor:
+        """打撃が終わった環境に、タイミング誤差が小さいほど大きな報酬を与える"""
+        err = self.strike_detector.last_events()[:, 3]
+        torch.exp(-(err / 0.05).square(), out=self.reward_buf)
+        self.reward_buf.mul_(self.strike_detector.hit_done)
+        return self.reward_buf
+
+    def _get_dones(self):
+        time_out = self.episode_length_buf >= self.max_episode_length - 1
+        return torch.zeros_like(time_out), time_out
@@ -0,0 +1,203 @@
+# profiler.py
+#
+# シミュレーションループの各フェーズ（render / step / 指令生成 / コントローラ など）に
+# かかった時間を測るプロファイラ。
+#   - CPU側の時間は time.perf_counter_ns、GPUがあればCUDAイベントでGPU側の時間も測る
+#   - 測った時間は log2 刻みのヒストグラムに数えるだけなので、ループへの負担は小さい
+#   - JSON（集計）と Chrome トレース（chrome://tracing / Perfetto で開ける）に書き出せる
+#   - enabled=False のときは何もしないオブジェクトを返すだけ
+#
+# 使い方:
+#   profiler = PhaseProfiler(enabled=True, device=sim.device)
+#   with profiler.phase("sim.step"):
+#       sim.step()
+
+import json
+import time
+from collections import deque
+
+import torch
+
+NUM_BUCKETS = 40  # 2^0 ns ~ 2^39 ns（約9分）
+
+
+class _NullPhase:
+    """プロファイラが無効のときに返す、何もしないコンテキスト"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_PHASE = _NullPhase()
+
+
+class PhaseStats:
+    """1つのフェーズの集計（回数・合計・最小・最大・ヒストグラム）"""
+
+    def __init__(self):
+        self.count = 0
+        self.total_ns = 0
+        self.min_ns = None
+        self.max_ns = 0
+        self.buckets = [0] * NUM_BUCKETS
+
+    def add(self, ns):
+        self.count += 1
+        self.total_ns += ns
+        self.min_ns = ns if self.min_ns is None else min(self.min_ns, ns)
+        self.max_ns = max(self.max_ns, ns)
+        self.buckets[min(NUM_BUCKETS - 1, max(0, ns).bit_length())] += 1
+
+    def percentile(self, q):
+        """ヒストグラムから求めたおおよその q パーセンタイル [ns]（バケットの上端）"""
+        if self.count == 0:
+            return 0
+        target = q / 100.0 * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= target:
+                return min(1 << i, self.max_ns)
+        return self.max_ns
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "mean_us": self.total_ns / max(1, self.count) / 1e3,
+            "min_us": (self.min_ns or 0) / 1e3,
+            "max_us": self.max_ns / 1e3,
+            "p50_us": self.percentile(50) / 1e3,
+            "p99_us": self.percentile(99) / 1e3,
+            "histogram_log2_ns": self.buckets,
+        }
+
+
+class _Phase:
+    """1つのフェーズの計測区間。フェーズ名ごとに1つだけ作って使い回す"""
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.cpu = PhaseStats()
+        self.gpu = PhaseStats()
+        self._start = 0
+        self._start_event = None
+
+    def __enter__(self):
+        if self.profiler.use_cuda:
+            self._start_event = torch.cuda.Event(enable_timing=True)
+            self._start_event.record()
+        self._start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter_ns()
+        self.cpu.add(end - self._start)
+        self.profiler._trace.append((self.name, self._start, end - self._start))
+        if self.profiler.use_cuda:
+            end_event = torch.cuda.Event(enable_timing=True)
+            end_event.record()
+            # GPUの時間はイベントが終わってから collect() で読む（ここでは同期しない）
+            pending = self.profiler._pending
+            if len(pending) == pending.maxlen:
+                # 読まれないまま溜まったら、終わっているものをここで集計する（それでも一杯なら古いものを捨てる）
+                self.profiler.collect()
+            pending.append((self, self._start_event, end_event))
+        return False
+
+
+class PhaseProfiler:
+    """フェーズごとの時間を集計するプロファイラ"""
+
+    def __init__(self, enabled=True, device="cpu", trace_length=100000, max_pending=4096):
+        self.enabled = enabled
+        self.use_cuda = enabled and torch.device(device).type == "cuda"
+        self._phases = {}
+        self._pending = deque(maxlen=max_pending)  # 時間をまだ読んでいないCUDAイベント
+        self._trace = deque(maxlen=trace_length)  # Chromeトレース用（直近の区間だけ残す）
+        self._t0 = time.perf_counter_ns()
+
+    def phase(self, name):
+        """with 文で使う計測区間を返す"""
+        if not self.enabled:
+            return _NULL_PHASE
+        p = self._phases.get(name)
+        if p is None:
+            p = self._phases[name] = _Phase(self, name)
+        return p
+
+    def collect(self):
+        """終わったCUDAイベントの時間をGPU側の集計に加える（終わっていないものは後回し）"""
+        while self._pending:
+            phase, start, end = self._pending[0]
+            if not end.query():
+                break
+            self._pending.popleft()
+            phase.gpu.add(int(start.elapsed_time(end) * 1e6))
+
+    def summary(self):
+        """フェーズ名 -> 集計 の辞書"""
+        self.collect()
+        result = {}
+        for name, p in self._phases.items():
+            result[name] = {"cpu": p.cpu.to_dict()}
+            if p.gpu.count:
+                result[name]["gpu"] = p.gpu.to_dict()
+        return result
+
+    def report(self):
+        """1フェーズ1行の表示用文字列（GPUの時間があれば後ろに付ける）"""
+        self.collect()
+        lines = []
+        for name, p in self._phases.items():
+            s = p.cpu
+            line = (f"{name:20s} mean {s.total_ns / max(1, s.count) / 1e3:9.1f} us"
+                    f" | p99 {s.percentile(99) / 1e3:9.1f} us | n={s.count}")
+            if p.gpu.count:
+                line += f" | gpu mean {p.gpu.total_ns / p.gpu.count / 1e3:9.1f} us"
+            lines.append(line)
+        return "\n".join(lines)
+
+    def export_json(self, path):
+        with open(path, "w") as f:
+            json.dump(self.summary(), f, indent=2)
+
+    def export_chrome_trace(self, path):
+        """Chrome トレース形式（ph: "X" の区間イベント）で書き出す"""
+        events = [
+            {"name": name, "ph": "X", "pid": 0, "tid": 0,
+             "ts": (start - self._t0) / 1e3, "dur": dur / 1e3}
+            for name, start, dur in self._trace
+        ]
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+
+class LiveReadout:
+    """フェーズごとの時間を表示する小さなTkウィンドウ（now.py の時刻表示と同じ作り）
+
+    シミュレーションループから refresh() を時々呼ぶだけで、mainloop() は使わない。
+    """
+
+    def __init__(self, profiler, title="Phase timings"):
+        import tkinter as tk
+        import tkinter.font as tkfont
+
+        self.profiler = profiler
+        self.root = tk.Tk()
+        self.root.title(title)
+        self.root.geometry("560x200")
+        font = tkfont.Font(family="Courier", size=11)
+        self.label = tk.Label(self.root, text="", font=font, justify="left", anchor="nw")
+        self.label.pack(fill="both", expand=True, padx=10, pady=10)
+
+    def refresh(self):
+        # report() が終わったCUDAイベントを集計するので、表示のたびに待ち行列も空く
+        self.label.config(text=self.profiler.report())
+        self.root.update()
+
+    def close(self):
+        self.root.destroy()
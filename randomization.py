@@ -0,0 +1,242 @@
+# randomization.py
+#
+# 筋肉パラメータ（r, L, Pmax）・関節の減衰・ドラムスタンドの位置などを
+# 環境ごとにランダムに選び直すドメインランダム化のエンジン。
+# サンプルした値は (num_envs, 幅) のテンソルにその場で書き込み、アセットの再スポーンはしません。
+#
+# 乱数は (seed, 環境ID, その環境で何回目のサンプルか, 列) から計算するハッシュで作るので、
+# どの環境がいっしょにリセットされたかに関係なく、環境ごとに同じ値が再現されます。
+# 環境を複数のプロセスに分けるときは env_id_offset に担当範囲の先頭を渡せば、
+# 分け方に関係なく全体での環境IDごとに同じ値になります。
+#
+# 使い方（4096環境でのステップ時間に対する負担を測る。--every_step で毎ステップ選び直す場合も測る）:
+#   python randomization.py --num_envs 4096 --steps 300
+
+import argparse
+import json
+import math
+import time
+
+import numpy as np
+import torch
+
+_MASK32 = 0xFFFFFFFF
+
+
+def _hash32(x):
+    """int64テンソルの下位32bitを混ぜるハッシュ（値はいつも 0 <= x < 2^32）"""
+    x = (((x >> 16) ^ x) * 0x45D9F3B) & _MASK32
+    x = (((x >> 16) ^ x) * 0x45D9F3B) & _MASK32
+    return (x >> 16) ^ x
+
+
+def env_keys(num_envs, seed=0, env_id_offset=0, device="cpu"):
+    """環境ごとのハッシュの鍵 (num_envs,)。(seed, 全体での環境ID) だけで決まるので起動時に一度だけ計算する"""
+    env_ids = torch.arange(num_envs, device=device)
+    return _hash32(env_ids + ((seed * 0x9E3779B9 + env_id_offset) & _MASK32))
+
+
+def hash_uniform(keys, draw_count, col_keys):
+    """(環境の鍵, 何回目のサンプルか, 列) から作る (len(keys), 列数) の [0, 1) の一様乱数
+
+    keys: env_keys() の値のうち、サンプルする環境の分
+    draw_count: (len(keys),) 各環境でこれまでにサンプルした回数
+    col_keys: (列数,) 列ごとのハッシュの鍵。用途ごとに違う鍵を使えば、乱数が重ならない
+    """
+    # 環境の鍵はすでに混ざっているので、回数と列は xor で足してからハッシュを1回通すだけでよい
+    key = keys ^ ((draw_count * 0x85EBCA6B) & _MASK32)
+    bits = _hash32(key[:, None] ^ col_keys)
+    # float32 の仮数は24bitなので、上位24bitだけを使う（32bitのままだと 1.0 に丸められることがある）
+    return (bits >> 8) * (1.0 / 2 ** 24)
+
+
+class ParamRange:
+    """1つのパラメータのサンプル範囲"""
+
+    def __init__(self, low, high, distribution="uniform", width=1):
+        self.low = float(low)
+        self.high = float(high)
+        self.distribution = distribution  # "uniform" または "log_uniform"
+        self.width = width
+        if distribution not in ("uniform", "log_uniform"):
+            raise ValueError(f"不明な分布です: {distribution}")
+
+
+class DomainRandomizer:
+    """環境ごとのパラメータをまとめて持ち、指定した環境だけ選び直すクラス"""
+
+    def __init__(self, ranges, num_envs, device, seed=0, interval_steps=None, env_id_offset=0):
+        self.ranges = dict(ranges)
+        self.num_envs = num_envs
+        self.device = torch.device(device)
+        self.seed = seed
+        self.env_id_offset = env_id_offset  # ハッシュに使う環境IDは env_id_offset + ローカルの環境ID
+        self.interval_steps = interval_steps  # None ならリセット時だけ選び直す
+
+        # 全パラメータを1つの (num_envs, 列数) の表にまとめ、パラメータごとの値はその列のビューにする
+        # （選び直しは列ごとのループではなく、表への1回の書き込みで済む）
+        self._columns = {}
+        low, span, is_log = [], [], []
+        for name, rng in self.ranges.items():
+            self._columns[name] = len(low)
+            if rng.distribution == "uniform":
+                lo, hi = rng.low, rng.high
+            else:
+                lo, hi = math.log(rng.low), math.log(rng.high)
+            low += [lo] * rng.width
+            span += [hi - lo] * rng.width
+            is_log += [rng.distribution == "log_uniform"] * rng.width
+        self._num_columns = len(low)
+        self._low = torch.tensor(low, device=self.device)
+        self._span = torch.tensor(span, device=self.device)
+        self._is_log = torch.tensor(is_log, device=self.device)
+        self._any_log = any(is_log)
+
+        self._table = torch.empty((num_envs, self._num_columns), device=self.device)
+        self.values = {}
+        for name, rng in self.ranges.items():
+            c = self._columns[name]
+            self.values[name] = self._table[:, c:c + rng.width]
+            self.values[name].fill_(0.5 * (rng.low + rng.high))
+
+        self.draw_count = torch.zeros(num_envs, dtype=torch.long, device=self.device)
+        self._all_ids = torch.arange(num_envs, device=self.device)
+        # 環境ごと・列ごとのハッシュの鍵は変わらないので先に計算しておく
+        self._env_keys = env_keys(num_envs, seed, env_id_offset, self.device)
+        self._col_keys = (torch.arange(self._num_columns, device=self.device) * 0xC2B2AE35) & _MASK32
+        self._step = 0
+
+    def _uniform(self, env_ids=None, draw_count=None):
+        """(len(env_ids), 列数) の [0, 1) の一様乱数（None なら全環境）。draw_count は取り出し済みの回数"""
+        if env_ids is None:
+            return hash_uniform(self._env_keys, self.draw_count, self._col_keys)
+        if draw_count is None:
+            draw_count = self.draw_count[env_ids]
+        return hash_uniform(self._env_keys[env_ids], draw_count, self._col_keys)
+
+    def _split(self, rows):
+        """(行数, 列数) の表を {名前: (行数, 幅) のビュー} に分ける"""
+        return {name: rows[:, c:c + self.ranges[name].width] for name, c in self._columns.items()}
+
+    def sample(self, env_ids=None):
+        """指定した環境（None なら全環境）のパラメータを選び直す
+
+        選び直した行だけの値 {名前: (len(env_ids), 幅)} を返すので、
+        書き込む側は表からもう一度取り出さずにそのまま使える。
+        """
+        if env_ids is None:
+            torch.addcmul(self._low, self._span, self._uniform(), out=self._table)
+            if self._any_log:
+                torch.where(self._is_log, self._table.exp(), self._table, out=self._table)
+            self.draw_count.add_(1)
+            return self.values
+        draw_count = self.draw_count[env_ids]
+        x = torch.addcmul(self._low, self._span, self._uniform(env_ids, draw_count))
+        if self._any_log:
+            x = torch.where(self._is_log, x.exp(), x)
+        self._table[env_ids] = x
+        self.draw_count[env_ids] = draw_count + 1
+        return self._split(x)
+
+    def rows(self, env_ids=None):
+        """指定した環境の今の値 {名前: (len(env_ids), 幅)}。表からの取り出しは1回だけ"""
+        if env_ids is None:
+            return self.values
+        return self._split(self._table[env_ids])
+
+    def tick(self):
+        """1ステップ進め、スケジュールで選び直すタイミングなら True を返す"""
+        self._step += 1
+        return self.interval_steps is not None and self._step % self.interval_steps == 0
+
+    def summary(self):
+        """パラメータごとの分布の要約（監査用）"""
+        result = {}
+        for name, value in self.values.items():
+            v = value.detach().cpu().numpy()
+            hist, edges = np.histogram(v, bins=10, range=(self.ranges[name].low, self.ranges[name].high))
+            result[name] = {
+                "low": self.ranges[name].low,
+                "high": self.ranges[name].high,
+                "distribution": self.ranges[name].distribution,
+                "mean": v.mean(axis=0).tolist(),
+                "std": v.std(axis=0).tolist(),
+                "min": v.min(axis=0).tolist(),
+                "max": v.max(axis=0).tolist(),
+                "histogram": hist.tolist(),
+                "bin_edges": edges.tolist(),
+            }
+        return result
+
+    def dump(self, path):
+        """現在の全環境の値を .npz に、要約を .json に書き出す"""
+        arrays = {name: v.detach().cpu().numpy() for name, v in self.values.items()}
+        np.savez(path, seed=self.seed, draw_count=self.draw_count.cpu().numpy(), **arrays)
+        with open(str(path).removesuffix(".npz") + ".json", "w") as f:
+            json.dump({"seed": self.seed, "num_envs": self.num_envs, "params": self.summary()}, f, indent=2)
+
+
+def benchmark(num_envs, steps, device, every_step=False, repeats=3):
+    """ランダム化の有無で SurrogateEnv のステップ時間を比べ、ランダム化の負担を % で返す
+
+    "reset" はリセットした環境だけ選び直す通常の使い方。
+    every_step=True なら、毎ステップ全環境を選び直す最悪の場合 "every_step" も測る。
+    計測のゆらぎを減らすため、各設定を交互に repeats 回ずつ測っていちばん速い値を使う。
+    """
+    from surrogate import SurrogateEnv
+
+    def run(interval_steps, randomize):
+        env = SurrogateEnv(num_envs, device=device)
+        env.randomizer.interval_steps = interval_steps
+        if not randomize:
+            env._apply_randomization = lambda env_ids, params=None: None
+            env.randomizer.sample = lambda env_ids=None: None
+        env.reset()
+        # 毎ステップ少しずつリセットが起こるように、環境ごとに開始位置をずらす
+        env.episode_length_buf.copy_(torch.arange(num_envs, device=env.device) % env.max_episode_length)
+        actions = torch.rand((num_envs, 3), device=env.device) * 2 - 1
+        for _ in range(10):
+            env.step(actions)
+        if env.device.type == "cuda":
+            torch.cuda.synchronize(env.device)
+        start = time.perf_counter()
+        for _ in range(steps):
+            env.step(actions)
+        if env.device.type == "cuda":
+            torch.cuda.synchronize(env.device)
+        return (time.perf_counter() - start) / steps
+
+    modes = [("base", None, False), ("reset", None, True)]
+    if every_step:
+        modes.append(("every_step", 1, True))
+    best = {name: math.inf for name, _, _ in modes}
+    for _ in range(repeats):
+        for name, interval, randomize in modes:
+            best[name] = min(best[name], run(interval, randomize))
+
+    base = best.pop("base")
+    result = {"num_envs": num_envs, "base_step_ms": base * 1e3}
+    for name, t in best.items():
+        result[name + "_step_ms"] = t * 1e3
+        result[name + "_overhead_pct"] = (t - base) / base * 100.0
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the step-time overhead of domain randomization.")
+    parser.add_argument("--num_envs", type=int, default=4096)
+    parser.add_argument("--steps", type=int, default=300)
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--every_step", action="store_true", help="Also measure resampling every step.")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+    with torch.inference_mode():
+        r = benchmark(args.num_envs, args.steps, args.device, every_step=args.every_step, repeats=args.repeats)
+    print(f"num_envs={r['num_envs']} | step without randomization {r['base_step_ms']:.3f} ms")
+    print(f"  resample on reset : {r['reset_step_ms']:.3f} ms ({r['reset_overhead_pct']:+.1f} %)")
+    if args.every_step:
+        print(f"  resample every step: {r['every_step_step_ms']:.3f} ms ({r['every_step_overhead_pct']:+.1f} %)")
+
+
+if __name__ == "__main__":
+    main()
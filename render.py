@@ -0,0 +1,255 @@
+# render.py
+#
+# 描画を物理ステップから切り離すためのスケジューラと、オフスクリーンの動画記録。
+#   - RenderScheduler: 壁時計で目標のFPSになるときだけ描画する（物理は毎ループ進める）
+#   - VideoCapture: フレームを上限付きのキューに入れ、別スレッドで動画に書き出す。
+#     キューがいっぱいのときはフレームを捨てるので、物理のループは決して待たされない
+#   - フレームの取り出し元は ViewportFrameSource（Isaac Sim のカメラ）か、
+#     CPUだけで動く DummyFrameSource（ヘッドレスのテスト用）
+#
+# 動画は ffmpeg があれば mp4 に、無ければ (フレーム数, 高さ, 幅, 3) の .npy チャンクに書き出します。
+# RenderScheduler には時計を、VideoCapture には書き出し先を作る関数を渡せるので、テストでは差し替えられます。
+#
+# 使い方（Isaac Sim 無しでの確認）:
+#   python render.py --frames 600 --fps 30 --out capture/test.mp4
+
+import argparse
+import os
+import queue
+import shutil
+import subprocess
+import threading
+import time
+
+import numpy as np
+
+
+class RenderScheduler:
+    """壁時計で target_fps になるように、描画するかどうかを決めるクラス
+
+    target_fps=None なら毎回描画、0 なら描画しない。
+    """
+
+    def __init__(self, target_fps=30.0, clock=time.perf_counter):
+        self.target_fps = target_fps
+        self.clock = clock
+        self.period = 0.0 if not target_fps else 1.0 / target_fps
+        self._next = None
+        self.rendered = 0
+        self.skipped = 0
+
+    def should_render(self):
+        if self.target_fps == 0:
+            self.skipped += 1
+            return False
+        now = self.clock()
+        if self._next is None or now >= self._next:
+            # 少しの遅れなら元の間隔を保ち、1周期以上遅れたら描画が連続しないよう「今」から数え直す
+            if self._next is not None and now - self._next < self.period:
+                self._next += self.period
+            else:
+                self._next = now + self.period
+            self.rendered += 1
+            return True
+        self.skipped += 1
+        return False
+
+
+# --- フレームの取り出し元 ---
+class DummyFrameSource:
+    """テスト用の合成フレーム。ステップ番号に応じて動く縞模様を作る"""
+
+    def __init__(self, height=240, width=320):
+        self.height = height
+        self.width = width
+        self._x = np.arange(width, dtype=np.int32)[None, :]
+        self._y = np.arange(height, dtype=np.int32)[:, None]
+        self.count = 0
+
+    def grab(self):
+        frame = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        frame[..., 0] = (self._x + self.count * 4) % 256
+        frame[..., 1] = (self._y + self.count * 2) % 256
+        frame[..., 2] = (self.count * 8) % 256
+        self.count += 1
+        return frame
+
+
+class ViewportFrameSource:
+    """Isaac Sim のカメラから RGB フレームを取り出す。選んだ環境が画面に入るようにカメラを向ける"""
+
+    def __init__(self, sim, env_origins, env_ids=None, resolution=(640, 480),
+                 camera_path="/OmniverseKit_Persp", distance=2.5):
+        import omni.replicator.core as rep
+
+        # --- 1. 選んだ環境の中心を見るようにカメラを置く ---
+        origins = env_origins if env_ids is None else env_origins[list(env_ids)]
+        origins = origins.detach().cpu().numpy()
+        center = origins.mean(axis=0)
+        spread = float(np.ptp(origins[:, :2], axis=0).max()) if len(origins) > 1 else 0.0
+        d = distance + spread
+        sim.set_camera_view(eye=(center + np.array([d, d, 0.6 * d])).tolist(), target=center.tolist())
+
+        # --- 2. カメラの画像を受け取るアノテーター ---
+        self._product = rep.create.render_product(camera_path, resolution)
+        self._annotator = rep.AnnotatorRegistry.get_annotator("rgb")
+        self._annotator.attach([self._product])
+
+    def grab(self):
+        data = self._annotator.get_data()
+        if data is None or data.size == 0:
+            return None
+        return np.ascontiguousarray(data[..., :3])
+
+
+# --- 動画の書き出し ---
+class _FfmpegWriter:
+    """ffmpeg の標準入力に生のRGBを流し込んで mp4 にする"""
+
+    def __init__(self, path, fps, height, width):
+        cmd = [
+            shutil.which("ffmpeg"), "-y", "-loglevel", "error",
+            "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{width}x{height}", "-r", str(fps), "-i", "-",
+            "-pix_fmt", "yuv420p", path,
+        ]
+        self._proc = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+        self.output = path
+
+    def write(self, frame):
+        self._proc.stdin.write(frame.tobytes())
+
+    def close(self):
+        self._proc.stdin.close()
+        self._proc.wait()
+
+
+class _NpyWriter:
+    """ffmpeg が無いときの代わり。chunk_len フレームずつ .npy に書き出す"""
+
+    def __init__(self, path, chunk_len=120):
+        self.prefix = os.path.splitext(path)[0]
+        self.output = self.prefix + "_*.npy"
+        self.chunk_len = chunk_len
+        self._frames = []
+        self._chunk = 0
+
+    def write(self, frame):
+        self._frames.append(frame)
+        if len(self._frames) == self.chunk_len:
+            self._flush()
+
+    def _flush(self):
+        if self._frames:
+            np.save(f"{self.prefix}_{self._chunk:06d}.npy", np.stack(self._frames))
+            self._frames = []
+            self._chunk += 1
+
+    def close(self):
+        self._flush()
+
+
+def open_writer(path, fps, height, width):
+    """ffmpeg があれば mp4 に、無ければ .npy のチャンクに書き出すライターを返す"""
+    if shutil.which("ffmpeg"):
+        return _FfmpegWriter(path, fps, height, width)
+    return _NpyWriter(path)
+
+
+class VideoCapture:
+    """フレームを上限付きキューで別スレッドに渡し、動画に書き出すクラス
+
+    writer_factory: (path, fps, 高さ, 幅) から write(frame) / close() を持つライターを作る関数。
+    最初のフレームが来たときに書き出しスレッドで1回だけ呼ぶ（既定は open_writer）。
+    """
+
+    def __init__(self, path, fps=30.0, max_queue=8, writer_factory=open_writer):
+        self.path = path
+        self.fps = fps
+        self._open_writer = writer_factory
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._queue = queue.Queue(maxsize=max_queue)
+        self.submitted = 0
+        self.dropped = 0
+        self.written = 0
+        self.error = None
+        self.output = path  # 実際の書き出し先（ffmpeg が無ければ .npy のチャンク）
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+
+    def submit(self, frame):
+        """フレームを渡す。キューがいっぱいなら捨てて False を返す（待たない）"""
+        if frame is None:
+            return False
+        try:
+            self._queue.put_nowait(frame)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.submitted += 1
+        return True
+
+    def _write_loop(self):
+        writer = None
+        try:
+            while True:
+                frame = self._queue.get()
+                if frame is None:
+                    break
+                if writer is None:
+                    # 最初のフレームの大きさで書き出し先を決める
+                    writer = self._open_writer(self.path, self.fps, frame.shape[0], frame.shape[1])
+                    self.output = getattr(writer, "output", self.path)
+                writer.write(frame)
+                self.written += 1
+        except Exception as e:  # 書き出しに失敗しても物理のループは止めない
+            self.error = e
+        finally:
+            if writer is not None:
+                writer.close()
+
+    def close(self):
+        """残りのフレームを書き終えてから終了する"""
+        # 書き出しスレッドが失敗で止まっていると、キューが空かないので待ち続けないようにする
+        while self._writer.is_alive():
+            try:
+                self._queue.put(None, timeout=0.1)
+                break
+            except queue.Full:
+                continue
+        self._writer.join()
+        if self.error is not None:
+            print(f"[VideoCapture] 書き出しに失敗しました: {self.error}")
+
+    def stats(self):
+        return f"capture: {self.written} written, {self.dropped} dropped -> {self.output}"
+
+
+def main():
+    """ダミーのフレームと、決まった時間がかかる偽の物理ステップで動作を確かめる"""
+    parser = argparse.ArgumentParser(description="Headless check of the render scheduler and video capture.")
+    parser.add_argument("--frames", type=int, default=600, help="Number of physics loop iterations.")
+    parser.add_argument("--physics_hz", type=float, default=200.0, help="Simulated physics rate.")
+    parser.add_argument("--fps", type=float, default=30.0, help="Target render/capture FPS.")
+    parser.add_argument("--out", default="capture/dummy.mp4")
+    args = parser.parse_args()
+
+    scheduler = RenderScheduler(args.fps)
+    source = DummyFrameSource()
+    capture = VideoCapture(args.out, fps=args.fps)
+    worst = 0.0
+    start = time.perf_counter()
+    for _ in range(args.frames):
+        t0 = time.perf_counter()
+        time.sleep(1.0 / args.physics_hz)  # 物理ステップの代わり
+        if scheduler.should_render():
+            capture.submit(source.grab())
+        worst = max(worst, time.perf_counter() - t0)
+    elapsed = time.perf_counter() - start
+    capture.close()
+    print(f"{args.frames} steps in {elapsed:.2f} s | rendered {scheduler.rendered} "
+          f"({scheduler.rendered / elapsed:.1f} fps) | worst step {worst * 1e3:.2f} ms")
+    print(capture.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+# replay.py
+#
+# コントローラの入出力を記録したデータセット（TelemetryRecorder の出力 + index.json）を読み、
+# 新しいコントローラで同じ入力を再生して、出力（トルク）の差を調べる回帰テスト用のツール。
+#   - DatasetReader はチャンクを mmap で開き、チャンク内の区間はコピー無しのビューで返す
+#   - 再生はGUIもIsaac Simも使わず、チャンク単位でまとめて処理する
+#
+# 記録のしかた（1ステップごと、controller.apply() の直後に）:
+#   recording = ControllerRecording(controller, num_joints, out_dir="golden", joint_ids=(wrist_id, grip_id))
+#   recording.record(actions, q)
+#   recording.mark_reset(env_ids)   # controller.reset(env_ids) を呼んだとき
+# PorcaroTask の環境なら env.start_controller_recording("golden") だけで、この3つが自動で行われる。
+# 記録を始めたときの遅れ (actuation) の状態は initial_state.npz に保存し、再生の最初に読み込む。
+#
+# 使い方:
+#   python replay.py golden/ --tol 0
+
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+import torch
+
+try:  # パッケージとして読み込まれたとき（porcaro_task.py から）
+    from .actions.actuation import ActuationDynamics
+    from .actions.torque import TorqueActionController
+    from .telemetry import TelemetryRecorder
+except ImportError:  # リポジトリ直下のスクリプトから
+    from actions.actuation import ActuationDynamics
+    from actions.torque import TorqueActionController
+    from telemetry import TelemetryRecorder
+
+INITIAL_STATE_FILE = "initial_state.npz"
+
+
+class DatasetReader:
+    """index.json を読み、チャンネルの任意の区間を返すクラス"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "index.json")) as f:
+            self.index = json.load(f)
+        self.channels = self.index["channels"]
+        self.meta = self.index["meta"]
+        self.num_envs = self.index["num_envs"]
+        self.chunks = self.index["chunks"]
+        self.num_steps = sum(c["length"] for c in self.chunks)
+        self._cache = {}
+
+    def _chunk(self, name, i):
+        key = (name, i)
+        if key not in self._cache:
+            path = os.path.join(self.path, f"{name}_{self.chunks[i]['chunk']:06d}.npy")
+            # "c" (コピーオンライト) なら書き込み可能なビューになり、torch.from_numpy でもコピーされない
+            self._cache[key] = np.load(path, mmap_mode="c")
+        return self._cache[key]
+
+    def slice(self, name, start, stop):
+        """ステップ [start, stop) の値 (ステップ数, num_envs, 幅)。1チャンクに収まればコピー無し"""
+        parts = []
+        for i, c in enumerate(self.chunks):
+            lo, hi = max(start, c["start"]), min(stop, c["start"] + c["length"])
+            if lo < hi:
+                parts.append(self._chunk(name, i)[lo - c["start"]:hi - c["start"]])
+        if len(parts) == 1:
+            return parts[0]
+        return np.concatenate(parts)
+
+    def iter_chunks(self, names):
+        """チャンクごとに (開始ステップ, {チャンネル名: ビュー}) を返す"""
+        for i, c in enumerate(self.chunks):
+            yield c["start"], {name: self._chunk(name, i)[:c["length"]] for name in names}
+
+
+# --- 記録 ---
+def controller_meta(controller, joint_ids):
+    """再生用にコントローラを作り直すための情報"""
+    meta = {
+        "dt_ctrl": controller.dt_ctrl,
+        "joint_ids": list(joint_ids),
+        "max_stretch": controller.max_stretch,
+        "actuation": None,
+    }
+    if controller.actuation is not None:
+        meta["actuation"] = {"dt": controller.actuation.dt, "history": controller.actuation.history}
+    return meta
+
+
+class ControllerRecording:
+    """コントローラの入力・パラメータ・出力を毎ステップ記録する（TelemetryRecorder を使う）"""
+
+    def __init__(self, controller, num_joints, out_dir, joint_ids, chunk_len=1000):
+        self.controller = controller
+        channels = {"actions": 3, "joint_pos": num_joints, "torque": 2, "params": 3, "reset": 1}
+        if controller.actuation is not None:
+            channels["actuation"] = 6
+        self.recorder = TelemetryRecorder(
+            channels, controller.num_envs, controller.device, out_dir=out_dir, chunk_len=chunk_len,
+            meta=controller_meta(controller, joint_ids),
+        )
+        if controller.actuation is not None:
+            # 記録を始めた時点の圧力の履歴と実際の圧力（履歴は最も古い値が先頭になるように並べ直す）
+            a = controller.actuation
+            np.savez(os.path.join(out_dir, INITIAL_STATE_FILE),
+                     buffer=torch.roll(a.buffer, -a._head, dims=1).cpu().numpy(),
+                     pressure=a.pressure.cpu().numpy())
+        n, dev = controller.num_envs, controller.device
+        self._params = torch.zeros((n, 3), device=dev)
+        self._actuation = torch.zeros((n, 6), device=dev)
+        self._reset = torch.zeros((n, 1), device=dev)
+
+    def mark_reset(self, env_ids=None):
+        """コントローラをリセットした環境に印をつける（次の record() で記録される）"""
+        if env_ids is None:
+            self._reset.fill_(1.0)
+        else:
+            self._reset[env_ids] = 1.0
+
+    def record(self, actions, q):
+        c = self.controller
+        torch.cat((c.r_buf, c.L_buf, c.Pmax_buf), dim=1, out=self._params)
+        values = {"actions": actions, "joint_pos": q, "torque": c.torque, "params": self._params,
+                  "reset": self._reset}
+        if c.actuation is not None:
+            self._actuation[:, :3] = c.actuation.delay
+            self._actuation[:, 3:] = c.actuation.alpha
+            values["actuation"] = self._actuation
+        self.recorder.record(**values)
+        self._reset.zero_()
+
+    def close(self):
+        self.recorder.close()
+
+
+# --- 再生 ---
+def build_controller(meta, num_envs, device="cpu"):
+    """記録のメタ情報から、現在のコードのコントローラを作る"""
+    actuation = None
+    if meta.get("actuation"):
+        actuation = ActuationDynamics(dt=meta["actuation"]["dt"], history=meta["actuation"]["history"])
+    return TorqueActionController(
+        dt_ctrl=meta["dt_ctrl"], max_stretch=meta["max_stretch"],
+        actuation=actuation, num_envs=num_envs, device=device,
+    )
+
+
+def load_initial_state(controller, path):
+    """記録を始めた時点の遅れの状態をコントローラに書き込む（作りたてのコントローラに使う）"""
+    state_path = os.path.join(path, INITIAL_STATE_FILE)
+    if not os.path.exists(state_path):
+        raise ValueError(f"{path} に {INITIAL_STATE_FILE} がありません。遅れのある記録は最初の状態が無いと再生できません。"
+                         "記録し直してください。")
+    a = controller.actuation
+    state = np.load(state_path)
+    a.buffer.copy_(torch.from_numpy(state["buffer"]))
+    a.pressure.copy_(torch.from_numpy(state["pressure"]))
+    a._head = 0
+
+
+def replay(path, device="cpu", tol=0.0):
+    """データセットを再生して、記録されたトルクとの差をまとめた辞書を返す
+
+    遅れ (actuation) が無ければコントローラは状態を持たないので、
+    チャンク全体を (ステップ数 * num_envs) 個の環境として1回で計算する。
+    遅れがある場合は状態を引き継ぐため、記録を始めた時点の状態を読み込んでから、チャンク内をステップ順に計算する。
+    """
+    reader = DatasetReader(path)
+    meta = reader.meta
+    joint_ids = tuple(meta["joint_ids"])
+    names = ["actions", "joint_pos", "torque", "params", "reset"]
+    stateful = bool(meta.get("actuation"))
+    if stateful:
+        names.append("actuation")
+        controller = build_controller(meta, reader.num_envs, device)
+        load_initial_state(controller, path)
+
+    max_diff = 0.0
+    first_mismatch = None
+    for start, views in reader.iter_chunks(names):
+        t = {k: torch.from_numpy(v).to(device) for k, v in views.items()}
+        steps, n = t["actions"].shape[:2]
+
+        if stateful:
+            out = torch.zeros((steps, n, 2), device=device)
+            for k in range(steps):
+                reset = t["reset"][k, :, 0] > 0
+                controller.reset(reset)
+                p = t["params"][k]
+                controller.set_params(r=p[:, 0], L=p[:, 1], Pmax=p[:, 2])
+                controller.actuation.delay.copy_(t["actuation"][k, :, :3])
+                controller.actuation.alpha.copy_(t["actuation"][k, :, 3:])
+                out[k] = controller.compute(t["actions"][k].clamp(-1.0, 1.0), t["joint_pos"][k], joint_ids)
+        else:
+            flat = build_controller(meta, steps * n, device)
+            p = t["params"].reshape(steps * n, 3)
+            flat.set_params(r=p[:, 0], L=p[:, 1], Pmax=p[:, 2])
+            out = flat.compute(
+                t["actions"].reshape(steps * n, 3).clamp(-1.0, 1.0),
+                t["joint_pos"].reshape(steps * n, -1), joint_ids,
+            ).view(steps, n, 2)
+
+        diff = (out - t["torque"]).abs()
+        max_diff = max(max_diff, diff.max().item())
+        bad = (diff > tol).any(dim=-1).nonzero()
+        if first_mismatch is None and len(bad) > 0:
+            step, env = bad[0].tolist()
+            first_mismatch = {"step": start + step, "env": env,
+                              "recorded": t["torque"][step, env].tolist(), "replayed": out[step, env].tolist()}
+
+    return {"steps": reader.num_steps, "num_envs": reader.num_envs, "max_abs_diff": max_diff,
+            "first_mismatch": first_mismatch, "passed": first_mismatch is None}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded controller dataset and diff the torques.")
+    parser.add_argument("path", help="Dataset directory (contains index.json).")
+    parser.add_argument("--tol", type=float, default=0.0, help="Allowed absolute torque difference [Nm].")
+    parser.add_argument("--device", default="cpu")
+    args = parser.parse_args()
+
+    with torch.inference_mode():
+        result = replay(args.path, args.device, args.tol)
+    print(json.dumps(result, indent=2))
+    sys.exit(0 if result["passed"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+# rhythm.py
+#
+# ドラムパターン（テキスト形式）を読み込み、「次の目標打撃までの時間」「その強さ」
+# 「前の目標打撃からの時間」を引くための表を起動時にデバイス上へ作っておくモジュール。
+# 毎ステップの処理は表からの gather だけで、Pythonでの解析や探索はしません。
+# 位相は dt の整数倍（ステップ数）で持つので、表を引く時刻はいつも表の刻みとぴったり一致します。
+#
+# テキスト形式の例（1文字 = 1サブディビジョン、X: アクセント、x: 通常、.: 休み、| と空白は無視）:
+#
+#     tempo=120 div=4
+#     X...x...|X.x.x...
+
+import torch
+
+try:
+    from .randomization import env_keys, hash_uniform
+except ImportError:
+    from randomization import env_keys, hash_uniform
+
+ACCENT_VELOCITY = 1.0
+NORMAL_VELOCITY = 0.6
+
+# observe() の列の並び
+TIME_TO_NEXT, NEXT_VELOCITY, TIME_SINCE_LAST = 0, 1, 2
+
+# 位相の乱数の列の鍵（DomainRandomizer の列の鍵と重ならない値）
+_PHASE_KEY = 0x27D4EB2F
+
+
+class Pattern:
+    """1つのドラムパターン。hits は (拍の位置, 強さ) のリスト"""
+
+    def __init__(self, tempo, hits, length_beats, name=""):
+        self.tempo = float(tempo)
+        self.hits = sorted((float(b), float(v)) for b, v in hits)
+        self.length_beats = float(length_beats)
+        self.name = name
+        if not self.hits:
+            raise ValueError(f"パターン '{name}' に打撃がありません。")
+
+    @property
+    def seconds_per_beat(self):
+        return 60.0 / self.tempo
+
+    @property
+    def length(self):
+        """1周の長さ [s]"""
+        return self.length_beats * self.seconds_per_beat
+
+    def hit_times(self):
+        return [(b * self.seconds_per_beat, v) for b, v in self.hits]
+
+
+def parse_pattern(text, name=""):
+    """テキスト形式のパターンを Pattern に変換する"""
+    tempo, div = 120.0, 4
+    steps = []
+    for line in text.strip().splitlines():
+        line = line.split("#")[0].strip()
+        if not line:
+            continue
+        if "=" in line:
+            # ヘッダ行  例: tempo=120 div=4
+            for token in line.split():
+                key, value = token.split("=")
+                if key == "tempo":
+                    tempo = float(value)
+                elif key in ("div", "subdivision"):
+                    div = int(value)
+                else:
+                    raise ValueError(f"不明なキーです: {key}")
+            continue
+        for ch in line:
+            if ch in "| \t":
+                continue
+            if ch not in "Xx.":
+                raise ValueError(f"不明な記号です: {ch!r}")
+            steps.append(ch)
+
+    hits = []
+    for i, ch in enumerate(steps):
+        if ch == "X":
+            hits.append((i / div, ACCENT_VELOCITY))
+        elif ch == "x":
+            hits.append((i / div, NORMAL_VELOCITY))
+    return Pattern(tempo, hits, len(steps) / div, name=name)
+
+
+class RhythmScore:
+    """複数のパターンを1本の表にまとめ、環境ごとに パターン と 位相 を割り当てるクラス"""
+
+    def __init__(self, patterns, num_envs, dt, device, seed=0, env_id_offset=0):
+        self.patterns = [parse_pattern(p) if isinstance(p, str) else p for p in patterns]
+        self.num_envs = num_envs
+        self.dt = dt
+        self.device = torch.device(device)
+        self.seed = seed
+        self.env_id_offset = env_id_offset  # 位相の乱数に使う環境IDは env_id_offset + ローカルの環境ID
+
+        # --- 1. パターンごとに dt 刻みの表を作り、1本につなげる ---
+        to_next, next_vel, since_last, offsets, lengths = [], [], [], [], []
+        for pattern in self.patterns:
+            offsets.append(len(to_next))
+            lengths.append(pattern.length)
+            times = pattern.hit_times()
+            # 1周前と1周後の打撃も並べておけば、周の境目をまたいでも探せる
+            ext = ([(t - pattern.length, v) for t, v in times] + times
+                   + [(t + pattern.length, v) for t, v in times])
+            num_ticks = max(1, int(pattern.length / dt + 0.5))
+            j = 0
+            for k in range(num_ticks):
+                t = k * dt
+                while ext[j + 1][0] <= t:
+                    j += 1
+                # ext[j] が t 以前で最後の打撃、ext[j + 1] が t より後の最初の打撃。
+                # 差は float64 のまま計算しておく（float32 で引くと 0 付近で符号が変わることがある）
+                since_last.append(t - ext[j][0])
+                to_next.append(ext[j + 1][0] - t)
+                next_vel.append(ext[j + 1][1])
+
+        self.to_next = torch.tensor(to_next, device=self.device)
+        self.next_velocity = torch.tensor(next_vel, device=self.device)
+        self.since_last = torch.tensor(since_last, device=self.device)
+        self.offsets = torch.tensor(offsets, device=self.device)
+        self.lengths = torch.tensor(lengths, device=self.device)
+        self._num_ticks = torch.tensor(
+            [max(1, int(length / dt + 0.5)) for length in lengths], device=self.device)
+
+        # --- 2. 環境ごとの割り当て（パターン番号と位相 [ステップ]） ---
+        self.env_pattern = torch.arange(num_envs, device=self.device) % len(self.patterns)
+        self.env_phase = torch.zeros(num_envs, dtype=torch.long, device=self.device)
+        self.draw_count = torch.zeros(num_envs, dtype=torch.long, device=self.device)
+        self._all_ids = torch.arange(num_envs, device=self.device)
+        self._env_keys = env_keys(num_envs, seed, env_id_offset, self.device)
+        self._phase_key = torch.tensor([_PHASE_KEY], device=self.device)
+
+        # --- 3. 毎ステップ上書きするバッファ ---
+        self.obs = torch.zeros((num_envs, 3), device=self.device)
+        self.target = torch.zeros(num_envs, device=self.device)
+        self._idx = torch.zeros(num_envs, dtype=torch.long, device=self.device)
+
+    def assign(self, env_ids=None, pattern_ids=None, phases=None):
+        """環境のパターンと位相を書き換える（phases は秒で渡し、いちばん近いステップに丸める）"""
+        if env_ids is None:
+            env_ids = slice(None)
+        if pattern_ids is not None:
+            self.env_pattern[env_ids] = torch.as_tensor(pattern_ids, device=self.device)
+        if phases is not None:
+            phases = torch.as_tensor(phases, dtype=torch.float64, device=self.device)
+            self.env_phase[env_ids] = torch.round(phases / self.dt).long()
+
+    def randomize_phase(self, env_ids=None):
+        """位相をパターン1周の中でランダムに選び直す
+
+        乱数は DomainRandomizer と同じく (seed, 全体での環境ID, 何回目か) から作るので、
+        どの環境がいっしょにリセットされたかに関係なく環境ごとに同じ位相が再現される。
+        """
+        if env_ids is None:
+            env_ids = self._all_ids
+        u = hash_uniform(self._env_keys[env_ids], self.draw_count[env_ids], self._phase_key)[:, 0]
+        num_ticks = self._num_ticks[self.env_pattern[env_ids]]
+        self.env_phase[env_ids] = torch.minimum((u * num_ticks).long(), num_ticks - 1)
+        self.draw_count[env_ids] += 1
+
+    def _lookup(self, steps):
+        """各環境の表のインデックスを計算する"""
+        # 整数のステップ数で1周の中の位置を出すので、時刻が表の刻みからずれることはない
+        torch.add(steps, self.env_phase, out=self._idx)
+        torch.remainder(self._idx, self._num_ticks[self.env_pattern], out=self._idx)
+        self._idx.add_(self.offsets[self.env_pattern])
+
+    def observe(self, steps):
+        """(num_envs, 3) の [次の目標までの時間, 次の目標の強さ, 前の目標からの時間] を返す
+
+        steps: (num_envs,) 各環境のエピソード内ステップ数（episode_length_buf）
+        """
+        self._lookup(steps)
+        self.obs[:, TIME_TO_NEXT] = self.to_next[self._idx]
+        self.obs[:, NEXT_VELOCITY] = self.next_velocity[self._idx]
+        self.obs[:, TIME_SINCE_LAST] = self.since_last[self._idx]
+        return self.obs
+
+    def target_time(self, steps):
+        """各環境の時間軸（エピソード開始からの秒数）で、一番近い目標打撃の時刻を返す"""
+        obs = self.observe(steps)
+        # 前の目標と次の目標の近い方
+        torch.where(
+            obs[:, TIME_TO_NEXT] < obs[:, TIME_SINCE_LAST],
+            obs[:, TIME_TO_NEXT], -obs[:, TIME_SINCE_LAST], out=self.target,
+        )
+        self.target.add_(steps * self.dt)
+        return self.target
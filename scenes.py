@@ -0,0 +1,125 @@
+# scenes.py
+#
+# standalone_robot_test.py のテストシーン（筋肉への圧力指令パターン）をまとめたライブラリ。
+# シーンは起動時に一度だけ (シーン数, ステップ数, 3) のアクション表へ変換しておき、
+# シミュレーションループでは表を引くだけにします。
+
+import math
+
+import torch
+
+# 圧力の並び順は TorqueActionController と同じ [DF, F, G]
+P_MAX = 0.6          # [MPa]
+SINE_FREQ = 0.5      # [Hz]
+
+# シーン番号 -> 圧力パターン関数 の登録表
+SCENES = {}
+
+
+def register_scene(scene_id, description="", periodic=True):
+    """時刻テンソル t (T,) から圧力 (T, 3) [MPa] を返す関数をシーンとして登録するデコレータ
+
+    periodic: 表の末尾まで来たら最初に戻るか。False なら最後の値を保ち続ける（ステップ入力など）
+    """
+    def decorator(fn):
+        fn.description = description
+        fn.periodic = periodic
+        SCENES[scene_id] = fn
+        return fn
+    return decorator
+
+
+def pressure_to_action(p_mpa, p_max=P_MAX):
+    """圧力P [MPa] からアクションa [-1, 1] への変換  (P = (a + 1) * 0.5 * P_max)"""
+    return p_mpa / (0.5 * p_max) - 1.0
+
+
+def _sine_pressure(t):
+    # 0 ~ P_MAX の間で変化するsin波
+    return (torch.sin(2.0 * math.pi * SINE_FREQ * t) + 1.0) * 0.5 * P_MAX
+
+
+@register_scene(0, "Wrist sine wave (DF/F antagonistic)")
+def wrist_sine(t):
+    p = torch.zeros(t.shape[0], 3, dtype=t.dtype, device=t.device)
+    p[:, 0] = _sine_pressure(t)
+    p[:, 1] = P_MAX - p[:, 0]  # 拮抗筋は逆の圧力
+    return p
+
+
+@register_scene(1, "DF muscle sine wave")
+def df_sine(t):
+    p = torch.zeros(t.shape[0], 3, dtype=t.dtype, device=t.device)
+    p[:, 0] = _sine_pressure(t)
+    return p
+
+
+@register_scene(2, "F muscle sine wave")
+def f_sine(t):
+    p = torch.zeros(t.shape[0], 3, dtype=t.dtype, device=t.device)
+    p[:, 1] = _sine_pressure(t)
+    return p
+
+
+@register_scene(3, "G muscle sine wave")
+def g_sine(t):
+    p = torch.zeros(t.shape[0], 3, dtype=t.dtype, device=t.device)
+    p[:, 2] = _sine_pressure(t)
+    return p
+
+
+@register_scene(4, "G muscle step pressure", periodic=False)
+def g_step(t, step_duration=2.0):
+    # 2秒ごとに0.1MPaずつ、最大0.6MPaまで加圧
+    p = torch.zeros(t.shape[0], 3, dtype=t.dtype, device=t.device)
+    p[:, 2] = (torch.floor(t / step_duration) * 0.1).clamp(max=P_MAX)
+    return p
+
+
+class SceneCommands:
+    """コンパイル済みのアクション表。環境ごとに別のシーンを割り当てられる"""
+
+    def __init__(self, scene_ids, num_envs, dt, duration, device, p_max=P_MAX):
+        self.scene_ids = list(scene_ids)
+        self.num_envs = num_envs
+        self.dt = dt
+        self.num_steps = max(1, int(round(duration / dt)))
+        self.device = torch.device(device)
+
+        # --- 1. 全シーンを (シーン数, ステップ数, 3) の表にまとめて計算 ---
+        t = torch.arange(self.num_steps, dtype=torch.float32) * dt
+        pressures = torch.stack([SCENES[i](t) for i in self.scene_ids])
+        self.pressure_table = pressures.to(self.device)
+        self.action_table = pressure_to_action(pressures, p_max).to(self.device)
+        # 周期的でないシーンは、表の末尾を過ぎたら最後の値を保つ
+        self.periodic = torch.tensor([SCENES[i].periodic for i in self.scene_ids], device=self.device)
+        self._scene_index = torch.arange(len(self.scene_ids), device=self.device)
+        self._step_index = torch.zeros(len(self.scene_ids), dtype=torch.long, device=self.device)
+
+        # --- 2. 環境 -> シーン の割り当て（シーンを順番に繰り返す） ---
+        self.env_scene = torch.arange(num_envs, device=self.device) % len(self.scene_ids)
+
+        # --- 3. 毎ステップ上書きする出力バッファ ---
+        self.actions = torch.zeros((num_envs, 3), device=self.device)
+
+    def assign(self, env_scene):
+        """環境ごとのシーン割り当てを書き換える（self.scene_ids の中の位置で指定）"""
+        self.env_scene.copy_(torch.as_tensor(env_scene, device=self.device))
+
+    def _rows(self, table, step):
+        """ステップ番号に対応するシーンごとの行 (シーン数, 3)"""
+        if step < self.num_steps:
+            return table[:, step]
+        # 周期的なシーンは最初に戻り、そうでないシーンは最後の値のまま
+        self._step_index.fill_(step % self.num_steps)
+        self._step_index.masked_fill_(~self.periodic, self.num_steps - 1)
+        return table[self._scene_index, self._step_index]
+
+    def actions_at(self, step):
+        """ステップ番号に対応する全環境分のアクションを返す"""
+        torch.index_select(self._rows(self.action_table, step), 0, self.env_scene, out=self.actions)
+        return self.actions
+
+    def pressure_at(self, step):
+        """ステップ番号に対応するシーンごとの圧力 (シーン数, 3) [MPa]"""
+        return self._rows(self.pressure_table, step)
@@ -0,0 +1,217 @@
+# snapshot.py
+#
+# 環境の状態をまとめて保存・復元するツール（ウォームスタートや途中からの分岐に使う）。
+#   - ロボットとドラムスタンドの関節状態・ルート状態（位置は環境の原点からの相対値で保存）
+#   - TorqueActionController（バルブの遅れ・圧力の立ち上がりを含む）の内部状態
+#   - エピソードの経過ステップ、リズムの割り当て、打撃検出と接触力の履歴、ドメインランダム化の値
+#   - 乱数の状態と、観測の正規化の統計（全環境に書き戻すときだけ復元）
+# 保存形式は .npz（圧縮）で、環境ごとのテンソルは先頭の次元が環境。
+# 復元先は env_ids で選べ、1環境分の状態を何千もの環境に配ることもできます。
+#
+# env_cfg.py の環境でも surrogate.py の SurrogateEnv でも、同じ属性名なのでそのまま使えます。
+#
+# 使い方（サロゲートで、落ち着いた状態を配ってから分岐が元の続きと一致するか確かめる）:
+#   python snapshot.py --settle 100 --num_envs 4096 --out settled.npz
+
+import argparse
+import json
+import time
+
+import numpy as np
+import torch
+
+FORMAT_VERSION = 3
+ASSETS = ("robot", "drum_stand")
+CONTROLLER_FIELDS = ("pressure_cmd", "pressure", "contraction", "force", "torque", "r_buf", "L_buf", "Pmax_buf")
+ACTUATION_FIELDS = ("pressure", "delay", "alpha")
+STRIKE_FIELDS = ("time", "force", "in_contact", "refractory", "hit_onset", "hit_peak", "hit_impulse",
+                 "events", "event_count", "new_hit", "hit_done")
+RHYTHM_FIELDS = ("env_pattern", "env_phase", "draw_count")
+
+
+def _tensor_fields(env):
+    """その場で行を書き換えて復元できる、環境ごとのテンソル {キー: テンソル}"""
+    fields = {"env/episode_length_buf": env.episode_length_buf, "env/actions": env.actions}
+    controller = env.action_controller
+    for name in CONTROLLER_FIELDS:
+        fields["controller/" + name] = getattr(controller, name)
+    if controller.actuation is not None:
+        for name in ACTUATION_FIELDS:
+            fields["actuation/" + name] = getattr(controller.actuation, name)
+    for name in STRIKE_FIELDS:
+        fields["strike/" + name] = getattr(env.strike_detector, name)
+    fields["contact/net_forces_w_history"] = env.contact_sensor.data.net_forces_w_history
+    for name in RHYTHM_FIELDS:
+        fields["rhythm/" + name] = getattr(env.rhythm, name)
+    for name, value in env.randomizer.values.items():
+        fields["randomizer/" + name] = value
+    fields["randomizer/draw_count"] = env.randomizer.draw_count
+    return fields
+
+
+def _assets(env):
+    return {name: env.scene[name] for name in ASSETS}
+
+
+# --- 1. 保存 ---
+def capture_state(env, env_ids=None):
+    """指定した環境（None なら全環境）の状態を {キー: CPUテンソル} にまとめて返す"""
+    if env_ids is None:
+        env_ids = torch.arange(env.num_envs, device=env.device)
+    env_ids = torch.as_tensor(env_ids, device=env.device)
+    origins = env.scene.env_origins[env_ids]
+    state = {}
+
+    # --- 1-1. アセットの状態（位置は環境の原点からの相対値にして、別の環境にも戻せるようにする） ---
+    for name, asset in _assets(env).items():
+        root = asset.data.root_state_w[env_ids].clone()
+        root[:, :3] -= origins
+        state[name + "/root_state"] = root
+        if asset.data.joint_pos.shape[1] > 0:
+            state[name + "/joint_pos"] = asset.data.joint_pos[env_ids]
+            state[name + "/joint_vel"] = asset.data.joint_vel[env_ids]
+
+    # --- 1-2. コントローラ・打撃検出・リズム・ランダム化など ---
+    for key, tensor in _tensor_fields(env).items():
+        state[key] = tensor[env_ids]
+    actuation = env.action_controller.actuation
+    if actuation is not None:
+        # 指令の履歴はリングバッファなので、先頭 (head) が 0 番目に来るように並べ替えて保存する
+        state["actuation/buffer"] = torch.roll(actuation.buffer[env_ids], -actuation._head, dims=1)
+
+    # --- 1-3. 全環境で共通の状態 ---
+    state["global/torch_rng"] = torch.get_rng_state()
+    if torch.cuda.is_available():
+        state["global/cuda_rng"] = torch.cuda.get_rng_state()
+    state["global/randomizer_step"] = torch.tensor(env.randomizer._step)
+    normalizer = getattr(env, "obs_normalizer", None)
+    if normalizer is not None:
+        for name, value in normalizer.state_dict().items():
+            state["global/normalizer_" + name] = torch.as_tensor(value)
+    return {k: v.detach().cpu() for k, v in state.items()}
+
+
+def save_state(path, state):
+    """状態を圧縮した .npz に書き出す"""
+    num_envs = state["robot/root_state"].shape[0]
+    meta = {"version": FORMAT_VERSION, "num_envs": num_envs, "keys": sorted(state)}
+    arrays = {k.replace("/", "."): v.numpy() for k, v in state.items()}
+    np.savez_compressed(path, __meta__=np.frombuffer(json.dumps(meta).encode(), dtype=np.uint8), **arrays)
+
+
+def load_state(path):
+    """save_state() で書き出した状態を読み込む"""
+    with np.load(path) as f:
+        meta = json.loads(f["__meta__"].tobytes())
+        if meta["version"] != FORMAT_VERSION:
+            raise ValueError(f"{path} の形式 (version {meta['version']}) には対応していません")
+        return {k: torch.from_numpy(f[k.replace("/", ".")]) for k in meta["keys"]}
+
+
+# --- 2. 復元 ---
+def restore_state(env, state, env_ids=None, src_ids=None, restore_globals=None):
+    """状態を env_ids の環境に書き戻す
+
+    src_ids: env_ids のそれぞれに、保存した何番目の環境を使うか。
+             省略すると順番に割り当て、保存した環境が足りなければ繰り返す（1環境分なら全てに配る）。
+    restore_globals: 乱数と正規化の統計も戻すか。省略すると全環境に書き戻すときだけ戻す。
+    """
+    dev = env.device
+    if env_ids is None:
+        env_ids = torch.arange(env.num_envs, device=dev)
+    env_ids = torch.as_tensor(env_ids, device=dev)
+    num_saved = state["robot/root_state"].shape[0]
+    if src_ids is None:
+        src_ids = torch.arange(len(env_ids)) % num_saved
+    src_ids = torch.as_tensor(src_ids).cpu()
+
+    def rows(key):
+        return state[key][src_ids].to(dev)
+
+    # --- 2-1. アセット（シミュレータに書き込む） ---
+    origins = env.scene.env_origins[env_ids]
+    for name, asset in _assets(env).items():
+        root = rows(name + "/root_state")
+        root[:, :3] += origins
+        asset.write_root_pose_to_sim(root[:, :7], env_ids=env_ids)
+        asset.write_root_velocity_to_sim(root[:, 7:], env_ids=env_ids)
+        if name + "/joint_pos" in state:
+            asset.write_joint_state_to_sim(rows(name + "/joint_pos"), rows(name + "/joint_vel"), env_ids=env_ids)
+
+    # --- 2-2. コントローラなどのテンソルは行をその場で書き換える ---
+    for key, tensor in _tensor_fields(env).items():
+        if key in state:
+            tensor[env_ids] = rows(key).to(tensor.dtype)
+    actuation = env.action_controller.actuation
+    if actuation is not None and "actuation/buffer" in state:
+        actuation.buffer[env_ids] = torch.roll(rows("actuation/buffer"), actuation._head, dims=1)
+    # 減衰はシミュレータ側の値なので、ランダム化の値から書き直す
+    env._apply_randomization(env_ids)
+
+    # --- 2-3. 全環境で共通の状態 ---
+    if restore_globals is None:
+        restore_globals = len(env_ids) == env.num_envs
+    if restore_globals:
+        torch.set_rng_state(state["global/torch_rng"])
+        if "global/cuda_rng" in state and torch.cuda.is_available():
+            torch.cuda.set_rng_state(state["global/cuda_rng"])
+        env.randomizer._step = int(state["global/randomizer_step"])
+        normalizer = getattr(env, "obs_normalizer", None)
+        if normalizer is not None and "global/normalizer_count" in state:
+            normalizer.load_state_dict({
+                "count": state["global/normalizer_count"], "mean": state["global/normalizer_mean"],
+                "var": state["global/normalizer_var"], "frozen": bool(state["global/normalizer_frozen"]),
+            })
+
+
+# --- 3. サロゲートでの確認 ---
+def _run(env, actions):
+    for a in actions:
+        obs, *_ = env.step(a)
+    return obs["policy"].clone(), env.robot.data.joint_pos.clone()
+
+
+def main():
+    from surrogate import SurrogateEnv
+
+    parser = argparse.ArgumentParser(description="Snapshot a settled surrogate env, fan it out and branch from it.")
+    parser.add_argument("--settle", type=int, default=100, help="Control steps before taking the snapshot.")
+    parser.add_argument("--branch", type=int, default=50, help="Control steps compared after restoring.")
+    parser.add_argument("--num_envs", type=int, default=4096, help="Envs to fan the snapshot out to.")
+    parser.add_argument("--out", default="snapshot.npz")
+    args = parser.parse_args()
+
+    with torch.inference_mode():
+        # --- 1. 落ち着くまで動かしてから保存 ---
+        env = SurrogateEnv(8, seed=1)
+        env.reset()
+        for _ in range(args.settle):
+            env.step(torch.zeros(8, 3))
+        t0 = time.perf_counter()
+        save_state(args.out, capture_state(env))
+        print(f"saved {args.out} in {(time.perf_counter() - t0) * 1e3:.1f} ms")
+
+        # --- 2. 分岐: 元の環境の続きと、別の環境に復元してからの続きが一致するか ---
+        g = torch.Generator().manual_seed(0)
+        actions = [torch.rand(8, 3, generator=g) * 2 - 1 for _ in range(args.branch)]
+        expected_obs, expected_q = _run(env, actions)
+        branch = SurrogateEnv(8, seed=1)
+        branch.reset()
+        restore_state(branch, load_state(args.out))
+        obs, q = _run(branch, actions)
+        print(f"branch: max |obs diff| {(obs - expected_obs).abs().max().item():.3g}, "
+              f"max |q diff| {(q - expected_q).abs().max().item():.3g}")
+
+        # --- 3. 環境0の状態を全環境に配る ---
+        fan = SurrogateEnv(args.num_envs, seed=1)
+        fan.reset()
+        state = load_state(args.out)
+        t0 = time.perf_counter()
+        restore_state(fan, state, src_ids=torch.zeros(args.num_envs, dtype=torch.long))
+        elapsed = time.perf_counter() - t0
+        spread = (fan.robot.data.joint_pos - state["robot/joint_pos"][0]).abs().max().item()
+        print(f"fan-out to {args.num_envs} envs in {elapsed * 1e3:.1f} ms (max joint diff {spread:.3g})")
+
+
+if __name__ == "__main__":
+    main()
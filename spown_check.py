@@ -3,86 +3,342 @@
 # このスクリプトは強化学習のロジックを実行せず、
 # env_cfg.pyで定義されたアセットをシミュレーション環境にスポーンするためだけのものです。
 # これにより、アセットの初期位置や見た目をインタラクティブに確認・調整できます。
+#
+# --dry_run を付けるとシミュレータを起動せずに設定だけを確認します（1秒以内に終わります）:
+#   - ROBOT_USD / DRUM_USD / DRUMSTAND_USD のファイルがあるか
+#   - DRUM_CFG の prim_path と parent、接触センサの prim_path が食い違っていないか
+#   - joint_names_expr の正規表現がUSDの中の関節に当たるか
+#   - env_spacing が環境どうしの重なりを防げる大きさか
+# USDの中身を見る確認は pxr (usd-core) があるときだけ行います。
+# 設定は env_cfg.py を import せずにソースから読みます（import すると isaaclab と torch の読み込みだけで
+# 1秒以上かかるため）。--import_cfg を付けると PorcaroRLEnvCfg を実際に作って、その値を確認します。
+#
+# 使い方:
+#   python spown_check.py              # シミュレータを起動してスポーンを確認
+#   python spown_check.py --dry_run    # 設定だけを確認
+#   python spown_check.py --dry_run --import_cfg   # env_cfg.py を import して作った設定を確認
+#   python spown_check.py --profile    # env.step の時間を測る
 
-import torch
-import isaaclab
-from isaaclab.app import AppLauncher
-from isaaclab.envs import BaseEnv
-from isaaclab.sim import sim_utils
+# 重いモジュール (torch / isaaclab / pxr) は必要になった関数の中で読み込みます。
+# こうしておくと --help や --dry_run がすぐに終わります。
+import argparse
+import ast
+import os
+import re
+import sys
+import time
+from pathlib import Path
 
-# あなたが作成した設定ファイルをインポートします
-# ファイル名が 'env_cfg.py' であることを前提としています
-from env_cfg import PorcaroRLEnvCfg
+ENV_CFG_PATH = Path(__file__).resolve().parent / "env_cfg.py"
 
 
-class DesignEnv(BaseEnv):
-    """
-    アセットのスポーンと可視化のみを行うシンプルな環境クラス。
-    RLのロジック（観測、報酬、行動など）はすべて省略しています。
+def _design_env_class():
+    """アセットのスポーンと可視化のみを行う環境クラスを作る（isaaclab を読み込んでから）"""
+    import torch
+    from isaaclab.envs import BaseEnv
+    from isaaclab.sim import sim_utils
+
+    # あなたが作成した設定ファイルをインポートします
+    # ファイル名が 'env_cfg.py' であることを前提としています
+    from env_cfg import PorcaroRLEnvCfg
+
+    class DesignEnv(BaseEnv):
+        """
+        アセットのスポーンと可視化のみを行うシンプルな環境クラス。
+        RLのロジック（観測、報酬、行動など）はすべて省略しています。
+        """
+
+        cfg: PorcaroRLEnvCfg  # 型ヒントとして設定クラスを指定
+
+        def __init__(self, cfg: PorcaroRLEnvCfg, **kwargs):
+            # 親クラス(BaseEnv)の初期化を呼び出します
+            # これにより、cfg.sceneに基づいてアセットが自動的にスポーンされます
+            super().__init__(cfg, **kwargs)
+
+        def _setup_scene(self):
+            # BaseEnvのセットアップを呼び出すことで、cfg.scene内の"robot"や"drum_stand"が
+            # 自動的にシーンに追加されます。
+            super()._setup_scene()
+            # シーンを見やすくするために光源を追加します
+            light_cfg = sim_utils.DomeLightCfg(intensity=2000.0, color=(0.75, 0.75, 0.75))
+            light_cfg.func("/World/Light", light_cfg)
+
+        # --- 以下はBaseEnvを継承する上で必要なダミーのメソッドです ---
+        # --- 今回の目的（スポーンの確認）では中身は不要なので 'pass' とします ---
+
+        def _pre_physics_step(self, actions):
+            pass
+
+        def _apply_action(self):
+            pass
+
+        def _get_observations(self) -> dict:
+            return {}
+
+        def _get_rewards(self) -> torch.Tensor:
+            return torch.zeros(self.num_envs, device=self.device)
+
+        def _get_dones(self) -> tuple[torch.Tensor, torch.Tensor]:
+            return (torch.zeros(self.num_envs, device=self.device, dtype=torch.bool),
+                    torch.zeros(self.num_envs, device=self.device, dtype=torch.bool))
+
+        def _reset_idx(self, env_ids: torch.Tensor | None):
+            pass
+
+    return DesignEnv, PorcaroRLEnvCfg
+
+
+# --- 1. 設定の読み込み（シミュレータは起動しない） ---
+def _get(obj, key, default=None):
+    """設定オブジェクトとソースから読んだ辞書のどちらからでも値を取り出す"""
+    if isinstance(obj, dict):
+        return obj.get(key, default)
+    return getattr(obj, key, default)
+
+
+def _static_value(node, names):
+    """env_cfg.py の式を、定数・リスト・{キーワード: 値} の辞書に変換する"""
+    if isinstance(node, ast.Name):
+        return names.get(node.id)
+    if isinstance(node, ast.Call):
+        func = node.func
+        # XXX_CFG.replace(...) は元の設定に上書きした辞書にする
+        if isinstance(func, ast.Attribute) and func.attr == "replace":
+            base = dict(_static_value(func.value, names) or {})
+            base.update({k.arg: _static_value(k.value, names) for k in node.keywords})
+            return base
+        return {k.arg: _static_value(k.value, names) for k in node.keywords}
+    if isinstance(node, ast.IfExp):
+        # "None if BAKED_ASSETS is not None else ..." などは、キャッシュを使わないときの値を読む
+        return _static_value(node.orelse, names)
+    if isinstance(node, ast.Dict):
+        return {_static_value(k, names): _static_value(v, names) for k, v in zip(node.keys, node.values)}
+    try:
+        return ast.literal_eval(node)
+    except ValueError:
+        return None
+
+
+def load_cfg_static(path=ENV_CFG_PATH):
+    """isaaclab を読み込まずに、env_cfg.py のソースから設定の値を読み出す"""
+    tree = ast.parse(Path(path).read_text(encoding="utf-8"))
+    names = {}
+    # パスの定数は Path と __file__ だけで計算できるので、そのまま評価する
+    path_env = {"Path": Path, "__file__": str(path), "str": str}
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and isinstance(node.targets[0], ast.Name):
+            name = node.targets[0].id
+            if name in ("ASSETS_DIR", "ROBOT_USD", "DRUM_USD", "DRUMSTAND_USD"):
+                names[name] = eval(compile(ast.Expression(node.value), str(path), "eval"), {**path_env, **names})
+            elif name.endswith("_CFG") or isinstance(node.value, ast.Constant):
+                names[name] = _static_value(node.value, names)
+        elif isinstance(node, ast.ClassDef):
+            for item in node.body:
+                if isinstance(item, ast.AnnAssign) and getattr(item.target, "id", None) == "scene":
+                    names["scene"] = _static_value(item.value, names)
+    return names
+
+
+def load_cfg(import_cfg=False):
+    """設定の値を返す。既定ではソースから読み、import_cfg=True なら PorcaroRLEnvCfg を作って読む
+
+    import_cfg=True でも、isaaclab が読み込めなければソースから読む。
     """
+    if not import_cfg:
+        return load_cfg_static()
+    try:
+        import env_cfg
+        cfg = env_cfg.PorcaroRLEnvCfg()
+    except Exception as e:  # isaaclab が無い・Kitが起動していない など
+        print(f"[INFO] env_cfg をインポートできないので、ソースから設定を読みます ({type(e).__name__}: {e})")
+        return load_cfg_static()
+    return {
+        "ROBOT_USD": env_cfg.ROBOT_USD, "DRUM_USD": env_cfg.DRUM_USD, "DRUMSTAND_USD": env_cfg.DRUMSTAND_USD,
+        "DRUM_CFG": env_cfg.DRUM_CFG, "DRUMSTAND_CFG": env_cfg.DRUMSTAND_CFG,
+        "DRUM_CONTACT_CFG": env_cfg.DRUM_CONTACT_CFG, "scene": cfg.scene,
+    }
+
+
+# --- 2. USDの中身の読み取り（pxr があるときだけ） ---
+def _open_stage(usd_path):
+    from pxr import Usd
+    return Usd.Stage.Open(usd_path)
+
+
+def usd_joint_names(usd_path):
+    """USDの中の関節のプリム名の一覧"""
+    from pxr import UsdPhysics
+    stage = _open_stage(usd_path)
+    return [p.GetName() for p in stage.Traverse() if p.IsA(UsdPhysics.Joint)]
+
+
+def usd_prim_paths(usd_path):
+    """デフォルトプリムから見た全プリムの相対パス ("StandArm_link" など)"""
+    stage = _open_stage(usd_path)
+    root = stage.GetDefaultPrim() or stage.GetPseudoRoot()
+    root_path = str(root.GetPath()).rstrip("/")
+    return {str(p.GetPath())[len(root_path) + 1:] for p in stage.Traverse()}
+
 
-    cfg: PorcaroRLEnvCfg  # 型ヒントとして設定クラスを指定
+def usd_bounds(usd_path, offset=(0.0, 0.0, 0.0)):
+    """アセットの軸並行の外接箱 (min xyz, max xyz) を offset だけずらして返す"""
+    from pxr import Usd, UsdGeom
+    stage = _open_stage(usd_path)
+    cache = UsdGeom.BBoxCache(Usd.TimeCode.Default(), [UsdGeom.Tokens.default_, UsdGeom.Tokens.render])
+    box = cache.ComputeWorldBound(stage.GetPseudoRoot()).ComputeAlignedRange()
+    lo, hi = box.GetMin(), box.GetMax()
+    return [lo[i] + offset[i] for i in range(3)], [hi[i] + offset[i] for i in range(3)]
 
-    def __init__(self, cfg: PorcaroRLEnvCfg, **kwargs):
-        # 親クラス(BaseEnv)の初期化を呼び出します
-        # これにより、cfg.sceneに基づいてアセットが自動的にスポーンされます
-        super().__init__(cfg, **kwargs)
 
-    def _setup_scene(self):
-        # BaseEnvのセットアップを呼び出すことで、cfg.scene内の"robot"や"drum_stand"が
-        # 自動的にシーンに追加されます。
-        super()._setup_scene()
-        # シーンを見やすくするために光源を追加します
-        light_cfg = sim_utils.DomeLightCfg(intensity=2000.0, color=(0.75, 0.75, 0.75))
-        light_cfg.func("/World/Light", light_cfg)
+def _has_pxr():
+    try:
+        import pxr  # noqa: F401
+    except ImportError:
+        return False
+    return True
 
-    # --- 以下はBaseEnvを継承する上で必要なダミーのメソッドです ---
-    # --- 今回の目的（スポーンの確認）では中身は不要なので 'pass' とします ---
 
-    def _pre_physics_step(self, actions):
-        pass
+# --- 3. 設定の確認 ---
+def _init_pos(asset_cfg):
+    state = _get(asset_cfg, "init_state") or _get(_get(asset_cfg, "spawn"), "init_state")
+    return tuple(_get(state, "pos") or (0.0, 0.0, 0.0))
 
-    def _apply_action(self):
-        pass
 
-    def _get_observations(self) -> dict:
-        return {}
+def _joint_exprs(asset_cfg):
+    exprs = []
+    for actuator in (_get(asset_cfg, "actuators") or {}).values():
+        exprs += list(_get(actuator, "joint_names_expr") or [])
+    return exprs
 
-    def _get_rewards(self) -> torch.Tensor:
-        return torch.zeros(self.num_envs, device=self.device)
 
-    def _get_dones(self) -> tuple[torch.Tensor, torch.Tensor]:
-        return (torch.zeros(self.num_envs, device=self.device, dtype=torch.bool),
-                torch.zeros(self.num_envs, device=self.device, dtype=torch.bool))
+def check_cfg(cfg):
+    """設定を確認して (結果, メッセージ) のリストを返す。結果は "OK" / "NG" / "SKIP" """
+    results = []
+    scene = cfg["scene"]
+    robot = _get(scene, "robot")
+    drum_stand = _get(scene, "drum_stand")
+    drum = cfg["DRUM_CFG"]
 
-    def _reset_idx(self, env_ids: torch.Tensor | None):
-        pass
+    # --- 3-1. USDファイルの存在 ---
+    usd_ok = {}
+    for name in ("ROBOT_USD", "DRUM_USD", "DRUMSTAND_USD"):
+        path = cfg[name]
+        usd_ok[name] = os.path.isfile(path)
+        results.append(("OK" if usd_ok[name] else "NG", f"{name}: {path}" + ("" if usd_ok[name] else " が見つかりません")))
 
+    # --- 3-2. プリムパスと parent の対応 ---
+    stand_path = _get(drum_stand, "prim_path")
+    drum_path = _get(drum, "prim_path")
+    parent = _get(drum, "parent")
+    if not drum_path.startswith(stand_path + "/"):
+        results.append(("NG", f"DRUM_CFG.prim_path {drum_path} が drum_stand {stand_path} の下にありません"))
+    if parent is not None:
+        if not parent.startswith(stand_path + "/"):
+            results.append(("NG", f"DRUM_CFG.parent {parent} が drum_stand {stand_path} の下にありません"))
+        elif not drum_path.startswith(parent + "/"):
+            results.append(("NG", f"DRUM_CFG.prim_path {drum_path} が parent {parent} の子になっていません"))
+        else:
+            results.append(("OK", f"DRUM_CFG: {drum_path} は {parent} の子"))
+    contact_path = _get(cfg["DRUM_CONTACT_CFG"], "prim_path")
+    results.append(("OK" if contact_path == drum_path else "NG",
+                    f"接触センサの prim_path {contact_path} / ドラム {drum_path}"))
 
-def main():
+    if not _has_pxr():
+        results.append(("SKIP", "pxr (usd-core) が無いので、USDの中身の確認は省略します"))
+        return results
+
+    # --- 3-3. parent のリンクがドラムスタンドのUSDにあるか ---
+    if parent is not None and usd_ok["DRUMSTAND_USD"] and parent.startswith(stand_path + "/"):
+        link = parent[len(stand_path) + 1:]
+        found = link in usd_prim_paths(cfg["DRUMSTAND_USD"]) or any(
+            p.endswith("/" + link) for p in usd_prim_paths(cfg["DRUMSTAND_USD"])
+        )
+        results.append(("OK" if found else "NG", f"parent のリンク {link} が DRUMSTAND_USD に" + ("あります" if found else "ありません")))
+
+    # --- 3-4. joint_names_expr の正規表現がUSDの関節に当たるか（Isaac Lab と同じ fullmatch） ---
+    for label, asset, usd_name in (("robot", robot, "ROBOT_USD"), ("drum_stand", drum_stand, "DRUMSTAND_USD")):
+        if not usd_ok[usd_name]:
+            continue
+        joints = usd_joint_names(cfg[usd_name])
+        for expr in _joint_exprs(asset):
+            hits = [j for j in joints if re.fullmatch(expr, j)]
+            results.append(("OK" if hits else "NG", f"{label}: joint_names_expr {expr!r} -> {hits or joints}"))
+
+    # --- 3-5. env_spacing と1環境ぶんの大きさ ---
+    if all(usd_ok.values()):
+        stand_pos = _init_pos(drum_stand)
+        drum_pos = [s + d for s, d in zip(stand_pos, _init_pos(drum))]
+        boxes = [
+            usd_bounds(cfg["ROBOT_USD"], _init_pos(robot)),
+            usd_bounds(cfg["DRUMSTAND_USD"], stand_pos),
+            usd_bounds(cfg["DRUM_USD"], drum_pos),
+        ]
+        lo = [min(b[0][i] for b in boxes) for i in range(2)]
+        hi = [max(b[1][i] for b in boxes) for i in range(2)]
+        footprint = max(hi[0] - lo[0], hi[1] - lo[1])
+        spacing = _get(scene, "env_spacing")
+        results.append(("OK" if footprint < spacing else "NG",
+                        f"1環境の大きさ {footprint:.3f} m / env_spacing {spacing:.3f} m"))
+    return results
+
+
+def dry_run(import_cfg=False):
+    """シミュレータを起動せずに設定を確認する。問題があれば 1 を返す"""
+    t0 = time.perf_counter()
+    results = check_cfg(load_cfg(import_cfg))
+    for status, message in results:
+        print(f"[{status:4s}] {message}")
+    failed = sum(status == "NG" for status, _ in results)
+    print(f"{len(results)} checks, {failed} failed ({time.perf_counter() - t0:.2f} s)")
+    return 1 if failed else 0
+
+
+def main(profile=False):
     """環境を起動し、シミュレーションを実行します。"""
     # Isaac Simアプリケーションを起動します
     # headless=Falseにすることで、GUIウィンドウが表示されます
+    from isaaclab.app import AppLauncher
     app_launcher = AppLauncher(headless=False)
     simulation_app = app_launcher.app
 
+    import torch
+    from profiler import PhaseProfiler
+    DesignEnv, PorcaroRLEnvCfg = _design_env_class()
+
     # 設定ファイルをインスタンス化
     cfg = PorcaroRLEnvCfg()
 
     # 設計用の環境クラスをインスタンス化
     env = DesignEnv(cfg=cfg)
 
+    # profile=True のときは env.step にかかる時間を測ります
+    profiler = PhaseProfiler(enabled=profile, device=env.device)
+
     # シミュレーションが実行されている間、ループを回します
     while simulation_app.is_running():
         # 推論モードで実行（今回は何もしませんが、定型句として）
         with torch.inference_mode():
             # 環境を1ステップ進めます
             # これにより物理演算とレンダリングが行われます
-            env.step(None)
+            with profiler.phase("env.step"):
+                env.step(None)
+
+    if profile:
+        print(profiler.report())
+        profiler.export_json("spown_check_profile.json")
+        profiler.export_chrome_trace("spown_check_profile.trace.json")
 
     # シミュレーションを終了
     env.close()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Spawn the Porcaro scene, or validate its config without the simulator.")
+    parser.add_argument("--dry_run", action="store_true", help="Validate env_cfg.py without launching the simulator.")
+    parser.add_argument("--import_cfg", action="store_true",
+                        help="With --dry_run, import env_cfg.py and check the built config instead of reading the source.")
+    parser.add_argument("--profile", action="store_true", help="Time env.step and export the results.")
+    args = parser.parse_args()
+    if args.dry_run:
+        sys.exit(dry_run(import_cfg=args.import_cfg))
+    main(profile=args.profile)
@@ -1,5 +1,3 @@
-import torch
-import math
 import argparse
 
 from isaaclab.app import AppLauncher
@@ -8,15 +6,29 @@ from isaaclab.app import AppLauncher
 parser = argparse.ArgumentParser(description="Standalone test for the Porcaro robot with TorqueActionController.")
 parser.add_argument("--headless", action="store_true", help="Run simulation in headless mode.")
 # --scene 引数を追加し、動作パターンを選択できるようにする
+# 複数指定すると環境ごとに別のシーンを割り当て、1回の起動でまとめて確認できる
 parser.add_argument(
-    "--scene", type=int, default=0,
-    help="Select the test scene to run (0-4). "
+    "--scene", type=int, nargs="+", default=[0],
+    help="Select the test scene(s) to run (0-4). "
          "0: Wrist sine wave (Default), "
          "1: DF muscle sine wave, "
          "2: F muscle sine wave, "
          "3: G muscle sine wave, "
-         "4: G muscle step pressure"
+         "4: G muscle step pressure. "
+         "Multiple scenes are assigned to envs in turn."
 )
+parser.add_argument("--num_envs", type=int, default=None,
+                    help="Number of cloned envs (default: one per scene). Scenes are assigned to envs in turn.")
+parser.add_argument("--telemetry_dir", default="telemetry", help="Output directory of the recorded .npy chunks.")
+parser.add_argument("--profile", action="store_true", help="Time each loop phase and export the results.")
+parser.add_argument("--profile_out", default="profile", help="Prefix of the profiler output (.json / .trace.json).")
+parser.add_argument("--profile_window", action="store_true", help="Show a live per-phase timing window.")
+parser.add_argument("--record_dir", default=None, help="Record controller inputs/outputs here for replay.py.")
+parser.add_argument("--render_fps", type=float, default=30.0,
+                    help="Target wall-clock render FPS, independent of physics (0: never render).")
+parser.add_argument("--render_envs", type=int, nargs="+", default=None, help="Point the camera at these env ids.")
+parser.add_argument("--capture", default=None, help="Record the rendered frames to this video file.")
+parser.add_argument("--duration", type=float, default=20.0, help="Length of the precompiled command table [s].")
 args, unknown = parser.parse_known_args()
 
 # --- AppLauncherの初期化 ---
@@ -25,41 +37,56 @@ simulation_app = launcher.app
 
 # --- Isaac LabのAPIを新しいパスでインポート ---
 from isaaclab.sim import SimulationContext
-from isaaclab.assets import Articulation
+from isaaclab.scene import InteractiveScene
 from isaaclab.terrains import TerrainImporter
 
 # --- あなたのプロジェクトのモジュールをインポート ---
 from .porcaro_rl_env_cfg import PorcaroRLEnvCfg
-from .actions.torque import TorqueActionController
+from .actions.actuation import ActuationDynamics
+from .actions.torque import TorqueActionController, load_muscle_params
+from .scenes import SceneCommands
+from .telemetry import TelemetryRecorder
+from .profiler import LiveReadout, PhaseProfiler
+from .replay import ControllerRecording
+from .render import RenderScheduler, VideoCapture, ViewportFrameSource
 
 def main():
     """ Isaac Lab環境でTorqueActionControllerを直接テストするメイン関数 """
 
     # 1. 環境設定を読み込む
-    cfg = PorcaroRLEnvCfg(num_envs=1)
+    num_envs = args.num_envs or len(args.scene)
+    cfg = PorcaroRLEnvCfg(num_envs=num_envs)
 
     # 2. シミュレーションコンテキストを作成
     sim = SimulationContext(cfg.sim)
 
     # 3. シーンのアセットをスポーンさせる
+    # ロボットとドラムスタンドは指令の行の数（num_envs）だけ複製し、環境ごとに別のシーンで動かす
     terrain = TerrainImporter(cfg.terrain)
-    robot = Articulation(cfg.scene.robot)
-    drum_stand = Articulation(cfg.scene.drum_stand)
+    scene = InteractiveScene(cfg.scene.replace(num_envs=num_envs))
+    robot = scene["robot"]
+    drum_stand = scene["drum_stand"]
 
     sim.reset()
     print("-----------------------------------------")
     print("Scene and assets have been initialized.")
-    print(f"Running Test Scene: {args.scene}")
+    print(f"Running Test Scene(s): {args.scene} on {num_envs} env(s)")
     print("-----------------------------------------")
 
     # 4. TorqueActionControllerのインスタンスを作成
     dt_ctrl = cfg.sim.dt * cfg.decimation
+    params = load_muscle_params()
     action_controller = TorqueActionController(
         dt_ctrl=dt_ctrl,
-        r=0.014, L=0.150,
-        Pmax=0.6,
+        r=params["r"], L=params["L"],
+        Pmax=params["Pmax"],
+        actuation=ActuationDynamics(dt=cfg.sim.dt),  # バルブの遅れと圧力の立ち上がり
+        num_envs=num_envs,
+        device=sim.device,
     )
-    action_controller.reset(n_envs=1, device=sim.device)
+
+    # 全シーンの指令値を先に表へ変換しておく
+    commands = SceneCommands(args.scene, num_envs, dt=cfg.sim.dt, duration=args.duration, device=sim.device)
 
     wrist_ids, _ = robot.find_joints(r"Base_link_Wrist_joint")
     grip_ids, _ = robot.find_joints(r"Hand_link_Grip_joint")
@@ -67,72 +94,101 @@ def main():
     grip_id = grip_ids[0]
     print(f"Targeting Wrist Joint ID: {wrist_id}, Grip Joint ID: {grip_id}")
 
+    # 全ステップの値を記録するレコーダー（書き出しと集計は別スレッドで行う）
+    recorder = TelemetryRecorder(
+        channels={"joint_pos": robot.num_joints, "pressure_cmd": 3, "pressure": 3, "torque": 2, "root_state": 13},
+        num_envs=num_envs,
+        device=sim.device,
+        out_dir=args.telemetry_dir,
+        # surrogate.py --validate / sysid.py が関節の列を選び、記録の指令圧力をアクションに戻して
+        # 同じバルブの遅れを通すのに使う
+        meta={
+            "joint_ids": [wrist_id, grip_id], "dt": cfg.sim.dt, "p_max_cmd": params["Pmax"],
+            "actuation": {"delay_ticks": list(action_controller.actuation.delay_ticks),
+                          "tau": list(action_controller.actuation.tau)},
+        },
+    )
+
+    # コントローラの入出力の記録（replay.py で新しいコードと比べるための正解データ）
+    recording = None
+    if args.record_dir:
+        recording = ControllerRecording(
+            action_controller, robot.num_joints, out_dir=args.record_dir, joint_ids=(wrist_id, grip_id),
+        )
+
+    # 描画は物理とは別に、壁時計で --render_fps になるときだけ行う
+    scheduler = RenderScheduler(args.render_fps)
+    capture, frames = None, None
+    if args.capture or args.render_envs is not None:
+        frames = ViewportFrameSource(sim, scene.env_origins, env_ids=args.render_envs)
+    if args.capture:
+        capture = VideoCapture(args.capture, fps=args.render_fps or 30.0)
+
+    # フェーズごとの時間計測（--profile が無ければ何もしない）
+    profiler = PhaseProfiler(enabled=args.profile, device=sim.device)
+    readout = LiveReadout(profiler) if args.profile and args.profile_window else None
+
     # 5. シミュレーションループを開始
     while simulation_app.is_running():
-        if sim.is_running():
-            sim.render()
+        if sim.is_running() and scheduler.should_render():
+            with profiler.phase("render"):
+                sim.render()
+            if capture is not None:
+                # エンコードは別スレッド。キューがいっぱいならこのフレームは捨てる
+                capture.submit(frames.grab())
 
         if sim.is_playing():
-            sim.step()
+            with profiler.phase("sim.step"):
+                scene.write_data_to_sim()
+                sim.step(render=False)
+                scene.update(sim.get_physics_dt())
 
             root_state = robot.data.root_state_w
             root_pos = root_state[:, 0:3]
             joint_pos = robot.data.joint_pos
 
-            if sim.step_count % 100 == 0:
-                print(f"Step: {sim.step_count} | Joint Pos: {joint_pos.cpu().numpy()[0]}")
-
-            # (B) 選択されたシーンに基づいて指令値を生成
-            sim_time = sim.current_time
-            # アクションのデフォルト値（全筋肉OFF）
-            action_df, action_f, action_g = -1.0, -1.0, -1.0
-            
-            # 圧力P [MPa] からアクションa [-1, 1] への変換関数
-            def pressure_to_action(p_mpa, p_max=0.6):
-                # P = (a + 1) * 0.5 * P_max  => a = P / (0.5 * P_max) - 1
-                return p_mpa / (0.5 * p_max) - 1.0
-
-            if args.scene == 0:
-                # シーン0: 手首のsin波運動（DFとFが拮抗）
-                # 圧力は 0 ~ 0.6MPa の間で変化
-                pressure = (math.sin(2.0 * math.pi * 0.5 * sim_time) + 1.0) * 0.5 * 0.6
-                action_df = pressure_to_action(pressure)
-                action_f = pressure_to_action(0.6 - pressure) # 拮抗筋は逆の圧力
-                action_g = -1.0 # GはOFF
-
-            elif args.scene == 1:
-                # シーン1: DF筋（背屈）のみsin波で加圧
-                pressure = (math.sin(2.0 * math.pi * 0.5 * sim_time) + 1.0) * 0.5 * 0.6
-                action_df = pressure_to_action(pressure)
-
-            elif args.scene == 2:
-                # シーン2: F筋（屈曲）のみsin波で加圧
-                pressure = (math.sin(2.0 * math.pi * 0.5 * sim_time) + 1.0) * 0.5 * 0.6
-                action_f = pressure_to_action(pressure)
-
-            elif args.scene == 3:
-                # シーン3: G筋（握り）のみsin波で加圧
-                pressure = (math.sin(2.0 * math.pi * 0.5 * sim_time) + 1.0) * 0.5 * 0.6
-                action_g = pressure_to_action(pressure)
-
-            elif args.scene == 4:
-                # シーン4: G筋（握り）を0.1MPaずつの階段状に加圧
-                step_duration = 2.0  # 2秒ごとに圧力を変更
-                pressure_level = math.floor(sim_time / step_duration)
-                pressure = min(pressure_level * 0.1, 0.6) # 0.1MPaずつ、最大0.6MPaまで
-                action_g = pressure_to_action(pressure)
-                if sim.step_count % 100 == 0:
-                    print(f"  Current Grip Pressure Command: {pressure:.2f} MPa")
-
-            actions = torch.tensor([[action_df, action_f, action_g]], device=sim.device)
+            # (B) コンパイル済みの表から指令値を取り出す
+            with profiler.phase("commands"):
+                step = sim.step_count
+                actions = commands.actions_at(step)
 
             # (C) コントローラを実行してトルクを計算・適用
-            action_controller.apply(
-                actions=actions,
-                q=joint_pos,
-                robot=robot,
-                joint_ids=(wrist_id, grip_id)
-            )
+            with profiler.phase("controller.apply"):
+                action_controller.apply(
+                    actions=actions,
+                    q=joint_pos,
+                    robot=robot,
+                    joint_ids=(wrist_id, grip_id)
+                )
+
+            # (D) 記録（デバイス上のバッファにコピーするだけで同期しない）
+            with profiler.phase("telemetry"):
+                recorder.record(
+                    joint_pos=joint_pos,
+                    pressure_cmd=action_controller.pressure_cmd,  # バルブに送った指令
+                    pressure=action_controller.pressure,          # 遅れを通した実際の圧力
+                    torque=action_controller.torque,
+                    root_state=root_state,
+                )
+                if recording is not None:
+                    recording.record(actions, joint_pos)
+            summary = recorder.poll_summary()
+            if summary is not None:
+                print(summary)
+                if args.profile:
+                    print(profiler.report())
+            if readout is not None and step % 50 == 0:
+                readout.refresh()
+
+    recorder.close()
+    if capture is not None:
+        capture.close()
+        print(capture.stats())
+    if recording is not None:
+        recording.close()
+    if args.profile:
+        profiler.export_json(args.profile_out + ".json")
+        profiler.export_chrome_trace(args.profile_out + ".trace.json")
 
 if __name__ == "__main__":
     try:
@@ -0,0 +1,125 @@
+# strike_detector.py
+#
+# ドラムの接触センサの力の履歴から、スティックが叩いた瞬間（打撃）を全環境まとめて検出し、
+# 打撃ごとのピーク力・力積・タイミング誤差を環境ごとの固定長バッファに貯めるモジュール。
+# 報酬や観測のコードは events / new_hit などのテンソルをそのまま読めばよい。
+
+import torch
+
+# events の列の並び
+ONSET_TIME, PEAK_FORCE, IMPULSE, TIMING_ERROR = 0, 1, 2, 3
+NUM_EVENT_FIELDS = 4
+
+
+class StrikeDetector:
+    """接触力のしきい値（ヒステリシス付き）と不感時間で打撃を検出するクラス"""
+
+    def __init__(self, num_envs, dt, device, on_threshold=5.0, off_threshold=2.0,
+                 debounce_time=0.02, max_events=16):
+        self.num_envs = num_envs
+        self.dt = dt
+        self.device = torch.device(device)
+        self.on_threshold = on_threshold      # これを超えたら打撃開始 [N]
+        self.off_threshold = off_threshold    # これを下回ったら打撃終了 [N]
+        self.debounce_steps = max(0, int(round(debounce_time / dt)))  # 終了後に次の打撃を受け付けないステップ数
+        self.max_events = max_events
+
+        n = num_envs
+        self._env_ids = torch.arange(n, device=self.device)
+        self.time = torch.zeros(n, device=self.device)           # 環境ごとの経過時間 [s]
+        self.force = torch.zeros(n, device=self.device)          # 最新の接触力の大きさ [N]
+        self.in_contact = torch.zeros(n, dtype=torch.bool, device=self.device)
+        self.refractory = torch.zeros(n, dtype=torch.long, device=self.device)
+
+        # 打撃中の値
+        self.hit_onset = torch.zeros(n, device=self.device)
+        self.hit_peak = torch.zeros(n, device=self.device)
+        self.hit_impulse = torch.zeros(n, device=self.device)
+        self.hit_target = torch.zeros(n, device=self.device)     # 打撃が始まったときの目標時刻 [s]
+
+        # 終わった打撃の記録（環境ごとのリングバッファ）
+        self.events = torch.zeros((n, max_events, NUM_EVENT_FIELDS), device=self.device)
+        self.event_count = torch.zeros(n, dtype=torch.long, device=self.device)
+
+        # 直近の update() で打撃が始まった / 終わった環境
+        self.new_hit = torch.zeros(n, dtype=torch.bool, device=self.device)
+        self.hit_done = torch.zeros(n, dtype=torch.bool, device=self.device)
+
+        # 作業用バッファ
+        self._onset = torch.zeros(n, dtype=torch.bool, device=self.device)
+        self._ended = torch.zeros(n, dtype=torch.bool, device=self.device)
+        self._active = torch.zeros(n, device=self.device)
+        self._row = torch.zeros((n, NUM_EVENT_FIELDS), device=self.device)
+        self._slot = torch.zeros(n, dtype=torch.long, device=self.device)
+
+    def update(self, net_forces_history, num_new=1, target_time=None):
+        """接触センサの履歴から新しいサンプルを古い順に処理する
+
+        net_forces_history: (num_envs, 履歴長, ボディ数, 3)。Isaac Labと同じくインデックス0が最新
+        num_new: 前回の呼び出しから増えたサンプル数（物理ステップ数 = decimation）
+        target_time: (num_envs,) 狙っていた打撃時刻 [s]。タイミング誤差の計算に使う
+        """
+        self.new_hit.zero_()
+        self.hit_done.zero_()
+        for k in range(num_new - 1, -1, -1):
+            self._step(net_forces_history[:, k], target_time)
+
+    def _step(self, forces, target_time):
+        # --- 1. 接触力の大きさ（ボディの中で最大のもの） ---
+        torch.amax(torch.linalg.vector_norm(forces, dim=-1), dim=-1, out=self.force)
+        self.time.add_(self.dt)
+        self.refractory.sub_(1).clamp_(min=0)
+
+        # --- 2. 打撃の開始と終了を判定 ---
+        torch.gt(self.force, self.on_threshold, out=self._onset)
+        self._onset.logical_and_(~self.in_contact).logical_and_(self.refractory == 0)
+        torch.lt(self.force, self.off_threshold, out=self._ended)
+        self._ended.logical_and_(self.in_contact)
+
+        # --- 3. 打撃中のピーク力と力積を更新 ---
+        self.hit_onset.copy_(torch.where(self._onset, self.time, self.hit_onset))
+        # タイミング誤差は、打撃が終わったときではなく始まったときの目標と比べる
+        if target_time is None:
+            self.hit_target.masked_fill_(self._onset, float("nan"))
+        else:
+            self.hit_target.copy_(torch.where(self._onset, target_time, self.hit_target))
+        self.hit_peak.masked_fill_(self._onset, 0.0)
+        self.hit_impulse.masked_fill_(self._onset, 0.0)
+        torch.logical_or(self.in_contact, self._onset, out=self._onset)  # 以降 _onset は「打撃中」
+        torch.mul(self.force, self._onset, out=self._active)
+        torch.maximum(self.hit_peak, self._active, out=self.hit_peak)
+        self.hit_impulse.add_(self._active, alpha=self.dt)
+
+        # --- 4. 終わった打撃をイベントバッファに書き込む ---
+        self._row[:, ONSET_TIME] = self.hit_onset
+        self._row[:, PEAK_FORCE] = self.hit_peak
+        self._row[:, IMPULSE] = self.hit_impulse
+        torch.sub(self.hit_onset, self.hit_target, out=self._row[:, TIMING_ERROR])
+        torch.remainder(self.event_count, self.max_events, out=self._slot)
+        current = self.events[self._env_ids, self._slot]
+        self.events[self._env_ids, self._slot] = torch.where(self._ended[:, None], self._row, current)
+        self.event_count.add_(self._ended)
+        self.refractory.masked_fill_(self._ended, self.debounce_steps)
+
+        # --- 5. 状態を進める ---
+        self.new_hit.logical_or_(self._onset & ~self.in_contact)
+        self.hit_done.logical_or_(self._ended)
+        self.in_contact.copy_(self._onset & ~self._ended)
+
+    def last_events(self):
+        """環境ごとの最新の打撃 (num_envs, 4)。まだ打撃が無い環境は0"""
+        slot = (self.event_count - 1).remainder(self.max_events)
+        last = self.events[self._env_ids, slot]
+        return last * (self.event_count > 0)[:, None]
+
+    def reset(self, env_ids=None):
+        """指定した環境の打撃の記録を消す"""
+        if env_ids is None:
+            env_ids = self._env_ids
+        for buf in (self.time, self.force, self.hit_onset, self.hit_peak, self.hit_impulse, self.hit_target,
+                    self.events):
+            buf[env_ids] = 0.0
+        for buf in (self.in_contact, self.new_hit, self.hit_done):
+            buf[env_ids] = False
+        self.refractory[env_ids] = 0
+        self.event_count[env_ids] = 0
@@ -0,0 +1,219 @@
+# surrogate.py
+#
+# Isaac Simを起動せずに、手首と握りの2関節（Base_link_Wrist_joint / Hand_link_Grip_joint）を
+# CPU上でまとめて動かすための簡易モデル（サロゲート）と、それを使った環境。
+#   - ROBOT_CFG と同じ減衰 (0.02) とトルク上限、関節の可動範囲
+#   - 手首が一定の角度を超えるとドラムに当たる、ばね・ダンパの接触モデル
+#   - トルクの計算・観測・報酬は本物の環境と同じ PorcaroTask（porcaro_task.py）のコードを使う
+# 環境は DirectRLEnv と同じ step() / reset() を持ち、方策の試作やCIで使えます。
+#
+# 使い方（Isaacの記録との比較）:
+#   python surrogate.py --validate telemetry/
+
+import argparse
+import math
+from types import SimpleNamespace
+
+import numpy as np
+import torch
+
+from actions.torque import load_muscle_params
+from cpu_articulation import CpuArticulation, CpuContactSensor, CpuScene
+from porcaro_task import PorcaroTask
+
+
+class SurrogateArticulation(CpuArticulation):
+    """関節の可動範囲とドラムとの接触を加えた CpuArticulation"""
+
+    def __init__(self, num_envs, device="cpu", damping=0.02, effort_limit=500.0,
+                 inertia=(1.0e-2, 2.0e-3), joint_limits=((-1.2, 1.2), (-0.6, 0.6)),
+                 contact_angle=0.6, stick_length=0.3, contact_stiffness=50.0, contact_damping=1.0):
+        super().__init__(num_envs, device=device, damping=damping, effort_limit=effort_limit)
+        self.inertia = torch.tensor(inertia, device=self.device)
+        self.joint_limits = torch.tensor(joint_limits, device=self.device)
+        self.contact_angle = contact_angle        # 手首がこの角度 [rad] を超えるとドラムに当たる
+        self.stick_length = stick_length          # 手首からスティック先端まで [m]
+        self.contact_stiffness = contact_stiffness  # [Nm/rad]
+        self.contact_damping = contact_damping      # [Nms/rad]
+        self.drum_stand = None
+
+        n = num_envs
+        self.contact_force = torch.zeros((n, 1, 3), device=self.device)  # ドラムが受ける力 [N]
+        self._penetration = torch.zeros(n, device=self.device)
+        self._contact_torque = torch.zeros(n, device=self.device)
+
+    def update(self, dt):
+        data = self.data
+        q_w, qd_w = data.joint_pos[:, 0], data.joint_vel[:, 0]
+
+        # --- 1. ドラムとの接触（ドラムスタンドが上下にずれた分だけ当たる角度も変わる） ---
+        torch.sub(q_w, self.contact_angle, out=self._penetration)
+        if self.drum_stand is not None:
+            dz = self.drum_stand.data.root_state_w[:, 2] - self.drum_stand.data.default_root_state[:, 2]
+            self._penetration.add_(dz / self.stick_length)
+        self._penetration.clamp_(min=0.0)
+        torch.mul(qd_w, self.contact_damping, out=self._contact_torque)
+        self._contact_torque.add_(self._penetration, alpha=self.contact_stiffness)
+        self._contact_torque.clamp_(min=0.0).mul_(self._penetration > 0)
+        # ドラムは下向き(-z)に押される
+        torch.div(self._contact_torque, -self.stick_length, out=self.contact_force[:, 0, 2])
+
+        # --- 2. 関節の運動  qdd = (tau - c * qd - tau_contact) / I ---
+        torch.clamp(self._effort_target, -self.effort_limit, self.effort_limit, out=data.applied_torque)
+        torch.mul(data.joint_vel, self.damping, out=self._acc)
+        self._acc.neg_().add_(data.applied_torque)
+        self._acc[:, 0].sub_(self._contact_torque)
+        self._acc.div_(self.inertia)
+        data.joint_vel.add_(self._acc, alpha=dt)
+        data.joint_pos.add_(data.joint_vel, alpha=dt)
+
+        # --- 3. 可動範囲で止める（範囲の外へ向かう速度は0にする） ---
+        lo, hi = self.joint_limits[:, 0], self.joint_limits[:, 1]
+        data.joint_vel.masked_fill_((data.joint_pos <= lo) & (data.joint_vel < 0), 0.0)
+        data.joint_vel.masked_fill_((data.joint_pos >= hi) & (data.joint_vel > 0), 0.0)
+        torch.clamp(data.joint_pos, lo, hi, out=data.joint_pos)
+
+    def reset(self, env_ids=None):
+        super().reset(env_ids)
+        if env_ids is None:
+            env_ids = slice(None)
+        self.contact_force[env_ids] = 0.0
+
+
+class SurrogateEnv(PorcaroTask):
+    """サロゲートモデル上の環境。タスクの処理は PorcaroRLEnvCfg と同じ PorcaroTask を使う"""
+
+    def __init__(self, num_envs, device="cpu", sim_dt=1 / 200, decimation=4, episode_length_s=5.0, seed=0,
+                 muscle_params=None, env_id_offset=0):
+        self.num_envs = num_envs
+        self.device = torch.device(device)
+        self.cfg = SimpleNamespace(sim=SimpleNamespace(dt=sim_dt), decimation=decimation, seed=seed)
+        self.max_episode_length = max(1, math.ceil(episode_length_s / (sim_dt * decimation)))
+
+        params = muscle_params or load_muscle_params()
+        self.robot = SurrogateArticulation(num_envs, device=device, damping=params["damping"])
+        self.scene = CpuScene(
+            num_envs, device=device,
+            robot=self.robot,
+            drum_stand=CpuArticulation(num_envs, joint_names=[], device=device),
+        )
+        self.robot.drum_stand = self.scene["drum_stand"]
+        self.contact_sensor = CpuContactSensor(num_envs, device=device)
+
+        self.actions = torch.zeros((num_envs, 3), device=self.device)
+        self.episode_length_buf = torch.zeros(num_envs, dtype=torch.long, device=self.device)
+        self._setup_task(params, seed=seed, env_id_offset=env_id_offset)
+
+    # --- DirectRLEnv と同じインターフェース ---
+    def reset(self):
+        env_ids = torch.arange(self.num_envs, device=self.device)
+        self.robot.reset(env_ids)
+        self.contact_sensor.reset(env_ids)
+        self.episode_length_buf.zero_()
+        self._reset_idx(env_ids)
+        return self._get_observations(), {}
+
+    def step(self, actions):
+        self._pre_physics_step(actions)
+        for _ in range(self.cfg.decimation):
+            self._apply_action()
+            self.robot.write_data_to_sim()
+            self.robot.update(self.cfg.sim.dt)
+            self.contact_sensor.push(self.robot.contact_force)
+
+        self.episode_length_buf += 1
+        terminated, truncated = self._get_dones()
+        reward = self._get_rewards()
+        reset_ids = (terminated | truncated).nonzero(as_tuple=False).squeeze(-1)
+        if len(reset_ids) > 0:
+            self.robot.reset(reset_ids)
+            self.contact_sensor.reset(reset_ids)
+            self.episode_length_buf[reset_ids] = 0
+            self._reset_idx(reset_ids)
+        return self._get_observations(), reward, terminated, truncated, {}
+
+
+# --- Isaacの記録（telemetry.py の出力）との比較 ---
+def validate(trace_dir, p_max=None, joint_ids=None, sim_dt=1 / 200):
+    """記録された圧力指令をサロゲートに入力し、関節角度の軌道の誤差を返す
+
+    standalone_robot_test.py と同じく、物理ステップごとに指令を与える (decimation=1)。
+    記録の joint_pos[t] は指令 pressure_cmd[t] を与える前の角度なので、
+    指令 t を与えて1ステップ進めた結果を joint_pos[t + 1] と比べる。
+    メタ情報にバルブの遅れ (actuation) があれば指令圧力を同じ遅れに通す。無ければ（古い記録）
+    pressure を遅れの無い圧力として与える。
+    p_max: 記録の圧力をアクションに戻すときの Pmax。省略すると記録のメタ情報の p_max_cmd
+           （古い記録で無ければコントローラが読み込んだ Pmax）
+    joint_ids: 記録の joint_pos の [手首, 握り] の列。省略すると記録のメタ情報から読む
+    """
+    from scenes import pressure_to_action
+    from telemetry import load_channel, load_meta
+
+    meta = load_meta(trace_dir)
+    if p_max is None:
+        p_max = meta.get("p_max_cmd")
+    joint_ids = joint_ids or meta.get("joint_ids")
+    if joint_ids is None:
+        raise ValueError(f"{trace_dir} のメタ情報に joint_ids がありません。--joint_ids で指定してください。")
+    joint_ids = list(joint_ids)
+    actuation = meta.get("actuation")
+    channel = "pressure_cmd" if actuation else "pressure"
+    pressure = torch.from_numpy(np.ascontiguousarray(load_channel(trace_dir, channel)))
+    recorded = torch.from_numpy(np.ascontiguousarray(load_channel(trace_dir, "joint_pos")))[..., joint_ids]
+    num_steps, num_envs, _ = pressure.shape
+
+    env = SurrogateEnv(num_envs, sim_dt=sim_dt, decimation=1)
+    if actuation:
+        env.action_controller.actuation.set_params(delay_ticks=actuation["delay_ticks"], tau=actuation["tau"])
+    else:
+        env.action_controller.actuation.set_params(delay_ticks=(0, 0, 0), tau=(0.0, 0.0, 0.0))
+    env.robot.data.joint_pos.copy_(recorded[0])
+    actions = pressure_to_action(pressure, env.action_controller.Pmax_buf if p_max is None else p_max)
+    simulated = torch.zeros((num_steps - 1, num_envs, 2))
+    for t in range(num_steps - 1):
+        env.actions = actions[t]
+        env._apply_action()
+        env.robot.update(sim_dt)
+        simulated[t] = env.robot.data.joint_pos
+
+    err = simulated - recorded[1:]
+    return {
+        "steps": num_steps,
+        "num_envs": num_envs,
+        "rmse": err.square().mean(dim=(0, 1)).sqrt().tolist(),
+        "max_abs": err.abs().amax(dim=(0, 1)).tolist(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CPU surrogate of the Porcaro wrist/grip.")
+    parser.add_argument("--validate", metavar="TRACE_DIR", default=None,
+                        help="Compare against Isaac traces recorded by standalone_robot_test.py.")
+    parser.add_argument("--joint_ids", type=int, nargs=2, default=None,
+                        help="Wrist and grip columns of joint_pos (default: read from the trace meta).")
+    parser.add_argument("--num_envs", type=int, default=4096)
+    parser.add_argument("--episodes", type=int, default=1, help="Episodes per env for the throughput run.")
+    args = parser.parse_args()
+
+    if args.validate:
+        result = validate(args.validate, joint_ids=args.joint_ids)
+        print(f"steps={result['steps']} envs={result['num_envs']}")
+        print(f"RMSE   [wrist, grip]: {result['rmse']}")
+        print(f"maxabs [wrist, grip]: {result['max_abs']}")
+        return
+
+    # ランダムなアクションでのロールアウト速度
+    import time
+    env = SurrogateEnv(args.num_envs)
+    env.reset()
+    steps = env.max_episode_length * args.episodes
+    start = time.perf_counter()
+    for _ in range(steps):
+        env.step(torch.rand((args.num_envs, 3)) * 2.0 - 1.0)
+    elapsed = time.perf_counter() - start
+    rollouts = args.num_envs * args.episodes
+    print(f"{rollouts} rollouts in {elapsed:.2f} s ({rollouts / elapsed * 60:.0f} rollouts/min)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+# sweep.py
+#
+# パラメータスイープ（グリッドまたはランダム）を、1つの環境の中でまとめて実行するツール。
+# スイープの点を1つずつ環境のスロットに割り当てて並列に動かし、点ごとの指標を表 (CSV) にまとめます。
+# 環境は PorcaroTask を継承したものなら何でもよく、env_factory で渡します。
+#   - "isaac"     : Isaac Sim の環境（env_cfg.py の PorcaroRLEnvCfg）。AppLauncher で Kit を起動してから作る
+#   - "surrogate" : CPU のサロゲートモデル（surrogate.py の SurrogateEnv）。物理はサロゲートなので傾向を見る用
+#   既定の "auto" は isaaclab が読み込めれば Isaac、無ければサロゲートを使う。
+#   - 点の数が環境数より多いときは、環境数ずつの「ウェーブ」に分けて順番に処理する
+#   - 環境は最初に1回だけ作り、ウェーブごとにリセットして使い回す（起動は1回だけ）
+#   - 結果はウェーブごとに一時ファイルへ書いてから置き換えるので、CSVにはウェーブの途中までの行が残らない。
+#     途中で止めても --resume で続きから再開できる
+#
+# スイープできるパラメータ:
+#   porcaro_task.py のランダム化のパラメータ名 (r, L, Pmax, damping, drum_offset, valve_delay, valve_tau)
+#     幅3のパラメータ (drum_offset は x/y/z、valve_delay と valve_tau は DF/F/G) は、
+#     1つの値なら3つとも同じ値、"a/b/c" なら要素ごとの値になる。CSVでは name[0], name[1], name[2] の列に分ける
+#   scene   : scenes.py のシーン番号（開ループの圧力指令）
+#   pattern : RHYTHM_PATTERNS の番号（目標リズム）
+#
+# 使い方:
+#   python sweep.py --grid Pmax=0.5,0.55,0.6 damping=0.01,0.02,0.04 scene=0,1 --num_envs 8 --out sweep.csv
+#   python sweep.py --grid valve_delay=0/2/4,2/2/2 --backend isaac --headless --out sweep.csv
+#   python sweep.py --random 1000 --range r=0.012:0.016 Pmax=0.5:0.65 --num_envs 256 --out sweep.csv
+#   python sweep.py ... --resume   # 中断したスイープを続きから
+
+import argparse
+import csv
+import importlib.util
+import itertools
+import json
+import os
+import time
+
+import numpy as np
+import torch
+
+from actions.torque import load_muscle_params
+from scenes import SCENES, SceneCommands
+from porcaro_task import MUSCLE_SPREAD, OTHER_RANGES, RHYTHM_PATTERNS
+from surrogate import SurrogateEnv
+
+# 点ごとに記録する指標
+METRICS = ["hits", "mean_abs_timing_error", "mean_peak_force", "mean_abs_torque", "wrist_min", "wrist_max"]
+DISCRETE_PARAMS = ("scene", "pattern")
+
+
+# --- 1. スイープの点を作る ---
+def nominal_point():
+    """指定しなかったパラメータに使う値（muscle_params.json と ActuationDynamics の既定値）"""
+    params = load_muscle_params()
+    return {
+        "r": params["r"], "L": params["L"], "Pmax": params["Pmax"], "damping": params["damping"],
+        "drum_offset": 0.0, "valve_delay": 2.0, "valve_tau": 0.05,
+        "scene": 0, "pattern": 0,
+    }
+
+
+def _check_name(name):
+    if name not in MUSCLE_SPREAD and name not in OTHER_RANGES and name not in DISCRETE_PARAMS:
+        raise ValueError(f"スイープできないパラメータです: {name}")
+
+
+def param_width(name):
+    """パラメータの要素数（drum_offset, valve_delay, valve_tau は3、それ以外は1）"""
+    return OTHER_RANGES[name].width if name in OTHER_RANGES else 1
+
+
+def _check_value(name, value):
+    """値を点に入れる形にする（幅3のパラメータの要素ごとの値はリスト、それ以外は数値）"""
+    if isinstance(value, (list, tuple)):
+        if len(value) != param_width(name):
+            raise ValueError(f"{name} の値の数は {param_width(name)} 個です: {value}")
+        return [float(v) for v in value]
+    return value
+
+
+def _expand(name, value):
+    """点の値を (幅,) のリストにする（1つの値なら全要素に同じ値）"""
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    return [value] * param_width(name)
+
+
+def grid_points(grid):
+    """{名前: 値のリスト} の全組み合わせ。幅3のパラメータの値は、数値か要素ごとの値のリスト"""
+    for name in grid:
+        _check_name(name)
+    names = list(grid)
+    values = [[_check_value(n, v) for v in grid[n]] for n in names]
+    return [dict(zip(names, combo)) for combo in itertools.product(*values)]
+
+
+def random_points(ranges, count, seed=0):
+    """{名前: (下限, 上限)} の範囲から一様に count 点選ぶ（離散パラメータは整数）
+
+    幅3のパラメータは要素ごとに別々に選ぶ。下限・上限には要素ごとの値のリストも使える。
+    """
+    for name in ranges:
+        _check_name(name)
+    rng = np.random.default_rng(seed)
+    points = [{} for _ in range(count)]
+    for name, (low, high) in ranges.items():
+        if name in DISCRETE_PARAMS:
+            values = rng.integers(int(low), int(high) + 1, size=count).tolist()
+        elif param_width(name) > 1:
+            low, high = _expand(name, _check_value(name, low)), _expand(name, _check_value(name, high))
+            values = rng.uniform(low, high, size=(count, len(low))).tolist()
+        else:
+            values = rng.uniform(low, high, size=count).tolist()
+        for p, v in zip(points, values):
+            p[name] = v
+    return points
+
+
+# --- 2. 1ウェーブ分を実行する ---
+def run_wave(env, commands, points, steps):
+    """points を環境のスロット 0..len(points)-1 に割り当てて steps 制御ステップ動かし、指標を返す"""
+    n = len(points)
+    base = nominal_point()
+    full = [{**base, **p} for p in points]
+    # 余ったスロットは最後の点で埋めておく（結果は捨てる）
+    full += [full[-1]] * (env.num_envs - n)
+
+    env.reset()
+    # リセットで選ばれたランダムな値を、スイープの値で上書きする（幅3のパラメータは要素ごと）
+    values = env.randomizer.values
+    for name, v in values.items():
+        v.copy_(torch.tensor([_expand(name, p[name]) for p in full], dtype=v.dtype, device=v.device))
+    env._apply_randomization(None)
+    env.rhythm.assign(
+        pattern_ids=[int(p["pattern"]) % len(RHYTHM_PATTERNS) for p in full],
+        phases=[0.0] * env.num_envs,
+    )
+    commands.assign([commands.scene_ids.index(int(p["scene"])) for p in full])
+
+    dev = env.device
+    hits = torch.zeros(env.num_envs, device=dev)
+    err_sum = torch.zeros(env.num_envs, device=dev)
+    peak_sum = torch.zeros(env.num_envs, device=dev)
+    torque_sum = torch.zeros(env.num_envs, device=dev)
+    wrist_min = torch.full((env.num_envs,), float("inf"), device=dev)
+    wrist_max = torch.full((env.num_envs,), float("-inf"), device=dev)
+
+    for step in range(steps):
+        env.step(commands.actions_at(step))
+        done = env.strike_detector.hit_done.float()
+        last = env.strike_detector.last_events()
+        hits.add_(done)
+        err_sum.add_(last[:, 3].abs() * done)
+        peak_sum.add_(last[:, 1] * done)
+        torque_sum.add_(env.action_controller.torque.abs().sum(dim=1))
+        q = env.robot.data.joint_pos[:, env._wrist_id]
+        torch.minimum(wrist_min, q, out=wrist_min)
+        torch.maximum(wrist_max, q, out=wrist_max)
+
+    denom = hits.clamp(min=1.0)
+    metrics = torch.stack([
+        hits, err_sum / denom, peak_sum / denom, torque_sum / steps, wrist_min, wrist_max,
+    ], dim=1)[:n].cpu().tolist()
+    return [dict(zip(METRICS, row)) for row in metrics]
+
+
+# --- 3. 環境の作り方 ---
+def surrogate_env_factory(num_envs, device, episode_length_s, seed):
+    """CPU のサロゲートモデル上の環境を作る"""
+    return SurrogateEnv(num_envs, device=device, episode_length_s=episode_length_s, seed=seed)
+
+
+def isaac_env_factory(headless=True):
+    """Isaac Sim の環境を作る関数を返す。Kit は1回だけ起動し、env_cfg はその後で読み込む"""
+    from isaaclab.app import AppLauncher
+    launcher = AppLauncher(headless=headless)
+
+    import env_cfg  # Kit の起動前には isaaclab の一部が読み込めない
+
+    def make(num_envs, device, episode_length_s, seed):
+        # env_cfg.py では設定と環境が同じ PorcaroRLEnvCfg クラス（spown_check.py と同じ作り方）
+        cfg = env_cfg.PorcaroRLEnvCfg()
+        cfg.scene.num_envs = num_envs
+        cfg.sim.device = device
+        cfg.episode_length_s = episode_length_s
+        cfg.seed = seed
+        return env_cfg.PorcaroRLEnvCfg(cfg)
+
+    make.app = launcher.app  # スイープが終わったら main() で閉じる
+    return make
+
+
+def make_env_factory(backend="auto", headless=True):
+    """--backend の名前から環境を作る関数を選ぶ（"auto" は isaaclab が無ければサロゲート）"""
+    if backend == "auto":
+        backend = "isaac" if importlib.util.find_spec("isaaclab") is not None else "surrogate"
+        if backend == "surrogate":
+            print("[INFO] isaaclab が見つからないので、サロゲートモデルでスイープします")
+    if backend == "isaac":
+        return isaac_env_factory(headless=headless)
+    if backend == "surrogate":
+        return surrogate_env_factory
+    raise ValueError(f"不明な環境の種類です: {backend}")
+
+
+# --- 4. 全体の実行（ウェーブ分割と再開） ---
+def _columns(names):
+    """CSVの列名（幅3のパラメータは name[0], name[1], name[2] に分ける）"""
+    columns = []
+    for n in names:
+        width = 1 if n in DISCRETE_PARAMS else param_width(n)
+        columns += [n] if width == 1 else [f"{n}[{k}]" for k in range(width)]
+    return columns
+
+
+def _row(point_id, point, names, metrics):
+    cells = [point_id]
+    for n in names:
+        if n not in point:
+            cells += [""] * (1 if n in DISCRETE_PARAMS else param_width(n))
+        elif n in DISCRETE_PARAMS or param_width(n) == 1:
+            cells.append(point[n])
+        else:
+            cells += _expand(n, point[n])
+    return cells + [metrics[k] for k in METRICS]
+
+
+def _write_rows(out_path, rows, append=True):
+    """行を一時ファイルに書いてから out_path と置き換える（書いている途中で止まっても、CSVは前の状態のまま）"""
+    tmp_path = out_path + ".tmp"
+    with open(tmp_path, "w", newline="") as f:
+        if append and os.path.exists(out_path):
+            with open(out_path, newline="") as src:
+                f.write(src.read())
+        csv.writer(f).writerows(rows)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, out_path)
+
+
+def _read_done(out_path):
+    """CSVに書き出し済みの点のIDを読む"""
+    if not os.path.exists(out_path):
+        return set()
+    with open(out_path, newline="") as f:
+        return {int(row["point_id"]) for row in csv.DictReader(f)}
+
+
+def run_sweep(points, num_envs, out_path, duration=5.0, device="cpu", seed=0, resume=False, env_factory=None):
+    """全ての点を num_envs ずつのウェーブに分けて実行し、結果をCSVへ追記する
+
+    env_factory: (num_envs, device, episode_length_s, seed) から PorcaroTask の環境を作る関数。
+                 None ならサロゲートモデル (surrogate_env_factory)
+    """
+    points = [{n: _check_value(n, v) for n, v in p.items()} for p in points]
+    names = sorted({k for p in points for k in p})
+    spec_path = out_path + ".points.json"
+
+    # --- 4-1. 再開のときは、前回と同じ点の一覧かどうかを確かめる ---
+    resuming = resume and os.path.exists(spec_path)
+    if resuming:
+        with open(spec_path) as f:
+            if json.load(f) != points:
+                raise ValueError(f"{spec_path} の点の一覧が今回のスイープと違うので再開できません")
+        done = _read_done(out_path)
+    else:
+        with open(spec_path, "w") as f:
+            json.dump(points, f)
+        done = set()
+    if not resuming or not os.path.exists(out_path):
+        _write_rows(out_path, [["point_id", *_columns(names), *METRICS]], append=False)
+
+    todo = [i for i in range(len(points)) if i not in done]
+    num_envs = min(num_envs, max(1, len(todo)))
+    print(f"{len(points)} points, {len(done)} already done, {len(todo)} to run on {num_envs} env(s)")
+    if not todo:
+        return
+
+    # --- 4-2. 環境は1回だけ作る（エピソードの途中でリセットされないよう、長さはウェーブに合わせる） ---
+    env_factory = env_factory or surrogate_env_factory
+    env = env_factory(num_envs, device, duration + 1.0, seed)
+    dt_ctrl = env.cfg.sim.dt * env.cfg.decimation
+    steps = max(1, int(round(duration / dt_ctrl)))
+    scene_ids = sorted({int(p.get("scene", 0)) for p in points} | {0})
+    commands = SceneCommands(scene_ids, num_envs, dt=dt_ctrl, duration=duration, device=env.device)
+
+    # --- 4-3. ウェーブごとに実行して、終わるたびにCSVを置き換える ---
+    num_waves = (len(todo) + num_envs - 1) // num_envs
+    for w in range(num_waves):
+        ids = todo[w * num_envs:(w + 1) * num_envs]
+        t0 = time.perf_counter()
+        with torch.inference_mode():
+            results = run_wave(env, commands, [points[i] for i in ids], steps)
+        _write_rows(out_path, [_row(i, points[i], names, m) for i, m in zip(ids, results)])
+        print(f"wave {w + 1}/{num_waves}: {len(ids)} points in {time.perf_counter() - t0:.2f} s")
+
+
+def _parse_value(text):
+    """"0.5" は数値、"0/2/4" は要素ごとの値のリスト"""
+    if "/" in text:
+        return [float(v) for v in text.split("/")]
+    return float(text)
+
+
+def _parse_values(text):
+    return [_parse_value(v) for v in text.split(",")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a parameter sweep packed into the env slots of one PorcaroTask environment.")
+    parser.add_argument("--grid", nargs="+", default=[], metavar="NAME=V1,V2,...",
+                        help="Grid values per parameter (A/B/C gives per-muscle values for width-3 params).")
+    parser.add_argument("--random", type=int, default=0, help="Number of random points (uses --range).")
+    parser.add_argument("--range", nargs="+", default=[], metavar="NAME=LOW:HIGH", help="Ranges for --random.")
+    parser.add_argument("--num_envs", type=int, default=64, help="Env slots per wave.")
+    parser.add_argument("--duration", type=float, default=5.0, help="Simulated time per point [s].")
+    parser.add_argument("--backend", choices=("auto", "isaac", "surrogate"), default="auto",
+                        help="Environment to run (auto: Isaac Sim if isaaclab is importable, else the CPU surrogate).")
+    parser.add_argument("--headless", action="store_true", help="Run Isaac Sim without a window.")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="sweep_results.csv", help="Path of the results table (CSV).")
+    parser.add_argument("--resume", action="store_true", help="Skip points already in --out.")
+    args = parser.parse_args()
+
+    if args.random > 0:
+        ranges = {}
+        for item in args.range:
+            name, span = item.split("=")
+            low, high = span.split(":")
+            ranges[name] = (_parse_value(low), _parse_value(high))
+        points = random_points(ranges, args.random, seed=args.seed)
+    else:
+        grid = {}
+        for item in args.grid:
+            name, values = item.split("=")
+            grid[name] = _parse_values(values)
+        points = grid_points(grid)
+    # シーンは登録されている番号だけ
+    for p in points:
+        if "scene" in p and int(p["scene"]) not in SCENES:
+            raise ValueError(f"登録されていないシーン番号です: {p['scene']}")
+
+    env_factory = make_env_factory(args.backend, headless=args.headless)
+    run_sweep(points, args.num_envs, args.out, args.duration, args.device, args.seed, args.resume,
+              env_factory=env_factory)
+    if hasattr(env_factory, "app"):
+        env_factory.app.close()
+
+
+if __name__ == "__main__":
+    main()
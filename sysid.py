@@ -0,0 +1,216 @@
+# sysid.py
+#
+# 記録した圧力指令と関節角度の軌道（telemetry.py の出力）から、
+# 筋肉パラメータ (r, L, Pmax) と関節の減衰をオフラインで同定するツール。
+#   - 記録のメタ情報にバルブの遅れ (actuation) があれば、指令圧力 pressure_cmd を同じ遅れに通して使う
+#   - ログは .npy チャンクを mmap で開き、毎世代ランダムに選んだ区間だけを読む（数GBでもOK）
+#   - 候補パラメータ × 区間 をまとめて1つのバッチにしてサロゲートモデルで並列にシミュレーション
+#   - 対数空間での対角共分散の進化戦略（CMA-ESの簡易版）で誤差を最小化
+#   - トルクは r*Pmax と r/L だけで決まるので、r, L, Pmax を別々に求めるときは --fix でどれか1つを固定する
+#   - 結果は muscle_params.json に書き出し、env_cfg.py などが load_muscle_params() で読み込む
+#
+# 使い方:
+#   python sysid.py telemetry/ --out muscle_params.json
+#   python sysid.py telemetry/ --fix Pmax=0.6 --out muscle_params.json
+
+import argparse
+import json
+import math
+
+import numpy as np
+import torch
+
+from actions.actuation import ActuationDynamics
+from actions.torque import DEFAULT_MUSCLE_PARAMS, MUSCLE_PARAMS_PATH, TorqueActionController
+from scenes import pressure_to_action
+from surrogate import SurrogateArticulation
+from telemetry import chunk_paths, load_meta
+
+PARAM_NAMES = ["r", "L", "Pmax", "damping"]
+
+
+class TraceReader:
+    """telemetry.py のチャンクを mmap で開き、任意の区間だけを読むクラス"""
+
+    def __init__(self, trace_dir, channels=("pressure_cmd", "joint_pos")):
+        self.chunks = {}
+        for name in channels:
+            # チャンクの探し方は telemetry.py と同じ（番号順・名前の先頭が同じチャンネルを混ぜない）
+            self.chunks[name] = [np.load(p, mmap_mode="r") for p in chunk_paths(trace_dir, name)]
+        first = self.chunks[channels[0]]
+        self.starts = np.cumsum([0] + [len(c) for c in first])
+        self.num_steps = int(self.starts[-1])
+        self.num_envs = first[0].shape[1]
+
+    def read(self, name, start, length, env):
+        """ステップ start から length ステップ分、環境 env の値を返す (length, 幅)"""
+        out = []
+        i = int(np.searchsorted(self.starts, start, side="right")) - 1
+        while length > 0:
+            chunk = self.chunks[name][i]
+            lo = start - self.starts[i]
+            n = min(length, len(chunk) - lo)
+            out.append(chunk[lo:lo + n, env])
+            start += n
+            length -= n
+            i += 1
+        return np.concatenate(out)
+
+
+def actuation_warmup(actuation, sim_dt):
+    """バルブの遅れと圧力の立ち上がりが区間の前の指令で落ち着くまでのステップ数"""
+    if not actuation:
+        return 0
+    return max(actuation["delay_ticks"]) + math.ceil(5 * max(actuation["tau"]) / sim_dt)
+
+
+def sample_segments(reader, num_segments, window, generator, joint_ids, warmup=0, channel="pressure_cmd"):
+    """ランダムに選んだ区間の (圧力, [手首, 握り] の関節角度) を返す
+
+    圧力は区間の前の warmup ステップも含めた (warmup + window, 区間数, 3)、
+    関節角度は (window, 区間数, 2)。channel は圧力のチャンネル名。
+    """
+    starts = torch.randint(warmup, reader.num_steps - window + 1, (num_segments,), generator=generator)
+    envs = torch.randint(0, reader.num_envs, (num_segments,), generator=generator)
+    pressure = np.stack([reader.read(channel, int(t) - warmup, warmup + window, int(e))
+                         for t, e in zip(starts, envs)], axis=1)
+    joint_pos = np.stack([reader.read("joint_pos", int(t), window, int(e)) for t, e in zip(starts, envs)], axis=1)
+    return torch.from_numpy(pressure).float(), torch.from_numpy(joint_pos[..., list(joint_ids)]).float()
+
+
+def rollout_loss(params, pressure, joint_pos, sim_dt, p_max_cmd, actuation=None):
+    """候補パラメータ (K, 4) ごとの関節角度の平均二乗誤差 (K,) を返す
+
+    バッチは K 候補 × S 区間 = K*S 環境で、環境 k*S + s が 候補k・区間s に対応する。
+    記録の joint_pos[t] は指令 pressure[warmup + t] を与える前の角度（telemetry.py と同じ）。
+    actuation: 記録のメタ情報の {"delay_ticks", "tau"}。あれば圧力を指令とみなして同じ遅れに通し、
+               先頭の warmup = len(pressure) - len(joint_pos) ステップで遅れの状態を温めておく
+    """
+    K = params.shape[0]
+    window, S, _ = joint_pos.shape
+    warmup = pressure.shape[0] - window
+    n = K * S
+
+    robot = SurrogateArticulation(n)
+    dynamics = None
+    if actuation:
+        dynamics = ActuationDynamics(dt=sim_dt, delay_ticks=actuation["delay_ticks"], tau=actuation["tau"])
+    controller = TorqueActionController(dt_ctrl=sim_dt, actuation=dynamics, num_envs=n)
+    per_env = params.repeat_interleave(S, dim=0)
+    # 記録の圧力は記録時のPmaxで計算されたもの。候補のPmaxでの実際の圧力に読み替える
+    controller.set_params(r=per_env[:, 0], L=per_env[:, 1], Pmax=per_env[:, 2])
+    robot.damping.copy_(per_env[:, 3:4].expand(-1, 2))
+
+    # 区間の最初の角度と、差分から求めた速度から始める
+    q = joint_pos.repeat(1, K, 1)
+    robot.data.joint_pos.copy_(q[0])
+    robot.data.joint_vel.copy_((q[1] - q[0]) / sim_dt)
+    actions = pressure_to_action(pressure, p_max_cmd).repeat(1, K, 1)
+    # 区間の前の指令でバルブの遅れを温める（ロボットは動かさない）
+    for t in range(warmup):
+        controller.compute(actions[t], robot.data.joint_pos, (0, 1))
+
+    err = torch.zeros(n)
+    for t in range(window - 1):
+        controller.apply(actions[warmup + t], robot.data.joint_pos, robot, (0, 1))
+        robot.update(sim_dt)
+        err.add_((robot.data.joint_pos - q[t + 1]).square().sum(dim=-1))
+    return err.view(K, S).mean(dim=1) / (2 * (window - 1))
+
+
+def fit(trace_dir, generations=30, population=64, segments=16, window=200, sim_dt=1 / 200,
+        p_max_cmd=None, init=None, sigma=0.2, seed=0, verbose=True, joint_ids=None, fixed=None):
+    """進化戦略でパラメータを同定し、(パラメータの辞書, 誤差) を返す
+
+    p_max_cmd: 記録したときのコントローラの Pmax。省略すると記録のメタ情報から読む（無ければ既定値）
+    joint_ids: 記録の joint_pos の [手首, 握り] の列。省略すると記録のメタ情報から読む
+    fixed: 同定せずに値を決めておくパラメータ {名前: 値}。トルクは r*Pmax と r/L だけで決まるので、
+           r, L, Pmax をそれぞれ求めるにはどれか1つ（ふつうはレギュレータの仕様で分かる Pmax）を固定する
+    メタ情報にバルブの遅れ (actuation) があれば指令圧力 pressure_cmd を、
+    無ければ（遅れの無い古い記録）pressure をそのまま使う。
+    """
+    meta = load_meta(trace_dir)
+    if p_max_cmd is None:
+        p_max_cmd = meta.get("p_max_cmd", DEFAULT_MUSCLE_PARAMS["Pmax"])
+    joint_ids = joint_ids or meta.get("joint_ids")
+    if joint_ids is None:
+        raise ValueError(f"{trace_dir} のメタ情報に joint_ids がありません。--joint_ids で指定してください。")
+    actuation = meta.get("actuation")
+    channel = "pressure_cmd" if actuation else "pressure"
+    warmup = actuation_warmup(actuation, sim_dt)
+    reader = TraceReader(trace_dir, channels=(channel, "joint_pos"))
+    warmup = min(warmup, reader.num_steps - 2)
+    window = min(window, reader.num_steps - warmup)
+    gen = torch.Generator().manual_seed(seed)
+
+    fixed = fixed or {}
+    init = {**DEFAULT_MUSCLE_PARAMS, **(init or {}), **fixed}
+    mean = torch.log(torch.tensor([init[k] for k in PARAM_NAMES]))
+    free = torch.tensor([k not in fixed for k in PARAM_NAMES], dtype=torch.float32)
+    std = torch.full((len(PARAM_NAMES),), sigma) * free
+    num_elite = max(2, population // 4)
+    # 上位ほど重みを大きくする（CMA-ESと同じ対数の重み）
+    weights = torch.log(torch.tensor(num_elite + 0.5)) - torch.log(torch.arange(1, num_elite + 1).float())
+    weights /= weights.sum()
+
+    for g in range(generations):
+        pressure, joint_pos = sample_segments(reader, segments, window, gen, joint_ids, warmup, channel)
+        eps = torch.randn((population, len(PARAM_NAMES)), generator=gen)
+        eps[0] = 0.0  # 現在の平均も候補に入れておく
+        theta = mean + std * eps
+        loss = rollout_loss(torch.exp(theta), pressure, joint_pos, sim_dt, p_max_cmd, actuation)
+
+        order = torch.argsort(loss)[:num_elite]
+        elite = theta[order]
+        new_mean = (weights[:, None] * elite).sum(dim=0)
+        std = torch.sqrt((weights[:, None] * (elite - mean).square()).sum(dim=0)).clamp(min=1e-3, max=1.0) * free
+        mean = new_mean
+        if verbose:
+            best = {k: round(v, 5) for k, v in zip(PARAM_NAMES, torch.exp(theta[order[0]]).tolist())}
+            print(f"gen {g:3d} | best loss {loss[order[0]].item():.3e} | {best}")
+
+    # 最後に新しい区間で平均のパラメータを評価する
+    pressure, joint_pos = sample_segments(reader, segments * 4, window, gen, joint_ids, warmup, channel)
+    final = torch.exp(mean)
+    final_loss = rollout_loss(final[None], pressure, joint_pos, sim_dt, p_max_cmd, actuation).item()
+    return dict(zip(PARAM_NAMES, final.tolist())), final_loss
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit muscle and damping parameters from recorded trajectories.")
+    parser.add_argument("trace_dir",
+                        help="Directory written by TelemetryRecorder (pressure_cmd or pressure / joint_pos chunks).")
+    parser.add_argument("--out", default=str(MUSCLE_PARAMS_PATH), help="Output config loaded by the env.")
+    parser.add_argument("--generations", type=int, default=30)
+    parser.add_argument("--population", type=int, default=64)
+    parser.add_argument("--segments", type=int, default=16, help="Trajectory segments per generation.")
+    parser.add_argument("--window", type=int, default=200, help="Segment length in physics steps.")
+    parser.add_argument("--dt", type=float, default=1 / 200)
+    parser.add_argument("--pmax_cmd", type=float, default=None,
+                        help="Pmax used when the pressures were recorded (default: read from the trace meta).")
+    parser.add_argument("--joint_ids", type=int, nargs=2, default=None,
+                        help="Wrist and grip columns of joint_pos (default: read from the trace meta).")
+    parser.add_argument("--fix", nargs="+", default=[], metavar="NAME=VALUE",
+                        help="Hold these parameters at known values (e.g. Pmax=0.6; r, L and Pmax are only "
+                             "identifiable together otherwise).")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    fixed = {}
+    for item in args.fix:
+        name, value = item.split("=")
+        if name not in PARAM_NAMES:
+            raise ValueError(f"不明なパラメータです: {name}")
+        fixed[name] = float(value)
+
+    torch.set_grad_enabled(False)
+    params, loss = fit(args.trace_dir, args.generations, args.population, args.segments, args.window,
+                       args.dt, args.pmax_cmd, seed=args.seed, joint_ids=args.joint_ids, fixed=fixed)
+    print(f"fitted: {params} | loss {loss:.3e}")
+    with open(args.out, "w") as f:
+        json.dump(dict(params, loss=loss), f, indent=2)
+    print(f"Saved to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+# telemetry.py
+#
+# シミュレーションループの全ステップ分の値（関節角度・圧力指令・トルク・ルート状態）を
+# デバイス上のリングバッファに貯め、チャンク単位でまとめてディスクへ書き出すレコーダー。
+# ループの中ではGPU→CPUの同期を起こさず、書き出しと集計はバックグラウンドのスレッドで行います。
+#
+# 出力: out_dir/<チャンネル名>_<チャンク番号>.npy  （形状: (chunk_len, num_envs, 幅)）
+#       out_dir/index.json  （チャンネル・メタ情報・書き出し済みチャンクの一覧。replay.py が読む）
+
+import json
+import os
+import queue
+import re
+import threading
+
+import numpy as np
+import torch
+
+
+class TelemetryRecorder:
+    """全ステップの値をチャンクごとに .npy へ書き出すレコーダー"""
+
+    def __init__(self, channels, num_envs, device, out_dir="telemetry", chunk_len=1000, max_pending=2, meta=None):
+        # channels: {"joint_pos": 幅, "pressure": 3, ...}
+        self.channels = dict(channels)
+        self.num_envs = num_envs
+        self.device = torch.device(device)
+        self.out_dir = out_dir
+        self.chunk_len = chunk_len
+        os.makedirs(out_dir, exist_ok=True)
+
+        # --- 1. デバイス上のリングバッファ（2チャンク分で交互に使う） ---
+        self._ring = {
+            name: torch.zeros((2 * chunk_len, num_envs, width), device=self.device)
+            for name, width in self.channels.items()
+        }
+
+        # --- 2. ホスト側の転送先バッファ（数を固定してメモリ使用量に上限を設ける） ---
+        pin = self.device.type == "cuda"
+        self._free = queue.Queue()
+        for _ in range(max_pending + 1):
+            host = {
+                name: torch.zeros((chunk_len, num_envs, width), pin_memory=pin)
+                for name, width in self.channels.items()
+            }
+            self._free.put(host)
+        self._pending = queue.Queue(maxsize=max_pending)
+
+        self.step = 0          # 記録したステップ数
+        self.chunk = 0         # 書き出しを依頼したチャンク数
+        self.last_summary = None
+        self._summary_chunk = -1
+
+        # 書き出し済みチャンクの目録（チャンクを書き終えるたびに追記して保存し直す）
+        self._index = {
+            "num_envs": num_envs,
+            "chunk_len": chunk_len,
+            "channels": self.channels,
+            "meta": meta or {},
+            "chunks": [],
+        }
+        self._save_index()
+
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+
+    def record(self, **values):
+        """1ステップ分の値をリングバッファにコピーする（同期なし）"""
+        slot = self.step % (2 * self.chunk_len)
+        for name, value in values.items():
+            self._ring[name][slot].copy_(value.reshape(self.num_envs, -1))
+        self.step += 1
+        if self.step % self.chunk_len == 0:
+            self._submit(self.chunk_len)
+
+    def _submit(self, length):
+        """貯まったチャンクをホストへ非同期コピーし、書き出しスレッドに渡す"""
+        start = ((self.step - 1) // self.chunk_len % 2) * self.chunk_len
+        host = self._free.get()  # 空きバッファが無ければ書き出しが追いつくまで待つ
+        for name in self.channels:
+            host[name][:length].copy_(self._ring[name][start:start + length], non_blocking=True)
+        event = None
+        if self.device.type == "cuda":
+            event = torch.cuda.Event()
+            event.record()
+        self._pending.put((self.chunk, length, host, event))
+        self.chunk += 1
+
+    def _write_loop(self):
+        while True:
+            item = self._pending.get()
+            if item is None:
+                break
+            chunk, length, host, event = item
+            if event is not None:
+                event.synchronize()
+
+            summary = {}
+            for name, tensor in host.items():
+                data = tensor[:length].numpy()
+                path = os.path.join(self.out_dir, f"{name}_{chunk:06d}.npy")
+                out = np.lib.format.open_memmap(path, mode="w+", dtype=data.dtype, shape=data.shape)
+                out[:] = data
+                out.flush()
+                del out
+                summary[name] = (data[-1].mean(axis=0), data.min(axis=(0, 1)), data.max(axis=(0, 1)))
+            self.last_summary = (chunk, summary)
+            self._free.put(host)
+            self._index["chunks"].append({"chunk": chunk, "start": chunk * self.chunk_len, "length": length})
+            self._save_index()
+
+    def _save_index(self):
+        # 書きかけの index.json を読まれないように、一時ファイルに書いてから置き換える
+        path = os.path.join(self.out_dir, "index.json")
+        with open(path + ".tmp", "w") as f:
+            json.dump(self._index, f, indent=1)
+        os.replace(path + ".tmp", path)
+
+    def poll_summary(self):
+        """新しく書き出されたチャンクがあれば、その集計結果を文字列で返す"""
+        latest = self.last_summary
+        if latest is None or latest[0] == self._summary_chunk:
+            return None
+        chunk, summary = latest
+        self._summary_chunk = chunk
+        lines = [f"[telemetry] chunk {chunk} (steps {chunk * self.chunk_len}-{(chunk + 1) * self.chunk_len - 1})"]
+        for name, (last, lo, hi) in summary.items():
+            lines.append(f"  {name:12s} last(env mean): {np.array2string(last, precision=3)}"
+                         f" | min: {np.array2string(lo, precision=3)} | max: {np.array2string(hi, precision=3)}")
+        return "\n".join(lines)
+
+    def close(self):
+        """途中まで貯まったチャンクを書き出してスレッドを止める"""
+        remainder = self.step % self.chunk_len
+        if remainder:
+            self._submit(remainder)
+        self._pending.put(None)
+        self._writer.join()
+
+
+def chunk_paths(out_dir, name):
+    """チャンネル name のチャンクのパスをチャンク番号の順に返す
+
+    "pressure" と "pressure_cmd" のように名前の先頭が同じチャンネルを混ぜないよう、
+    ファイル名が "{name}_{番号}.npy" のものだけを選ぶ。
+    """
+    pattern = re.compile(re.escape(name) + r"_(\d+)\.npy")
+    found = sorted((int(m.group(1)), f) for f in os.listdir(out_dir) if (m := pattern.fullmatch(f)))
+    if not found:
+        raise FileNotFoundError(f"{out_dir} に '{name}' のチャンクがありません。")
+    return [os.path.join(out_dir, f) for _, f in found]
+
+
+def load_channel(out_dir, name):
+    """書き出されたチャンクをつなげて (ステップ数, num_envs, 幅) の配列を返す"""
+    return np.concatenate([np.load(p, mmap_mode="r") for p in chunk_paths(out_dir, name)])
+
+
+def load_meta(out_dir):
+    """index.json に書かれたメタ情報を返す（index.json が無い古い記録なら空の辞書）"""
+    path = os.path.join(out_dir, "index.json")
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f).get("meta", {})
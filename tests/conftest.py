@@ -0,0 +1,8 @@
+# tests/conftest.py
+#
+# テストからリポジトリ直下のモジュール（actions, render など）を import できるようにする。
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
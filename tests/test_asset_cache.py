@@ -0,0 +1,187 @@
+# tests/test_asset_cache.py
+#
+# asset_cache のテスト。
+# cached_assets()（pxr は使わない）:
+#   - (mtime_ns, サイズ) が変わっていなければ、ファイルのハッシュを計算しない
+#   - 中身が変わればキャッシュを使わない
+#   - touch されただけなら、1回だけハッシュを計算してスタンプを更新する
+# 焼き込み（pxr があるときだけ。小さなUSDをその場で作って使う）:
+#   - ドラムのUSDのルートが持つ変換（位置と向き）は、取り付け位置と合成されて残る
+#   - flatten() の出力は他のファイルを読み込まない
+#   - build_cache() で作ったキャッシュを cached_assets() が返し、ドラムの位置の確認を通る
+
+import json
+import os
+
+import pytest
+
+import asset_cache
+
+
+def make_cache(tmp_path):
+    """元のファイル2つと、それに対するキャッシュとマニフェストを作る"""
+    sources = []
+    for name in ("a.usd", "b.png"):
+        path = tmp_path / name
+        path.write_bytes(name.encode() * 100)
+        sources.append(str(path))
+    cache_dir = tmp_path / asset_cache.CACHE_DIRNAME
+    cache_dir.mkdir()
+    outputs = {"robot": "robot_x.usd", "drum_stand": "stand_x.usd"}
+    for file in outputs.values():
+        (cache_dir / file).write_text("#usda 1.0\n")
+    asset_cache._write_manifest(cache_dir, {
+        "version": asset_cache.BAKE_VERSION,
+        "files": {p: asset_cache._file_hash(p) for p in sources},
+        "stamps": {p: asset_cache._stamp(p) for p in sources},
+        "outputs": outputs,
+        "drum_prim": "StandArm_link/Drum",
+    })
+    return sources
+
+
+def count_hashes(monkeypatch):
+    calls = []
+    real = asset_cache._file_hash
+    monkeypatch.setattr(asset_cache, "_file_hash", lambda path: calls.append(path) or real(path))
+    return calls
+
+
+def test_unchanged_files_are_not_hashed(tmp_path, monkeypatch):
+    make_cache(tmp_path)
+    calls = count_hashes(monkeypatch)
+    cached = asset_cache.cached_assets(tmp_path)
+    assert cached is not None and cached["drum_prim"] == "StandArm_link/Drum"
+    assert calls == []
+
+
+def test_changed_file_invalidates_cache(tmp_path):
+    sources = make_cache(tmp_path)
+    with open(sources[1], "ab") as f:
+        f.write(b"edit")
+    assert asset_cache.cached_assets(tmp_path) is None
+
+
+def test_same_size_edit_invalidates_cache(tmp_path):
+    sources = make_cache(tmp_path)
+    st = os.stat(sources[0])
+    with open(sources[0], "r+b") as f:
+        f.write(b"X")
+    os.utime(sources[0], ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    assert asset_cache.cached_assets(tmp_path) is None
+
+
+def test_touched_file_is_hashed_once(tmp_path, monkeypatch):
+    sources = make_cache(tmp_path)
+    st = os.stat(sources[0])
+    os.utime(sources[0], ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    calls = count_hashes(monkeypatch)
+    assert asset_cache.cached_assets(tmp_path) is not None
+    assert calls == [sources[0]]
+    with open(tmp_path / asset_cache.CACHE_DIRNAME / asset_cache.MANIFEST) as f:
+        assert json.load(f)["stamps"][sources[0]] == asset_cache._stamp(sources[0])
+    assert asset_cache.cached_assets(tmp_path) is not None
+    assert calls == [sources[0]]
+
+
+def test_missing_file_invalidates_cache(tmp_path):
+    sources = make_cache(tmp_path)
+    os.remove(sources[0])
+    assert asset_cache.cached_assets(tmp_path) is None
+
+
+# --- 焼き込み（pxr） ---
+STAND_POS = (1.0, 2.0, 0.0)
+LINK_POS = (0.0, 0.0, 0.5)
+DRUM_ROOT_POS = (0.03, 0.0, 0.0)  # ドラムのUSDのルート自身の位置（向きは X 軸まわりに 90 度）
+
+
+def make_sources(directory):
+    """小さなドラムスタンド・ドラム・ロボットのUSDを作り、{名前: パス} を返す"""
+    pytest.importorskip("pxr")
+    from pxr import Gf, Usd, UsdGeom
+
+    def new_stage(name, root_path):
+        stage = Usd.Stage.CreateNew(str(directory / asset_cache.SOURCES[name]))
+        root = UsdGeom.Xform.Define(stage, root_path)
+        stage.SetDefaultPrim(root.GetPrim())
+        return stage, root
+
+    stage, root = new_stage("drum", "/Drum")
+    root.AddTranslateOp().Set(Gf.Vec3d(*DRUM_ROOT_POS))
+    root.AddRotateXOp().Set(90.0)
+    UsdGeom.Cube.Define(stage, "/Drum/Shell").AddTranslateOp().Set(Gf.Vec3d(0.0, 0.01, 0.0))
+    stage.GetRootLayer().Save()
+
+    stage, root = new_stage("drum_stand", "/Stand")
+    root.AddTranslateOp().Set(Gf.Vec3d(*STAND_POS))
+    link = UsdGeom.Xform.Define(stage, "/Stand/" + asset_cache.DRUM_PARENT_LINK)
+    link.AddTranslateOp().Set(Gf.Vec3d(*LINK_POS))
+    link.AddRotateZOp().Set(90.0)
+    stage.GetRootLayer().Save()
+
+    # ロボットはドラムを参照するだけ（flatten で参照が展開されるかを見る）
+    stage, root = new_stage("robot", "/Robot")
+    UsdGeom.Xform.Define(stage, "/Robot/Stick").GetPrim().GetReferences().AddReference(
+        str(directory / asset_cache.SOURCES["drum"]))
+    stage.GetRootLayer().Save()
+    return {name: directory / file for name, file in asset_cache.SOURCES.items()}
+
+
+def world_position(usd_path, prim_path):
+    from pxr import Usd, UsdGeom
+    stage = Usd.Stage.Open(str(usd_path))
+    return UsdGeom.XformCache().GetLocalToWorldTransform(stage.GetPrimAtPath(prim_path)).ExtractTranslation()
+
+
+def test_bake_keeps_drum_root_transform(tmp_path):
+    sources = make_sources(tmp_path)
+    out = tmp_path / "baked.usda"
+    drum_prim = asset_cache.bake_drum_stand(sources["drum_stand"], sources["drum"], out)
+    assert drum_prim == asset_cache.DRUM_PARENT_LINK + "/" + asset_cache.DRUM_PRIM_NAME
+    assert asset_cache.check_drum_placement(out, sources["drum"]) < 1e-6
+
+    # Shell (0, 0.01, 0) -> ルートの X 90度 -> (0, 0, 0.01) -> ルートの位置 -> (0.03, 0, 0.01)
+    # -> 取り付け位置 (0, 0, 0.1) -> リンクの Z 90度 -> (0, 0.03, 0.11) -> リンク・スタンドの位置
+    shell = world_position(out, "/Stand/StandArm_link/Drum/Shell")
+    expected = (STAND_POS[0], STAND_POS[1] + 0.03, LINK_POS[2] + asset_cache.DRUM_LOCAL_POS[2] + 0.01)
+    assert list(shell) == pytest.approx(expected, abs=1e-9)
+
+
+def test_placement_check_catches_dropped_root_transform(tmp_path):
+    from pxr import Gf, Usd, UsdGeom
+    sources = make_sources(tmp_path)
+    # 取り付け位置だけを書いて、ドラムのルートの変換を上書きしてしまった焼き方
+    stage = Usd.Stage.Open(str(sources["drum_stand"]))
+    drum = UsdGeom.Xform.Define(stage, "/Stand/StandArm_link/Drum")
+    drum.GetPrim().GetReferences().AddReference(str(sources["drum"]))
+    drum.ClearXformOpOrder()
+    drum.AddTranslateOp().Set(Gf.Vec3d(*asset_cache.DRUM_LOCAL_POS))
+    out = tmp_path / "dropped.usda"
+    stage.Flatten().Export(str(out))
+
+    assert asset_cache.check_drum_placement(out) < 1e-6  # 取り付け位置だけなら合っている
+    with pytest.raises(ValueError):
+        asset_cache.check_drum_placement(out, sources["drum"])
+
+
+def test_flatten_inlines_references(tmp_path):
+    from pxr import UsdUtils
+    sources = make_sources(tmp_path)
+    out = tmp_path / "robot_flat.usda"
+    asset_cache.flatten(sources["robot"], out)
+    layers, assets, unresolved = UsdUtils.ComputeAllDependencies(str(out))
+    assert [os.path.abspath(layer.realPath) for layer in layers] == [str(out)]
+    assert not assets and not unresolved
+    assert list(world_position(out, "/Robot/Stick/Shell")) == pytest.approx([0.03, 0.0, 0.01], abs=1e-9)
+
+
+def test_build_cache_bakes_and_reuses(tmp_path, monkeypatch):
+    sources = make_sources(tmp_path)
+    cached = asset_cache.build_cache(tmp_path)
+    assert cached["drum_prim"] == "StandArm_link/Drum"
+    assert asset_cache.check_drum_placement(cached["drum_stand"], sources["drum"]) < 1e-6
+
+    # 2回目は焼き直さない
+    monkeypatch.setattr(asset_cache, "bake_drum_stand", lambda *a: pytest.fail("rebaked"))
+    assert asset_cache.build_cache(tmp_path) == cached
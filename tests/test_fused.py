@@ -0,0 +1,95 @@
+# tests/test_fused.py
+#
+# FusedTorquePath の全バックエンドが TorqueActionController.compute と同じトルクを返すことのテスト。
+# 圧力の遅れ (actuation) があるコントローラでも、遅れの状態を含めて同じになること。
+# eager / script はビット単位で一致、compile は COMPILE_RTOL 以内で一致すること。
+
+import warnings
+
+import pytest
+import torch
+
+from actions.actuation import ActuationDynamics
+from actions.fused import COMPILE_RTOL, FusedTorquePath
+from actions.torque import TorqueActionController
+
+JOINT_IDS = (0, 2)
+
+
+def inputs(num_envs, steps=20):
+    """クリップの範囲外も含むアクションと、伸び・縮みの上限を超える関節角度"""
+    g = torch.Generator().manual_seed(num_envs)
+    return [
+        (torch.rand((num_envs, 3), generator=g) * 2.4 - 1.2, (torch.rand((num_envs, 5), generator=g) - 0.5) * 4)
+        for _ in range(steps)
+    ]
+
+
+def make_controller(num_envs):
+    controller = TorqueActionController(1 / 50, num_envs=num_envs)
+    # 環境ごとに違うパラメータでも同じになることを確かめる
+    g = torch.Generator().manual_seed(1)
+    controller.set_params(r=0.012 + 0.004 * torch.rand(num_envs, generator=g),
+                          L=0.14 + 0.02 * torch.rand(num_envs, generator=g),
+                          Pmax=0.55 + 0.1 * torch.rand(num_envs, generator=g))
+    return controller
+
+
+@pytest.mark.parametrize("backend", ["eager", "script", "compile"])
+@pytest.mark.parametrize("num_envs", [1, 64])
+def test_backend_matches_controller(backend, num_envs):
+    controller = make_controller(num_envs)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", FutureWarning)  # torch.jit.script の非推奨の警告
+        fused = FusedTorquePath(controller, JOINT_IDS, backend=backend)
+    for actions, q in inputs(num_envs):
+        expected = controller.compute(actions, q, JOINT_IDS).clone()
+        try:
+            torque = fused(actions, q)
+        except Exception as e:
+            if backend != "compile":
+                raise
+            pytest.skip(f"torch.compile が使えません: {type(e).__name__}")
+        assert torque.data_ptr() == fused.out.data_ptr()
+        if backend == "compile":
+            torch.testing.assert_close(torque, expected, rtol=0.0, atol=COMPILE_RTOL * expected.abs().max().item())
+        else:
+            assert torch.equal(torque, expected)
+
+
+def make_actuated_controller(num_envs):
+    controller = make_controller(num_envs)
+    controller.actuation = ActuationDynamics(dt=1 / 200)
+    controller.allocate(num_envs, "cpu")
+    # 遅れ0（今の指令をそのまま使う）を含め、環境ごと・筋肉ごとに違う遅れと時定数にする
+    g = torch.Generator().manual_seed(2)
+    controller.actuation.set_params(delay_ticks=torch.randint(0, 5, (num_envs, 3), generator=g),
+                                    tau=0.02 + 0.06 * torch.rand((num_envs, 3), generator=g))
+    return controller
+
+
+@pytest.mark.parametrize("backend", ["eager", "script", "compile"])
+@pytest.mark.parametrize("num_envs", [1, 64])
+def test_backend_matches_controller_with_actuation(backend, num_envs):
+    # 遅れの状態が進むので、比較用のコントローラは別に作る
+    reference = make_actuated_controller(num_envs)
+    controller = make_actuated_controller(num_envs)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", FutureWarning)
+        fused = FusedTorquePath(controller, JOINT_IDS, backend=backend)
+    for actions, q in inputs(num_envs):  # 履歴の長さより多いステップで、リングバッファが1周以上する
+        expected = reference.compute(actions, q, JOINT_IDS).clone()
+        try:
+            torque = fused(actions, q)
+        except Exception as e:
+            if backend != "compile":
+                raise
+            pytest.skip(f"torch.compile が使えません: {type(e).__name__}")
+        if backend == "compile":
+            torch.testing.assert_close(torque, expected, rtol=0.0, atol=COMPILE_RTOL * expected.abs().max().item())
+        else:
+            assert torch.equal(torque, expected)
+            assert torch.equal(controller.pressure_cmd, reference.pressure_cmd)
+            assert torch.equal(controller.actuation.pressure, reference.actuation.pressure)
+            assert torch.equal(controller.actuation.buffer, reference.actuation.buffer)
+        assert controller.actuation._head == reference.actuation._head
@@ -0,0 +1,42 @@
+# tests/test_normalizer.py
+#
+# ObservationNormalizer のテスト。
+#   - 大きさがばらばらのバッチで更新しても、平均と分散は全サンプルの np.mean / np.var と一致する
+#   - サンプル数は 2^24 を超えても正確に数える（float32 では増えなくなる）
+
+import numpy as np
+import pytest
+import torch
+
+from normalizer import ObservationNormalizer
+
+
+def test_merge_matches_numpy_over_uneven_batches():
+    rng = np.random.default_rng(0)
+    sizes = [1, 7, 64, 3, 200, 64, 2]
+    batches = [rng.normal(loc=[1.0, -3.0, 50.0], scale=[0.5, 2.0, 10.0], size=(n, 3)).astype(np.float32)
+               for n in sizes]
+    normalizer = ObservationNormalizer(3, num_envs=64, device="cpu")
+    for batch in batches:
+        normalizer.update(torch.from_numpy(batch))
+
+    everything = np.concatenate(batches).astype(np.float64)
+    assert normalizer.count.item() == sum(sizes)
+    assert normalizer.mean.numpy() == pytest.approx(everything.mean(axis=0), rel=1e-5)
+    assert normalizer.var.numpy() == pytest.approx(everything.var(axis=0), rel=1e-4)
+
+
+def test_normalize_uses_merged_statistics():
+    normalizer = ObservationNormalizer(2, num_envs=4, device="cpu", clip=100.0)
+    obs = torch.tensor([[0.0, 10.0], [2.0, 20.0], [4.0, 30.0], [6.0, 40.0]])
+    out = normalizer(obs)
+    expected = (obs - obs.mean(dim=0)) / torch.sqrt(obs.var(dim=0, unbiased=False) + normalizer.eps)
+    assert torch.allclose(out, expected, atol=1e-6)
+
+
+def test_count_keeps_counting_past_float32_precision():
+    normalizer = ObservationNormalizer(1, num_envs=4, device="cpu")
+    normalizer.count.fill_(2 ** 24)
+    for _ in range(3):
+        normalizer.update(torch.ones((1, 1)))
+    assert normalizer.count.item() == 2 ** 24 + 3
@@ -0,0 +1,85 @@
+# tests/test_profiler.py
+#
+# PhaseProfiler の集計と、CUDAイベントの待ち行列が増え続けないことのテスト。
+# GPUの無いマシンでも動くように、CUDAイベントは時間だけを返す偽物に置き換える。
+
+import torch
+
+from profiler import PhaseProfiler
+
+
+class FakeEvent:
+    """torch.cuda.Event の代わり。record() した順に 1 ms ずつ進む時刻を持つ"""
+
+    clock = 0.0
+    done = True
+
+    def __init__(self, enable_timing=False):
+        self.time = None
+
+    def record(self):
+        FakeEvent.clock += 1.0
+        self.time = FakeEvent.clock
+
+    def query(self):
+        return FakeEvent.done
+
+    def elapsed_time(self, end):
+        return end.time - self.time
+
+
+def make_cuda_profiler(monkeypatch, **kwargs):
+    monkeypatch.setattr(torch.cuda, "Event", FakeEvent)
+    FakeEvent.done = True
+    profiler = PhaseProfiler(enabled=True, **kwargs)
+    profiler.use_cuda = True
+    return profiler
+
+
+def test_cpu_phases_are_counted():
+    profiler = PhaseProfiler(enabled=True)
+    for _ in range(10):
+        with profiler.phase("a"):
+            pass
+        with profiler.phase("b"):
+            pass
+    summary = profiler.summary()
+    assert summary["a"]["cpu"]["count"] == 10 and summary["b"]["cpu"]["count"] == 10
+    assert "gpu" not in summary["a"]
+    assert len(profiler.report().splitlines()) == 2
+
+
+def test_disabled_profiler_records_nothing():
+    profiler = PhaseProfiler(enabled=False)
+    with profiler.phase("a"):
+        pass
+    assert profiler.summary() == {}
+
+
+def test_report_drains_cuda_events(monkeypatch):
+    profiler = make_cuda_profiler(monkeypatch)
+    for _ in range(100):
+        with profiler.phase("step"):
+            pass
+    assert len(profiler._pending) == 100
+    report = profiler.report()
+    assert len(profiler._pending) == 0
+    assert "gpu mean" in report
+    assert profiler._phases["step"].gpu.count == 100
+
+
+def test_pending_queue_is_bounded(monkeypatch):
+    profiler = make_cuda_profiler(monkeypatch, max_pending=16)
+    # GPUがずっと終わらない場合でも、待ち行列は上限を超えない
+    FakeEvent.done = False
+    for _ in range(1000):
+        with profiler.phase("step"):
+            pass
+    assert len(profiler._pending) == 16
+    # 終わったものは上限に達したときに集計される
+    FakeEvent.done = True
+    for _ in range(20):
+        with profiler.phase("step"):
+            pass
+    assert len(profiler._pending) <= 16
+    assert profiler._phases["step"].gpu.count > 0
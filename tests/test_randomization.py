@@ -0,0 +1,86 @@
+# tests/test_randomization.py
+#
+# DomainRandomizer のテスト。
+#   - 一様乱数は必ず [0, 1) に収まり、サンプルした値は範囲の中にある
+#   - 環境ごとの値は、どの環境がいっしょにリセットされたかに関係なく同じになる
+#   - 同じ seed なら同じ値、違う seed なら違う値になる
+#   - sample() は選び直した行だけの値を返す
+
+import torch
+
+from randomization import DomainRandomizer, ParamRange
+
+RANGES = {
+    "r": ParamRange(0.012, 0.016),
+    "damping": ParamRange(0.01, 0.04, "log_uniform"),
+    "offset": ParamRange(-0.02, 0.02, width=3),
+}
+NUM_ENVS = 64
+
+
+def test_uniform_is_below_one():
+    randomizer = DomainRandomizer(RANGES, num_envs=4096, device="cpu")
+    for _ in range(8):
+        u = randomizer._uniform(randomizer._all_ids)
+        assert u.dtype == torch.float32
+        assert (u >= 0).all() and (u < 1).all()
+        randomizer.draw_count += 1
+
+
+def test_samples_stay_in_range():
+    randomizer = DomainRandomizer(RANGES, num_envs=NUM_ENVS, device="cpu")
+    for _ in range(10):
+        randomizer.sample()
+        for name, rng in RANGES.items():
+            v = randomizer.values[name]
+            assert v.shape == (NUM_ENVS, rng.width)
+            assert (v >= rng.low).all() and (v <= rng.high).all()
+
+
+def test_values_do_not_depend_on_which_envs_reset_together():
+    # a: 全環境を2回まとめて選び直す / b: 環境ごとにばらばらの順番・組み合わせで2回ずつ選び直す
+    a = DomainRandomizer(RANGES, num_envs=NUM_ENVS, device="cpu", seed=3)
+    a.sample()
+    a.sample()
+
+    b = DomainRandomizer(RANGES, num_envs=NUM_ENVS, device="cpu", seed=3)
+    perm = torch.randperm(NUM_ENVS, generator=torch.Generator().manual_seed(0))
+    for chunk in perm.split(5):
+        b.sample(chunk)
+    b.sample(torch.arange(0, NUM_ENVS, 2))
+    b.sample(torch.arange(1, NUM_ENVS, 2))
+
+    for name in RANGES:
+        assert torch.equal(a.values[name], b.values[name])
+    assert torch.equal(a.draw_count, b.draw_count)
+
+
+def test_seed_changes_values():
+    a = DomainRandomizer(RANGES, num_envs=NUM_ENVS, device="cpu", seed=0)
+    b = DomainRandomizer(RANGES, num_envs=NUM_ENVS, device="cpu", seed=0)
+    c = DomainRandomizer(RANGES, num_envs=NUM_ENVS, device="cpu", seed=1)
+    for r in (a, b, c):
+        r.sample()
+    assert torch.equal(a.values["r"], b.values["r"])
+    assert not torch.equal(a.values["r"], c.values["r"])
+
+
+def test_only_selected_envs_change():
+    randomizer = DomainRandomizer(RANGES, num_envs=NUM_ENVS, device="cpu")
+    randomizer.sample()
+    before = {name: v.clone() for name, v in randomizer.values.items()}
+    randomizer.sample(torch.tensor([1, 5]))
+    for name, v in randomizer.values.items():
+        changed = (v != before[name]).any(dim=1).nonzero().flatten().tolist()
+        assert set(changed) <= {1, 5}
+    assert randomizer.draw_count.tolist() == [2 if i in (1, 5) else 1 for i in range(NUM_ENVS)]
+
+
+def test_sample_returns_sampled_rows():
+    randomizer = DomainRandomizer(RANGES, num_envs=NUM_ENVS, device="cpu")
+    ids = torch.tensor([2, 7, 30])
+    rows = randomizer.sample(ids)
+    for name, v in randomizer.values.items():
+        assert torch.equal(rows[name], v[ids])
+        assert torch.equal(randomizer.rows(ids)[name], v[ids])
+    assert randomizer.sample() is randomizer.values
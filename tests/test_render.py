@@ -0,0 +1,118 @@
+# tests/test_render.py
+#
+# render.py のヘッドレスのテスト（Isaac Sim も ffmpeg も使わない）。
+#   - RenderScheduler: 偽の時計で、目標のFPSの間隔で描画し、大きく遅れたら数え直すこと
+#   - VideoCapture: 書き出しが詰まっていても submit() は待たずにフレームを捨て、
+#     受け取ったフレームは close() までに全て書き出されること
+
+import threading
+import time
+
+import numpy as np
+
+from render import DummyFrameSource, RenderScheduler, VideoCapture
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def run_scheduler(scheduler, clock, times):
+    result = []
+    for t in times:
+        clock.now = t
+        result.append(scheduler.should_render())
+    return result
+
+
+def test_scheduler_keeps_target_period():
+    clock = FakeClock()
+    scheduler = RenderScheduler(4.0, clock=clock)  # 0.25 s ごと
+    times = [i * 0.0625 for i in range(17)]  # 0 ~ 1.0 s を 1/16 s 刻み
+    rendered = run_scheduler(scheduler, clock, times)
+    assert [t for t, r in zip(times, rendered) if r] == [0.0, 0.25, 0.5, 0.75, 1.0]
+    assert scheduler.rendered == 5 and scheduler.skipped == 12
+
+
+def test_scheduler_small_delay_keeps_phase_and_large_delay_restarts():
+    clock = FakeClock()
+    scheduler = RenderScheduler(4.0, clock=clock)
+    # 0.3 s は少しの遅れ（次は 0.5 s のまま）、1.5 s は1周期以上の遅れ（次は 1.75 s から）
+    rendered = run_scheduler(scheduler, clock, [0.0, 0.3, 0.45, 0.5, 1.5, 1.625, 1.75])
+    assert rendered == [True, True, False, True, True, False, True]
+
+
+def test_scheduler_none_and_zero():
+    clock = FakeClock()
+    assert run_scheduler(RenderScheduler(None, clock=clock), clock, [0.0, 0.0, 0.0]) == [True] * 3
+    off = RenderScheduler(0, clock=clock)
+    assert run_scheduler(off, clock, [0.0, 1.0]) == [False, False]
+    assert off.skipped == 2
+
+
+class BlockingWriter:
+    """release されるまで write() が止まるライター"""
+
+    def __init__(self, release):
+        self.release = release
+        self.frames = []
+        self.closed = False
+        self.output = "blocking"
+
+    def write(self, frame):
+        self.release.wait()
+        self.frames.append(frame)
+
+    def close(self):
+        self.closed = True
+
+
+def test_capture_drops_instead_of_blocking(tmp_path):
+    release = threading.Event()
+    writers = []
+
+    def factory(path, fps, height, width):
+        writers.append(BlockingWriter(release))
+        return writers[-1]
+
+    capture = VideoCapture(str(tmp_path / "out.mp4"), max_queue=4, writer_factory=factory)
+    source = DummyFrameSource(height=8, width=8)
+    worst = 0.0
+    for _ in range(100):
+        frame = source.grab()
+        t0 = time.perf_counter()
+        capture.submit(frame)
+        worst = max(worst, time.perf_counter() - t0)
+    assert worst < 0.05
+    # 書き出し中の1枚とキューの4枚のほかは捨てられる
+    assert capture.dropped > 0
+    assert capture.submitted + capture.dropped == 100
+    assert capture.submitted <= 4 + 1
+
+    release.set()
+    capture.close()
+    writer = writers[0]
+    assert writer.closed and capture.output == "blocking"
+    assert capture.written == capture.submitted == len(writer.frames)
+    assert all(f.shape == (8, 8, 3) and f.dtype == np.uint8 for f in writer.frames)
+    assert capture.error is None
+
+
+def test_capture_survives_writer_error(tmp_path):
+    class FailingWriter:
+        def write(self, frame):
+            raise OSError("disk full")
+
+        def close(self):
+            pass
+
+    capture = VideoCapture(str(tmp_path / "out.mp4"), max_queue=2, writer_factory=lambda *a: FailingWriter())
+    for _ in range(10):
+        capture.submit(np.zeros((4, 4, 3), dtype=np.uint8))
+    capture.close()
+    assert isinstance(capture.error, OSError)
+    assert capture.written == 0
@@ -0,0 +1,47 @@
+# tests/test_replay.py
+#
+# PorcaroTask の start_controller_recording() で記録したデータを replay.py で再生し、
+# 途中から記録を始めても（遅れの状態が0でなくても）、途中でリセットがあっても
+# トルクがビット単位で再現されることのテスト。
+
+import os
+
+import pytest
+import torch
+
+from replay import INITIAL_STATE_FILE, replay
+from surrogate import SurrogateEnv
+
+NUM_ENVS = 4
+
+
+def run_and_record(out_dir, steps=40):
+    env = SurrogateEnv(NUM_ENVS, episode_length_s=0.2)  # 10制御ステップで打ち切り（リセットが起こる）
+    env.reset()
+    g = torch.Generator().manual_seed(0)
+    # 遅れのバッファに値が入った状態から記録を始める
+    for _ in range(3):
+        env.step(torch.rand((NUM_ENVS, 3), generator=g) * 2 - 1)
+    assert env.action_controller.actuation.pressure.abs().sum() > 0
+    # 環境ごとにエピソードの途中の位置をずらして、別々のタイミングでリセットされるようにする
+    env.episode_length_buf.copy_(torch.arange(NUM_ENVS) * 2)
+    recording = env.start_controller_recording(out_dir, chunk_len=16)
+    for _ in range(steps):
+        env.step(torch.rand((NUM_ENVS, 3), generator=g) * 2.4 - 1.2)
+    env.stop_controller_recording()
+    return recording
+
+
+def test_recording_replays_bit_exact(tmp_path):
+    recording = run_and_record(str(tmp_path))
+    assert recording.recorder.step == 40 * 4  # 制御ステップ × decimation
+    result = replay(str(tmp_path), tol=0.0)
+    assert result["passed"], result["first_mismatch"]
+    assert result["max_abs_diff"] == 0.0
+
+
+def test_recording_without_initial_state_is_rejected(tmp_path):
+    run_and_record(str(tmp_path), steps=4)
+    os.remove(os.path.join(str(tmp_path), INITIAL_STATE_FILE))
+    with pytest.raises(ValueError):
+        replay(str(tmp_path))
@@ -0,0 +1,58 @@
+# tests/test_reset.py
+#
+# TorqueActionController.reset(env_ids) が指定した環境だけをゼロに戻し、
+# 他の環境の状態をビット単位でそのまま残すことのテスト。
+
+import pytest
+import torch
+
+from actions.actuation import ActuationDynamics
+from actions.torque import TorqueActionController
+
+NUM_ENVS = 6
+
+
+def run_controller():
+    """遅れのあるコントローラを数ステップ動かして、状態が0でない状態にする"""
+    controller = TorqueActionController(1.0 / 50.0, actuation=ActuationDynamics(dt=1.0 / 200.0),
+                                        num_envs=NUM_ENVS)
+    g = torch.Generator().manual_seed(0)
+    for _ in range(5):
+        controller.compute(torch.rand((NUM_ENVS, 3), generator=g) * 2 - 1,
+                           torch.rand((NUM_ENVS, 2), generator=g) - 0.5, (0, 1))
+    return controller
+
+
+def state(controller):
+    a = controller.actuation
+    return {"pressure": controller.pressure, "contraction": controller.contraction, "force": controller.force,
+            "torque": controller.torque, "actuation.buffer": a.buffer, "actuation.pressure": a.pressure}
+
+
+@pytest.mark.parametrize("env_ids", [
+    [0, 2],
+    torch.tensor([0, 2]),
+    torch.tensor([True, False, True, False, False, False]),
+])
+def test_partial_reset_keeps_other_envs(env_ids):
+    controller = run_controller()
+    before = {k: v.clone() for k, v in state(controller).items()}
+    pointers = {k: v.data_ptr() for k, v in state(controller).items()}
+
+    controller.reset(env_ids)
+
+    after = state(controller)
+    kept = [1, 3, 4, 5]
+    for name, buf in after.items():
+        # 形状もメモリも変わらない（確保し直していない）
+        assert buf.shape == before[name].shape and buf.data_ptr() == pointers[name], name
+        assert torch.equal(buf[[0, 2]], torch.zeros_like(buf[[0, 2]])), name
+        # リセットしていない環境はビット単位で同じ
+        assert torch.equal(buf[kept].view(torch.int32), before[name][kept].view(torch.int32)), name
+
+
+def test_full_reset():
+    controller = run_controller()
+    controller.reset()
+    for name, buf in state(controller).items():
+        assert not buf.any(), name
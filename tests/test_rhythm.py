@@ -0,0 +1,103 @@
+# tests/test_rhythm.py
+#
+# RhythmScore のテスト。
+#   - observe() の値が、打撃時刻から直接計算した値と一致する（次の目標までの時間が負にならない）
+#   - target_time() がいちばん近い目標打撃の時刻になる
+#   - 位相の乱数は seed・全体での環境ID・回数だけで決まり、いっしょにリセットした環境に関係しない
+
+import math
+
+import pytest
+import torch
+
+from rhythm import NEXT_VELOCITY, TIME_SINCE_LAST, TIME_TO_NEXT, RhythmScore, parse_pattern
+
+PATTERNS = [
+    "tempo=120 div=4\nx...x...|x...x...",
+    "tempo=100 div=4\nX..xx.x.|X..xx.x.",   # 打撃の間隔 0.15 s が dt の整数倍にならない
+]
+DT = 0.02
+NUM_ENVS = 12
+
+
+def brute_force(pattern, t):
+    """パターン内の時刻 t の [次の目標までの時間, 強さ, 前の目標からの時間]"""
+    times = pattern.hit_times()
+    ext = ([(h - pattern.length, v) for h, v in times] + times
+           + [(h + pattern.length, v) for h, v in times])
+    t = math.fmod(t, pattern.length)
+    nxt = next((h, v) for h, v in ext if h > t)
+    last = max(h for h, _ in ext if h <= t)
+    return nxt[0] - t, nxt[1], t - last
+
+
+def test_parse_pattern():
+    pattern = parse_pattern("tempo=100 div=4\nX..x|x...")
+    assert pattern.length == pytest.approx(2 * 0.6)
+    assert pattern.hits == [(0.0, 1.0), (0.75, 0.6), (1.0, 0.6)]
+
+
+def test_observe_matches_hit_times():
+    score = RhythmScore(PATTERNS, num_envs=NUM_ENVS, dt=DT, device="cpu")
+    # 位相は秒で渡しても dt の整数倍に丸められる（以前は 0.013 s のような位相で値が負になった）
+    score.assign(phases=torch.linspace(0.0, 2.3, NUM_ENVS) + 0.013)
+    for step in range(0, 400, 7):
+        steps = torch.full((NUM_ENVS,), step)
+        obs = score.observe(steps)
+        assert (obs[:, TIME_TO_NEXT] > 0).all()
+        assert (obs[:, TIME_SINCE_LAST] >= 0).all()
+        for env in range(NUM_ENVS):
+            pattern = score.patterns[score.env_pattern[env]]
+            t = (step + score.env_phase[env].item()) * DT
+            expected = brute_force(pattern, t)
+            assert obs[env, TIME_TO_NEXT].item() == pytest.approx(expected[0], abs=1e-5)
+            assert obs[env, NEXT_VELOCITY].item() == pytest.approx(expected[1])
+            assert obs[env, TIME_SINCE_LAST].item() == pytest.approx(expected[2], abs=1e-5)
+
+
+def test_target_time_is_nearest_hit():
+    score = RhythmScore(PATTERNS, num_envs=NUM_ENVS, dt=DT, device="cpu")
+    score.randomize_phase()
+    for step in (0, 13, 77, 150):
+        steps = torch.full((NUM_ENVS,), step)
+        target = score.target_time(steps)
+        obs = score.obs
+        for env in range(NUM_ENVS):
+            to_next, since_last = obs[env, TIME_TO_NEXT].item(), obs[env, TIME_SINCE_LAST].item()
+            nearest = to_next if to_next < since_last else -since_last
+            assert target[env].item() == pytest.approx(step * DT + nearest, abs=1e-5)
+
+
+def test_random_phase_is_within_one_cycle():
+    score = RhythmScore(PATTERNS, num_envs=256, dt=DT, device="cpu", seed=5)
+    for _ in range(4):
+        score.randomize_phase()
+        num_ticks = score._num_ticks[score.env_pattern]
+        assert (score.env_phase >= 0).all() and (score.env_phase < num_ticks).all()
+    assert score.env_phase.unique().numel() > 50
+
+
+def test_random_phase_does_not_depend_on_which_envs_reset_together():
+    a = RhythmScore(PATTERNS, num_envs=NUM_ENVS, dt=DT, device="cpu", seed=3)
+    a.randomize_phase()
+    a.randomize_phase()
+
+    b = RhythmScore(PATTERNS, num_envs=NUM_ENVS, dt=DT, device="cpu", seed=3)
+    for chunk in torch.randperm(NUM_ENVS, generator=torch.Generator().manual_seed(0)).split(5):
+        b.randomize_phase(chunk)
+    b.randomize_phase(torch.arange(0, NUM_ENVS, 2))
+    b.randomize_phase(torch.arange(1, NUM_ENVS, 2))
+
+    assert torch.equal(a.env_phase, b.env_phase)
+    assert torch.equal(a.draw_count, b.draw_count)
+
+
+def test_random_phase_uses_seed_and_global_env_id():
+    # パターンを1つにして、位相が環境IDだけで決まるようにする
+    whole = RhythmScore(PATTERNS[:1], num_envs=8, dt=DT, device="cpu", seed=1)
+    upper = RhythmScore(PATTERNS[:1], num_envs=4, dt=DT, device="cpu", seed=1, env_id_offset=4)
+    other_seed = RhythmScore(PATTERNS[:1], num_envs=8, dt=DT, device="cpu", seed=2)
+    for score in (whole, upper, other_seed):
+        score.randomize_phase()
+    assert torch.equal(whole.env_phase[4:], upper.env_phase)
+    assert not torch.equal(whole.env_phase, other_seed.env_phase)
@@ -0,0 +1,31 @@
+# tests/test_scenes.py
+#
+# SceneCommands の表引き（環境ごとのシーン割り当てと、表の末尾を過ぎたときの扱い）のテスト。
+
+import torch
+
+from scenes import SCENES, SceneCommands
+
+DT = 0.005
+
+
+def test_envs_follow_assigned_scene():
+    commands = SceneCommands([0, 1, 4], num_envs=6, dt=DT, duration=1.0, device="cpu")
+    actions = commands.actions_at(37)
+    for env in range(6):
+        assert torch.equal(actions[env], commands.action_table[env % 3, 37])
+
+
+def test_periodic_scene_wraps_and_step_scene_holds():
+    commands = SceneCommands([0, 4], num_envs=2, dt=DT, duration=20.0, device="cpu")
+    assert SCENES[0].periodic and not SCENES[4].periodic
+    last = commands.num_steps - 1
+    for step in (commands.num_steps, commands.num_steps + 123, 5 * commands.num_steps + 7):
+        pressure = commands.pressure_at(step)
+        # sin波は最初に戻る
+        assert torch.equal(pressure[0], commands.pressure_table[0, step % commands.num_steps])
+        # ステップ入力は最後の値（0.6 MPa）を保つ
+        assert torch.equal(pressure[1], commands.pressure_table[1, last])
+        assert pressure[1, 2].item() == torch.tensor(0.6).item()
+        actions = commands.actions_at(step)
+        assert torch.equal(actions[1], commands.action_table[1, last])
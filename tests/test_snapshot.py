@@ -0,0 +1,92 @@
+# tests/test_snapshot.py
+#
+# snapshot.py のテスト。
+#   - save_state / load_state で全てのキーが同じ値・同じ型のまま戻る
+#   - 復元した環境の続きは、元の環境の続きと一致する（途中でリセットと選び直しが起きても）
+#   - src_ids で選んだ保存済みの環境を、env_ids の一部の環境にだけ配れる（他の環境は変わらない）
+
+import numpy as np
+import pytest
+import torch
+
+from snapshot import FORMAT_VERSION, capture_state, load_state, restore_state, save_state
+from surrogate import SurrogateEnv
+
+NUM_ENVS = 6
+
+
+def settled_env(steps=40, seed=1):
+    env = SurrogateEnv(NUM_ENVS, seed=seed)
+    env.reset()
+    g = torch.Generator().manual_seed(seed)
+    for _ in range(steps):
+        env.step(torch.rand(NUM_ENVS, 3, generator=g) * 2 - 1)
+    return env
+
+
+def run(env, actions):
+    for a in actions:
+        obs, reward, *_ = env.step(a)
+    return obs["policy"].clone(), reward.clone(), env.robot.data.joint_pos.clone()
+
+
+def test_save_load_round_trip(tmp_path):
+    env = settled_env()
+    state = capture_state(env)
+    path = tmp_path / "state.npz"
+    save_state(path, state)
+    loaded = load_state(path)
+    assert sorted(loaded) == sorted(state)
+    for key, value in state.items():
+        assert loaded[key].dtype == value.dtype, key
+        assert torch.equal(loaded[key], value), key
+
+
+def test_load_rejects_other_versions(tmp_path):
+    path = tmp_path / "state.npz"
+    save_state(path, capture_state(settled_env(steps=1)))
+    with np.load(path) as f:
+        arrays = dict(f)
+    arrays["__meta__"] = np.frombuffer(
+        bytes(arrays["__meta__"]).replace(f'"version": {FORMAT_VERSION}'.encode(), b'"version": 1'), dtype=np.uint8)
+    np.savez_compressed(path, **arrays)
+    with pytest.raises(ValueError):
+        load_state(path)
+
+
+def test_branch_matches_original_continuation(tmp_path):
+    env = settled_env(steps=200)
+    path = tmp_path / "state.npz"
+    save_state(path, capture_state(env))
+
+    # エピソードの長さ (250ステップ) をまたぐので、分岐の途中でリセットとランダム化の選び直しが起きる
+    g = torch.Generator().manual_seed(7)
+    actions = [torch.rand(NUM_ENVS, 3, generator=g) * 2 - 1 for _ in range(80)]
+    expected = run(env, actions)
+
+    branch = settled_env(steps=13, seed=1)  # 別の状態から復元する
+    restore_state(branch, load_state(path))
+    for got, want in zip(run(branch, actions), expected):
+        assert torch.allclose(got, want, atol=1e-6)
+    for name, value in env.randomizer.values.items():
+        assert torch.equal(branch.randomizer.values[name], value), name
+
+
+def test_fan_out_to_subset_of_envs():
+    source = settled_env(steps=60, seed=2)
+    state = capture_state(source)
+    target = settled_env(steps=10, seed=3)
+    before = capture_state(target)
+
+    env_ids = torch.tensor([1, 4, 5])
+    src_ids = torch.tensor([2, 0, 2])
+    restore_state(target, state, env_ids=env_ids, src_ids=src_ids)
+    after = capture_state(target)
+
+    untouched = torch.tensor([0, 2, 3])
+    for key in ("robot/joint_pos", "robot/joint_vel", "robot/root_state", "controller/pressure",
+                "actuation/buffer", "strike/events", "rhythm/env_phase", "randomizer/r"):
+        assert torch.allclose(after[key][env_ids], state[key][src_ids], atol=1e-6), key
+        assert torch.equal(after[key][untouched], before[key][untouched]), key
+    # 一部の環境に書き戻すときは、乱数と正規化の統計は戻さない
+    assert torch.equal(target.obs_normalizer.count, before["global/normalizer_count"])
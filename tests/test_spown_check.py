@@ -0,0 +1,29 @@
+# tests/test_spown_check.py
+#
+# spown_check.py --dry_run が env_cfg.py（isaaclab と torch）を読み込まずに、ソースから設定を読むことのテスト。
+
+import subprocess
+import sys
+from pathlib import Path
+
+REPO = Path(__file__).resolve().parents[1]
+
+
+def test_dry_run_does_not_import_env_cfg_or_torch():
+    code = (
+        "import sys, spown_check\n"
+        "cfg = spown_check.load_cfg()\n"
+        "spown_check.check_cfg(cfg)\n"
+        "print(sorted(m for m in ('torch', 'env_cfg', 'isaaclab') if m in sys.modules))\n"
+    )
+    out = subprocess.run([sys.executable, "-c", code], cwd=REPO, capture_output=True, text=True, check=True)
+    assert out.stdout.strip().splitlines()[-1] == "[]"
+
+
+def test_static_cfg_has_scene_and_assets():
+    import spown_check
+
+    cfg = spown_check.load_cfg()
+    for name in ("ROBOT_USD", "DRUM_USD", "DRUMSTAND_USD", "DRUM_CFG", "DRUM_CONTACT_CFG", "scene"):
+        assert cfg.get(name) is not None, name
+    assert spown_check._get(cfg["scene"], "env_spacing") > 0
@@ -0,0 +1,84 @@
+# tests/test_strike_detector.py
+#
+# StrikeDetector のテスト。
+#   - 打撃の開始時刻・ピーク力・力積
+#   - 接触が長く続いて目標時刻が変わっても、タイミング誤差は打撃が始まったときの目標で計算する
+#   - 続けて叩いたときに、打撃ごとに別のイベントになる
+
+import pytest
+import torch
+
+from strike_detector import IMPULSE, ONSET_TIME, PEAK_FORCE, TIMING_ERROR, StrikeDetector
+
+DT = 0.005
+
+
+def run(detector, force_per_step, target_per_step):
+    """1ステップずつ (num_envs,) の力を与える。履歴の形は (num_envs, 1, 1, 3)"""
+    for force, target in zip(force_per_step, target_per_step):
+        history = torch.zeros((detector.num_envs, 1, 1, 3))
+        history[:, 0, 0, 2] = force
+        detector.update(history, num_new=1, target_time=target)
+
+
+def test_onset_peak_and_impulse():
+    detector = StrikeDetector(num_envs=2, dt=DT, device="cpu")
+    forces = [torch.tensor([0.0, 0.0])] * 20 + [torch.tensor([10.0, 1.0]), torch.tensor([20.0, 1.0]),
+                                                torch.tensor([0.0, 0.0])]
+    targets = [torch.full((2,), 0.1)] * len(forces)
+    run(detector, forces, targets)
+    assert detector.event_count.tolist() == [1, 0]
+    event = detector.last_events()[0]
+    assert event[ONSET_TIME].item() == pytest.approx(21 * DT, abs=1e-5)
+    assert event[PEAK_FORCE].item() == pytest.approx(20.0, abs=1e-5)
+    assert event[IMPULSE].item() == pytest.approx(30.0 * DT, abs=1e-5)
+    assert event[TIMING_ERROR].item() == pytest.approx(21 * DT - 0.1, abs=1e-5)
+    assert (detector.last_events()[1] == 0).all()
+
+
+def test_long_contact_uses_target_at_onset():
+    # 0.105 s に叩き始め、1.0 s まで押し付けたまま。その間に目標は 0 から 0.5 に変わる
+    detector = StrikeDetector(num_envs=1, dt=DT, device="cpu")
+    steps = 210
+    forces = [torch.tensor([10.0 if 20 <= k < steps - 10 else 0.0]) for k in range(steps)]
+    targets = [torch.tensor([0.0 if k < 100 else 0.5]) for k in range(steps)]
+    run(detector, forces, targets)
+    assert detector.event_count.item() == 1
+    event = detector.last_events()[0]
+    assert event[ONSET_TIME].item() == pytest.approx(0.105, abs=1e-5)
+    assert event[TIMING_ERROR].item() == pytest.approx(0.105, abs=1e-5)
+
+
+def test_back_to_back_hits():
+    detector = StrikeDetector(num_envs=1, dt=DT, device="cpu", debounce_time=0.01)
+    pattern = [0.0] * 4 + [10.0] * 3 + [0.0] * 3 + [12.0] * 2 + [0.0] * 2
+    forces = [torch.tensor([f]) for f in pattern]
+    targets = [torch.tensor([0.02 if k < 8 else 0.05]) for k in range(len(pattern))]
+    new_hits = []
+    for force, target in zip(forces, targets):
+        history = torch.zeros((1, 1, 1, 3))
+        history[0, 0, 0, 2] = force
+        detector.update(history, num_new=1, target_time=target)
+        new_hits.append(bool(detector.new_hit[0]))
+    assert detector.event_count.item() == 2
+    assert new_hits.count(True) == 2
+    first, second = detector.events[0, 0], detector.events[0, 1]
+    assert first[ONSET_TIME].item() == pytest.approx(5 * DT, abs=1e-5)
+    assert second[ONSET_TIME].item() == pytest.approx(11 * DT, abs=1e-5)
+    assert first[TIMING_ERROR].item() == pytest.approx(5 * DT - 0.02, abs=1e-5)
+    assert second[TIMING_ERROR].item() == pytest.approx(11 * DT - 0.05, abs=1e-5)
+    assert first[PEAK_FORCE].item() == pytest.approx(10.0, abs=1e-5)
+    assert second[PEAK_FORCE].item() == pytest.approx(12.0, abs=1e-5)
+
+
+def test_debounce_merges_bounce_into_one_hit():
+    detector = StrikeDetector(num_envs=1, dt=DT, device="cpu", debounce_time=0.02)
+    pattern = [10.0, 0.0, 10.0, 0.0, 0.0, 0.0, 0.0, 0.0]  # 終了から4ステップ以内の跳ね返りは数えない
+    run(detector, [torch.tensor([f]) for f in pattern], [torch.zeros(1)] * len(pattern))
+    assert detector.event_count.item() == 1
+
+
+def test_without_target_error_is_nan():
+    detector = StrikeDetector(num_envs=1, dt=DT, device="cpu")
+    run(detector, [torch.tensor([10.0]), torch.tensor([0.0])], [None, None])
+    assert torch.isnan(detector.last_events()[0, TIMING_ERROR])
@@ -0,0 +1,127 @@
+# tests/test_surrogate.py
+#
+# SurrogateEnv と env_cfg.py が同じタスクの処理（porcaro_task.PorcaroTask）を使うことと、
+# surrogate.validate() が記録のメタ情報の joint_ids・p_max_cmd・バルブの遅れで記録を再現できることのテスト。
+
+import json
+import os
+
+import numpy as np
+import pytest
+import torch
+
+import porcaro_task
+from surrogate import SurrogateEnv, validate
+from telemetry import TelemetryRecorder
+
+SIM_DT = 1 / 200
+
+
+def test_env_uses_shared_task_code():
+    for name in ("_pre_physics_step", "_apply_action", "_reset_idx", "_apply_randomization",
+                 "_get_observations", "_get_rewards", "_get_dones"):
+        assert getattr(SurrogateEnv, name) is getattr(porcaro_task.PorcaroTask, name), name
+
+
+def test_randomization_is_centred_on_loaded_params():
+    params = {"r": 0.02, "L": 0.18, "Pmax": 0.5, "damping": 0.05}
+    env = SurrogateEnv(4096, muscle_params=params)
+    env.reset()
+    for name, value in params.items():
+        rng = env.randomizer.ranges[name]
+        lo, hi = porcaro_task.MUSCLE_SPREAD[name]
+        assert rng.low == pytest.approx(value * lo) and rng.high == pytest.approx(value * hi)
+        sampled = env.randomizer.values[name]
+        assert (sampled >= rng.low).all() and (sampled <= rng.high).all()
+        # 対数一様の減衰は幾何平均、それ以外は算術平均がだいたい読み込んだ値になる
+        center = sampled.log().mean().exp() if name == "damping" else sampled.mean()
+        assert center.item() == pytest.approx(value, rel=0.02)
+
+
+def test_reset_writes_resampled_params_to_controller():
+    env = SurrogateEnv(64)
+    env.reset()
+    ids = torch.tensor([3, 10, 41])
+    before = env.action_controller.Pmax_buf.clone()
+    env._reset_idx(ids)
+    values, controller = env.randomizer.values, env.action_controller
+    # コントローラは表を直接読むので、選び直した行だけがそのまま変わる
+    assert torch.equal(controller.r_buf, values["r"])
+    assert torch.equal(controller.L_buf, values["L"])
+    assert torch.equal(controller.Pmax_buf, values["Pmax"])
+    changed = (controller.Pmax_buf != before).flatten().nonzero().flatten().tolist()
+    assert changed == ids.tolist()
+    delay = values["valve_delay"].round().long().clamp(0, controller.actuation.history - 1)
+    assert torch.equal(controller.actuation.delay, delay)
+    assert torch.allclose(controller.actuation.alpha, 1.0 - torch.exp(-SIM_DT / values["valve_tau"]))
+    assert torch.equal(env.robot.damping[:, [env._wrist_id, env._grip_id]], values["damping"].expand(-1, 2))
+
+
+def record_surrogate_trace(out_dir, steps=60, num_envs=4, actuation=None):
+    """サロゲート自身の軌道を、Isaac の記録と同じ形式（関節の列は並べ替えて）で書き出す
+
+    actuation: {"delay_ticks", "tau"}。あれば standalone_robot_test.py と同じく指令圧力と実際の圧力を
+               別のチャンネルに記録し、メタ情報に遅れを書く。None なら遅れ無しの古い形式で記録する
+    """
+    env = SurrogateEnv(num_envs, sim_dt=SIM_DT, decimation=1)
+    meta = {"joint_ids": [3, 1], "p_max_cmd": 0.6}
+    channels = {"joint_pos": 5, "pressure": 3}
+    if actuation is None:
+        env.action_controller.actuation.set_params(delay_ticks=(0, 0, 0), tau=(0.0, 0.0, 0.0))
+    else:
+        env.action_controller.actuation.set_params(**actuation)
+        meta["actuation"] = actuation
+        channels["pressure_cmd"] = 3
+    wrist, grip = meta["joint_ids"]  # 記録では手首と握りが別の列にある
+    recorder = TelemetryRecorder(channels, num_envs, "cpu", out_dir=out_dir, chunk_len=16, meta=meta)
+    g = torch.Generator().manual_seed(0)
+    joint_pos = torch.zeros((num_envs, 5))
+    for _ in range(steps):
+        joint_pos[:, wrist] = env.robot.data.joint_pos[:, 0]
+        joint_pos[:, grip] = env.robot.data.joint_pos[:, 1]
+        env.actions = torch.rand((num_envs, 3), generator=g) * 2 - 1
+        env._apply_action()
+        values = {"joint_pos": joint_pos, "pressure": env.action_controller.pressure}
+        if actuation is not None:
+            values["pressure_cmd"] = env.action_controller.pressure_cmd
+        recorder.record(**values)
+        env.robot.update(SIM_DT)
+    recorder.close()
+
+
+def test_validate_reproduces_own_trace(tmp_path):
+    record_surrogate_trace(str(tmp_path))
+    result = validate(str(tmp_path), sim_dt=SIM_DT)
+    assert result["steps"] == 60 and result["num_envs"] == 4
+    assert max(result["max_abs"]) < 1e-4
+
+
+def test_validate_passes_commanded_pressure_through_recorded_delay(tmp_path):
+    actuation = {"delay_ticks": [3, 1, 2], "tau": [0.04, 0.06, 0.03]}
+    record_surrogate_trace(str(tmp_path), actuation=actuation)
+    assert max(validate(str(tmp_path), sim_dt=SIM_DT)["max_abs"]) < 1e-4
+    # 実際の圧力（遅れを通した後）は指令と違う値で記録されている
+    from telemetry import load_channel
+    assert not np.allclose(load_channel(str(tmp_path), "pressure"), load_channel(str(tmp_path), "pressure_cmd"))
+    # 遅れを記録と違う値にすると再現できない
+    path = os.path.join(str(tmp_path), "index.json")
+    with open(path) as f:
+        index = json.load(f)
+    index["meta"]["actuation"]["delay_ticks"] = [0, 0, 0]
+    with open(path, "w") as f:
+        json.dump(index, f)
+    assert max(validate(str(tmp_path), sim_dt=SIM_DT)["max_abs"]) > 1e-3
+
+
+def test_validate_reads_p_max_cmd_from_meta(tmp_path):
+    record_surrogate_trace(str(tmp_path))
+    # 記録時の Pmax を書き換えると、圧力からアクションへの読み替えが変わって再現できなくなる
+    path = os.path.join(str(tmp_path), "index.json")
+    with open(path) as f:
+        index = json.load(f)
+    index["meta"]["p_max_cmd"] = 0.5
+    with open(path, "w") as f:
+        json.dump(index, f)
+    assert max(validate(str(tmp_path), sim_dt=SIM_DT)["max_abs"]) > 1e-3
+    # 引数で渡した p_max がメタ情報より優先される
+    assert max(validate(str(tmp_path), p_max=0.6, sim_dt=SIM_DT)["max_abs"]) < 1e-4
@@ -0,0 +1,111 @@
+# tests/test_sweep.py
+#
+# sweep.py のテスト。
+#   - 幅3のパラメータは要素ごとの値を受け取り、その値が環境の該当スロットに書き込まれる
+#   - 環境は env_factory で作り、ウェーブをまたいで使い回す
+#   - ウェーブの書き込みが途中で失敗しても、CSVにはウェーブの一部だけが残らず、再開で全ての点がそろう
+
+import csv
+import os
+
+import pytest
+import torch
+
+import sweep
+from sweep import grid_points, random_points, run_sweep, surrogate_env_factory
+
+DURATION = 0.1
+
+
+def read_rows(path):
+    with open(path, newline="") as f:
+        return list(csv.DictReader(f))
+
+
+class RecordingFactory:
+    """作った環境と、ウェーブごとに書き込まれたバルブの遅れを覚えておく"""
+
+    def __init__(self):
+        self.envs = []
+        self.delays = []
+
+    def __call__(self, num_envs, device, episode_length_s, seed):
+        env = surrogate_env_factory(num_envs, device, episode_length_s, seed)
+        apply = env._apply_randomization
+
+        def record(env_ids, params=None):
+            apply(env_ids, params)
+            if env_ids is None:  # リセットでの選び直しではなく、スイープの値の書き込み
+                self.delays.append(env.action_controller.actuation.delay.clone())
+
+        env._apply_randomization = record
+        self.envs.append(env)
+        return env
+
+
+def test_grid_accepts_per_muscle_values():
+    points = grid_points({"valve_delay": [1.0, [0.0, 2.0, 4.0]], "Pmax": [0.5, 0.6]})
+    assert len(points) == 4
+    assert points[2] == {"valve_delay": [0.0, 2.0, 4.0], "Pmax": 0.5}
+    with pytest.raises(ValueError):
+        grid_points({"valve_delay": [[1.0, 2.0]]})
+
+
+def test_random_points_draw_each_muscle_separately():
+    points = random_points({"valve_tau": (0.02, 0.08), "Pmax": (0.5, 0.6)}, 50, seed=0)
+    taus = torch.tensor([p["valve_tau"] for p in points])
+    assert taus.shape == (50, 3)
+    assert ((taus >= 0.02) & (taus < 0.08)).all()
+    assert not torch.equal(taus[:, 0], taus[:, 1])
+    assert all(isinstance(p["Pmax"], float) for p in points)
+
+
+def test_per_muscle_values_reach_env_slots(tmp_path):
+    out = str(tmp_path / "sweep.csv")
+    points = grid_points({"valve_delay": [[0.0, 2.0, 4.0], [3.0, 1.0, 0.0], 2.0]})
+    factory = RecordingFactory()
+    run_sweep(points, num_envs=2, out_path=out, duration=DURATION, env_factory=factory)
+
+    # 環境は1回だけ作り、2ウェーブで使い回す
+    assert len(factory.envs) == 1
+    assert len(factory.delays) == 2
+    assert torch.equal(factory.delays[0], torch.tensor([[0, 2, 4], [3, 1, 0]]))
+    assert torch.equal(factory.delays[1][0], torch.tensor([2, 2, 2]))
+
+    rows = read_rows(out)
+    assert [int(r["point_id"]) for r in rows] == [0, 1, 2]
+    assert [float(rows[1][f"valve_delay[{k}]"]) for k in range(3)] == [3.0, 1.0, 0.0]
+    assert [float(rows[2][f"valve_delay[{k}]"]) for k in range(3)] == [2.0, 2.0, 2.0]
+
+
+def test_failed_wave_leaves_no_partial_rows(tmp_path, monkeypatch):
+    out = str(tmp_path / "sweep.csv")
+    points = grid_points({"Pmax": [0.5, 0.52, 0.54, 0.56, 0.58]})
+
+    # 2ウェーブ目の置き換えで止まったことにする
+    calls = {"n": 0}
+    replace = os.replace
+
+    def failing_replace(src, dst):
+        calls["n"] += 1
+        if calls["n"] == 3:  # 1回目はヘッダ、2回目は1ウェーブ目
+            raise KeyboardInterrupt
+        replace(src, dst)
+
+    monkeypatch.setattr(sweep.os, "replace", failing_replace)
+    with pytest.raises(KeyboardInterrupt):
+        run_sweep(points, num_envs=2, out_path=out, duration=DURATION)
+    assert [int(r["point_id"]) for r in read_rows(out)] == [0, 1]
+
+    monkeypatch.setattr(sweep.os, "replace", replace)
+    run_sweep(points, num_envs=2, out_path=out, duration=DURATION, resume=True)
+    rows = read_rows(out)
+    assert sorted(int(r["point_id"]) for r in rows) == [0, 1, 2, 3, 4]
+    assert [float(r["Pmax"]) for r in rows] == [0.5, 0.52, 0.54, 0.56, 0.58]
+
+
+def test_resume_rejects_changed_points(tmp_path):
+    out = str(tmp_path / "sweep.csv")
+    run_sweep(grid_points({"Pmax": [0.5]}), num_envs=1, out_path=out, duration=DURATION)
+    with pytest.raises(ValueError):
+        run_sweep(grid_points({"Pmax": [0.6]}), num_envs=1, out_path=out, duration=DURATION, resume=True)
@@ -0,0 +1,103 @@
+# tests/test_sysid.py
+#
+# sysid.py のテスト。
+#   - 指令圧力を記録したときと同じバルブの遅れに通せば、正しいパラメータで誤差がいちばん小さくなる
+#   - 真のパラメータで作った記録から、fit() が r / L / Pmax / 減衰を許容誤差の中で求め直せる
+
+import pytest
+import torch
+
+from actions.actuation import ActuationDynamics
+from actions.torque import TorqueActionController
+from scenes import pressure_to_action
+from surrogate import SurrogateArticulation
+from sysid import TraceReader, actuation_warmup, fit, rollout_loss
+from telemetry import TelemetryRecorder
+
+SIM_DT = 1 / 200
+TRUE = {"r": 0.015, "L": 0.16, "Pmax": 0.55, "damping": 0.03}
+ACTUATION = {"delay_ticks": [2, 3, 1], "tau": [0.04, 0.05, 0.03]}
+P_MAX_CMD = 0.6
+# 既定値から少しずらした同定の初期値
+INIT = {"r": 0.013, "L": 0.15, "Pmax": 0.62, "damping": 0.02}
+
+
+def simulate(steps, num_envs, actuation=ACTUATION, seed=0):
+    """真のパラメータで (指令圧力, [手首, 握り] の関節角度) を (steps, num_envs, 幅) で作る"""
+    dynamics = ActuationDynamics(dt=SIM_DT, **actuation) if actuation else None
+    controller = TorqueActionController(dt_ctrl=SIM_DT, r=TRUE["r"], L=TRUE["L"], Pmax=TRUE["Pmax"],
+                                        actuation=dynamics, num_envs=num_envs)
+    robot = SurrogateArticulation(num_envs, damping=TRUE["damping"])
+    g = torch.Generator().manual_seed(seed)
+    # なめらかに変わる指令（0.2秒ごとに選んだ値をつなぐ）
+    knots = torch.rand((steps // 40 + 2, num_envs, 3), generator=g) * 2 - 1
+    t = torch.arange(steps) / 40
+    i, w = t.long(), (t - t.long())[:, None, None]
+    actions = knots[i] * (1 - w) + knots[i + 1] * w
+    pressure_cmd = torch.zeros((steps, num_envs, 3))
+    joint_pos = torch.zeros((steps, num_envs, 2))
+    for k in range(steps):
+        joint_pos[k] = robot.data.joint_pos
+        # 記録時のコントローラは Pmax=P_MAX_CMD で指令を作る（sysid はそれをアクションに戻す）
+        pressure_cmd[k] = (actions[k].clamp(-1, 1) + 1) * 0.5 * P_MAX_CMD
+        controller.apply(pressure_to_action(pressure_cmd[k], P_MAX_CMD), robot.data.joint_pos, robot, (0, 1))
+        robot.update(SIM_DT)
+    return pressure_cmd, joint_pos
+
+
+def params_tensor(params):
+    return torch.tensor([[params[k] for k in ("r", "L", "Pmax", "damping")]])
+
+
+def test_rollout_loss_uses_recorded_delay():
+    pressure_cmd, joint_pos = simulate(300, 4)
+    warmup = actuation_warmup(ACTUATION, SIM_DT)
+    # 指令は区間の前の warmup ステップを含めて渡し、関節角度は区間の分だけ渡す
+    q = joint_pos[warmup:]
+    loss_true = rollout_loss(params_tensor(TRUE), pressure_cmd, q, SIM_DT, P_MAX_CMD, ACTUATION).item()
+    # 区間の最初の速度を差分で近似するぶんの誤差は残るが、パラメータを10%ずらした誤差よりずっと小さい
+    for name in ("r", "Pmax"):
+        wrong = dict(TRUE, **{name: TRUE[name] * 1.1})
+        assert loss_true < 0.2 * rollout_loss(params_tensor(wrong), pressure_cmd, q, SIM_DT, P_MAX_CMD,
+                                              ACTUATION).item()
+    # 遅れを無視すると、正しいパラメータでも誤差が大きい
+    loss_no_delay = rollout_loss(params_tensor(TRUE), pressure_cmd[warmup:], q, SIM_DT, P_MAX_CMD).item()
+    assert loss_no_delay > 20 * loss_true
+
+
+@pytest.fixture(scope="module")
+def trace_dir(tmp_path_factory):
+    """真のパラメータで作った記録を telemetry.py の形式で書き出す（チャンクは12個）"""
+    out_dir = str(tmp_path_factory.mktemp("trace"))
+    pressure_cmd, joint_pos = simulate(1500, 4)
+    meta = {"joint_ids": [0, 1], "p_max_cmd": P_MAX_CMD, "actuation": ACTUATION}
+    recorder = TelemetryRecorder({"pressure_cmd": 3, "joint_pos": 2}, 4, "cpu", out_dir=out_dir,
+                                 chunk_len=128, meta=meta)
+    for k in range(len(joint_pos)):
+        recorder.record(pressure_cmd=pressure_cmd[k], joint_pos=joint_pos[k])
+    recorder.close()
+    return out_dir
+
+
+def test_trace_reader_reads_chunks_in_order(trace_dir):
+    _, joint_pos = simulate(1500, 4)
+    reader = TraceReader(trace_dir)
+    assert reader.num_steps == 1500
+    # チャンクの境目をまたいで読んでも、記録した順のまま
+    assert torch.equal(torch.from_numpy(reader.read("joint_pos", 1200, 200, 2).copy()), joint_pos[1200:1400, 2])
+
+
+def test_fit_recovers_parameters_with_known_pmax(trace_dir):
+    params, _ = fit(trace_dir, generations=30, population=32, segments=8, window=100,
+                    init=INIT, verbose=False, fixed={"Pmax": TRUE["Pmax"]})
+    assert params["Pmax"] == pytest.approx(TRUE["Pmax"])
+    for name in ("r", "L", "damping"):
+        assert params[name] == pytest.approx(TRUE[name], rel=0.05), name
+
+
+def test_fit_recovers_identifiable_combinations(trace_dir):
+    # 全部を同定すると r, L, Pmax は (r*s, L*s, Pmax/s) の分だけ決まらないが、トルクを決める組み合わせは決まる
+    params, _ = fit(trace_dir, generations=30, population=32, segments=8, window=100, init=INIT, verbose=False)
+    assert params["r"] * params["Pmax"] == pytest.approx(TRUE["r"] * TRUE["Pmax"], rel=0.05)
+    assert params["r"] / params["L"] == pytest.approx(TRUE["r"] / TRUE["L"], rel=0.05)
+    assert params["damping"] == pytest.approx(TRUE["damping"], rel=0.05)
@@ -0,0 +1,55 @@
+# tests/test_telemetry.py
+#
+# TelemetryRecorder が全ステップの値を欠けなくチャンクに書き出すことと、
+# 名前の先頭が同じチャンネル（pressure と pressure_cmd）を別々に読めることのテスト。
+
+import json
+import os
+
+import numpy as np
+import torch
+
+from telemetry import TelemetryRecorder, load_channel
+
+
+def test_every_step_is_written(tmp_path):
+    num_envs, chunk_len, steps = 3, 10, 25  # 最後のチャンクは途中まで
+    recorder = TelemetryRecorder({"joint_pos": 2, "torque": 1}, num_envs, "cpu", out_dir=str(tmp_path),
+                                 chunk_len=chunk_len, max_pending=1, meta={"dt": 0.005})
+    g = torch.Generator().manual_seed(0)
+    joint_pos = torch.rand((steps, num_envs, 2), generator=g)
+    torque = torch.rand((steps, num_envs), generator=g)
+    for t in range(steps):
+        recorder.record(joint_pos=joint_pos[t], torque=torque[t])
+    recorder.close()
+
+    assert np.array_equal(load_channel(str(tmp_path), "joint_pos"), joint_pos.numpy())
+    assert np.array_equal(load_channel(str(tmp_path), "torque"), torque[..., None].numpy())
+
+    with open(os.path.join(tmp_path, "index.json")) as f:
+        index = json.load(f)
+    assert index["meta"] == {"dt": 0.005}
+    assert [(c["start"], c["length"]) for c in index["chunks"]] == [(0, 10), (10, 10), (20, 5)]
+
+
+def test_channels_with_shared_prefix_are_read_separately(tmp_path):
+    num_envs, steps = 2, 30
+    recorder = TelemetryRecorder({"pressure_cmd": 3, "pressure": 3}, num_envs, "cpu", out_dir=str(tmp_path),
+                                 chunk_len=8)
+    cmd = torch.rand((steps, num_envs, 3), generator=torch.Generator().manual_seed(1))
+    for t in range(steps):
+        recorder.record(pressure_cmd=cmd[t], pressure=cmd[t] * 0.5)
+    recorder.close()
+    assert np.array_equal(load_channel(str(tmp_path), "pressure_cmd"), cmd.numpy())
+    assert np.array_equal(load_channel(str(tmp_path), "pressure"), cmd.numpy() * 0.5)
+
+
+def test_host_buffers_are_bounded(tmp_path):
+    """書き出し待ちのホスト側バッファは max_pending + 1 個から増えない"""
+    recorder = TelemetryRecorder({"x": 1}, 2, "cpu", out_dir=str(tmp_path), chunk_len=4, max_pending=2)
+    assert recorder._free.qsize() == 3
+    for _ in range(40):
+        recorder.record(x=torch.ones(2))
+    recorder.close()
+    assert recorder._free.qsize() == 3
+    assert load_channel(str(tmp_path), "x").shape == (40, 2, 1)
@@ -0,0 +1,98 @@
+# tests/test_torque.py
+#
+# TorqueActionController のバッチ計算を、1環境ずつ math で計算するスカラー版と要素ごとに比べるテスト。
+
+import math
+
+import pytest
+import torch
+
+from actions.torque import DF, F, G, TorqueActionController
+
+WRIST_ID, GRIP_ID = 1, 3
+NUM_JOINTS = 5
+
+
+def scalar_reference(controller, action, q, r, L, Pmax):
+    """1環境分の 圧力・収縮率・張力・トルク を Python の float で計算する"""
+    pressure = [(min(max(a, -1.0), 1.0) + 1.0) * 0.5 * Pmax for a in action[:3]]
+    contraction = []
+    for angle in (q[WRIST_ID], -q[WRIST_ID], q[GRIP_ID]):
+        eps = r * angle / L
+        contraction.append(min(max(eps, -controller.max_stretch), controller.max_contraction))
+    force = []
+    for p, eps in zip(pressure, contraction):
+        f = p * controller._area * (controller._a * (1.0 - eps) ** 2 - controller._b)
+        force.append(max(f, 0.0))
+    torque = [r * (force[DF] - force[F]), r * force[G]]
+    return pressure, contraction, force, torque
+
+
+def make_controller(num_envs, seed):
+    g = torch.Generator().manual_seed(seed)
+    controller = TorqueActionController(1.0 / 50.0, num_envs=num_envs)
+    # 環境ごとに違うパラメータ
+    controller.set_params(
+        r=0.010 + 0.008 * torch.rand(num_envs, generator=g),
+        L=0.130 + 0.040 * torch.rand(num_envs, generator=g),
+        Pmax=0.4 + 0.4 * torch.rand(num_envs, generator=g),
+    )
+    # アクションは [-1, 1] の外も含め、関節角度は収縮率のクリップに掛かる範囲まで振る
+    actions = torch.rand((num_envs, 3), generator=g) * 3.0 - 1.5
+    q = torch.rand((num_envs, NUM_JOINTS), generator=g) * 8.0 - 4.0
+    return controller, actions, q
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_compute_matches_scalar_reference(seed):
+    num_envs = 64
+    controller, actions, q = make_controller(num_envs, seed)
+    torque = controller.compute(actions, q, (WRIST_ID, GRIP_ID))
+    assert torque is controller.torque
+
+    # 張力は a*(1-ε)^2 - b の引き算で桁落ちするので、張力とトルクの絶対誤差は張力の最大値に対する比で見る
+    force_scale = controller.Pmax_buf.max().item() * controller._area * controller._a
+    abs_tol = {"pressure": 1e-6, "contraction": 1e-6, "force": 1e-6 * force_scale, "torque": 1e-7 * force_scale}
+    for i in range(num_envs):
+        expected = scalar_reference(
+            controller, actions[i].tolist(), q[i].tolist(),
+            controller.r_buf[i, 0].item(), controller.L_buf[i, 0].item(), controller.Pmax_buf[i, 0].item(),
+        )
+        for name, buf, values in zip(("pressure", "contraction", "force", "torque"),
+                                     (controller.pressure, controller.contraction, controller.force, controller.torque),
+                                     expected):
+            for j, value in enumerate(values):
+                # バッチ側は float32 なので、その丸め誤差の分だけ許す
+                assert buf[i, j].item() == pytest.approx(value, rel=1e-5, abs=abs_tol[name]), (name, i, j)
+
+
+def test_clipping_is_exercised():
+    """上のテストが、アクション・収縮率・張力のクリップの両側を通っていることを確かめる"""
+    controller, actions, q = make_controller(256, 0)
+    controller.compute(actions, q, (WRIST_ID, GRIP_ID))
+    assert (controller.contraction == controller.max_contraction).any()
+    assert (controller.contraction == -controller.max_stretch).any()
+    assert (controller.force == 0.0).any()
+    assert (controller.pressure == 0.0).any()
+    assert torch.isclose(controller.pressure, controller.Pmax_buf.expand(-1, 3)).any()
+
+
+def test_compute_does_not_reallocate():
+    controller, actions, q = make_controller(16, 3)
+    buffers = [b.data_ptr() for b in (controller.pressure, controller.contraction, controller.force, controller.torque)]
+    for _ in range(3):
+        controller.compute(actions, q, (WRIST_ID, GRIP_ID))
+    assert buffers == [b.data_ptr() for b in (controller.pressure, controller.contraction, controller.force,
+                                              controller.torque)]
+
+
+def test_scalar_params_match_defaults():
+    """set_params を使わなければ、全環境がコンストラクタのスカラー値で計算される"""
+    controller = TorqueActionController(1.0 / 50.0, r=0.014, L=0.150, Pmax=0.6, num_envs=4)
+    actions = torch.tensor([[1.0, -1.0, 0.0]]).repeat(4, 1)
+    q = torch.zeros((4, NUM_JOINTS))
+    controller.compute(actions, q, (WRIST_ID, GRIP_ID))
+    f0 = 0.6 * controller._area * (controller._a - controller._b)
+    assert controller.force[:, DF].tolist() == pytest.approx([f0] * 4, rel=1e-6)
+    assert controller.torque[:, 0].tolist() == pytest.approx([0.014 * f0] * 4, rel=1e-6)
+    assert math.isclose(controller.force[0, G].item(), f0 * 0.5, rel_tol=1e-6)
@@ -0,0 +1,60 @@
+# tests/test_unit_engine.py
+#
+# unit_engine.convert_strings の高速経路と正規表現の経路が、同じ入力を同じように読むことのテスト。
+# stream_csv の見出し行の扱いもここで確かめる。
+
+import io
+
+import numpy as np
+import pytest
+
+from unit_engine import convert_strings, parse_quantity, stream_csv
+
+
+@pytest.mark.parametrize("texts", [
+    ["56mm", "mm7"],
+    ["mm56", "mm7"],
+    ["5mm5", "7mm"],
+    ["5 6mm", "7mm"],
+    ["mm", "7mm"],
+    ["5m m", "7mm"],
+])
+def test_malformed_lines_are_rejected(texts):
+    with pytest.raises(ValueError):
+        convert_strings(texts, "mm")
+
+
+@pytest.mark.parametrize("texts, expected", [
+    (["56mm", "7mm"], [56.0, 7.0]),
+    (["56 mm", " 7mm "], [56.0, 7.0]),     # 行末の空白は高速経路を使わずに読む
+    (["1inch", "2in"], [25.4, 50.8]),
+    (["1.5e1mm", "2mm"], [15.0, 2.0]),
+    (["3", "4"], [3000.0, 4000.0]),          # 単位の無い行は default_unit（m）
+])
+def test_valid_lines_match_parse_quantity(texts, expected):
+    values = convert_strings(texts, "mm", default_unit="m")
+    assert values == pytest.approx(expected)
+    for text, value in zip(texts, values):
+        number, unit = parse_quantity(text, "m")
+        assert value == pytest.approx(convert_strings([f"{number}{unit}"], "mm")[0])
+
+
+def test_fast_path_bulk():
+    numbers = np.random.default_rng(0).uniform(0.0, 1000.0, 10000)
+    values = convert_strings([f"{v:.3f}mm" for v in numbers], "inch")
+    assert values == pytest.approx(np.round(numbers, 3) / 25.4)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 65536])
+def test_stream_csv_passes_header_through(chunk_size):
+    out = io.StringIO()
+    stream_csv(io.StringIO("id,len\na,25.4mm\nb,1inch\n"), out, 1, "inch", chunk_size=chunk_size, header=True)
+    assert out.getvalue().splitlines() == ["id,len", "a,1", "b,1"]
+
+
+def test_stream_csv_without_header_converts_first_row():
+    with pytest.raises(ValueError):
+        stream_csv(io.StringIO("id,len\na,25.4mm\n"), io.StringIO(), 1, "inch")
+    out = io.StringIO()
+    stream_csv(io.StringIO(""), out, 1, "inch", header=True)
+    assert out.getvalue() == ""
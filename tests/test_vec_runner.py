@@ -0,0 +1,41 @@
+# tests/test_vec_runner.py
+#
+# SharedMemoryVecEnv のテスト。
+#   - 環境ごとのランダム化とリズムの割り当ては、環境をいくつに分けても同じになる
+#   - ワーカーが（例外を送れずに）落ちたら、タイムアウトを待たずに例外になる
+
+import time
+
+import pytest
+import torch
+
+from surrogate import SurrogateEnv
+from vec_runner import SharedMemoryVecEnv
+
+NUM_ENVS = 12
+
+
+def test_split_envs_match_single_env():
+    whole = SurrogateEnv(NUM_ENVS, seed=5)
+    whole.reset()
+    bounds = [0, 5, 9, NUM_ENVS]
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        part = SurrogateEnv(hi - lo, seed=5, env_id_offset=lo)
+        part.reset()
+        for name, value in whole.randomizer.values.items():
+            assert torch.equal(part.randomizer.values[name], value[lo:hi]), name
+        assert torch.equal(part.rhythm.env_pattern, whole.rhythm.env_pattern[lo:hi])
+
+
+def test_dead_worker_fails_fast():
+    vec = SharedMemoryVecEnv(8, 2, pin_cores=False, timeout=60.0)
+    try:
+        vec.reset()
+        vec._procs[1].kill()
+        start = time.perf_counter()
+        with pytest.raises(RuntimeError, match="worker 1 exited"):
+            for _ in range(100):
+                vec.step(torch.zeros((8, 3)))
+        assert time.perf_counter() - start < 10.0
+    finally:
+        vec.close(force=True)
@@ -0,0 +1,255 @@
+# unit_engine.py
+#
+# 単位変換のエンジン。単位を登録する表と、"50mm" のような文字列を読む1つのパーサを持ち、
+#   - 1つの値の変換          convert(50, "mm", "inch")
+#   - NumPyでまとめて変換    convert_array(values, "mm", "inch")
+#   - 文字列をまとめて変換    convert_strings(["50mm", "2inch"], "mm")
+#   - 標準入力やCSVを少しずつ読みながら変換するCLI
+# を提供します。
+#
+# 使い方:
+#   python unit_engine.py --to mm < values.txt
+#   python unit_engine.py --to inch --column 2 data.csv > out.csv
+#   python unit_engine.py --to inch --column 1 --header data.csv > out.csv   # 1行目は見出し
+#   python unit_engine.py --bench 1000000
+
+import argparse
+import csv
+import io
+import re
+import string
+import sys
+import time
+from collections import namedtuple
+
+import numpy as np
+
+# --- 単位の登録表 ---
+# factor: 基準単位（長さならメートル）に直すときに掛ける値
+Unit = namedtuple("Unit", ["name", "dimension", "factor"])
+UNITS = {}
+
+
+def register_unit(name, dimension, factor, aliases=()):
+    """単位を登録する（長さ以外の次元も同じように追加できる）"""
+    unit = Unit(name, dimension, float(factor))
+    for key in (name, *aliases):
+        UNITS[key.lower()] = unit
+    return unit
+
+
+register_unit("mm", "length", 1.0e-3, aliases=("millimeter", "millimeters"))
+register_unit("cm", "length", 1.0e-2, aliases=("centimeter", "centimeters"))
+register_unit("m", "length", 1.0, aliases=("meter", "meters"))
+register_unit("km", "length", 1.0e3, aliases=("kilometer", "kilometers"))
+register_unit("um", "length", 1.0e-6, aliases=("µm", "micron", "microns"))
+register_unit("inch", "length", 0.0254, aliases=("in", "inches", '"'))
+register_unit("ft", "length", 0.3048, aliases=("feet", "foot", "'"))
+register_unit("yd", "length", 0.9144, aliases=("yard", "yards"))
+register_unit("mil", "length", 2.54e-5, aliases=("thou",))
+
+
+def get_unit(name):
+    try:
+        return UNITS[name.lower()]
+    except KeyError:
+        raise ValueError(f"エラー: 不明な単位です: '{name}'") from None
+
+
+# --- パーサ ---
+# 数値 + 空白(任意) + 単位(任意)。行頭・行末の空白は無視する
+_NUMBER = r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?"
+_QUANTITY_RE = re.compile(rf"^\s*({_NUMBER})\s*([^\s\d.+-]*)\s*$")
+_QUANTITY_LINE_RE = re.compile(rf"^[ \t]*({_NUMBER})[ \t]*([^\s\d.+-]*)[ \t]*$", re.MULTILINE)
+# 高速経路用: 数値の文字を消す表 / 単位の文字を空白にする表
+_DROP_NUMBER = str.maketrans("", "", string.digits + ".+-" + string.whitespace)
+_BLANK_UNIT = str.maketrans({c: " " for c in string.ascii_lowercase + "µ\"'"})
+
+
+def parse_quantity(text, default_unit=None):
+    """'50mm' や '2 inch' を (値, 単位名) に分ける"""
+    match = _QUANTITY_RE.match(text)
+    if match is None:
+        raise ValueError(f"エラー: 数値を正しく認識できませんでした: '{text}'")
+    unit = match.group(2) or default_unit
+    if not unit:
+        raise ValueError(f"エラー: 単位を指定してください: '{text}'")
+    return float(match.group(1)), get_unit(unit).name
+
+
+def _factor(from_unit, to_unit):
+    src, dst = get_unit(from_unit), get_unit(to_unit)
+    if src.dimension != dst.dimension:
+        raise ValueError(f"エラー: {src.name} と {dst.name} は変換できません")
+    return src.factor / dst.factor
+
+
+def convert(value, from_unit, to_unit):
+    """1つの値を変換する"""
+    return value * _factor(from_unit, to_unit)
+
+
+def convert_array(values, from_unit, to_unit, out=None):
+    """NumPy配列をまとめて変換する（out を渡せばその場で書き込む）"""
+    return np.multiply(values, _factor(from_unit, to_unit), out=out)
+
+
+def convert_strings(texts, to_unit, default_unit=None):
+    """'50mm' のような文字列のリストを、まとめて to_unit の値の配列に変換する"""
+    texts = list(texts)
+    if not texts:
+        return np.empty(0)
+    joined = "\n".join(texts).lower()
+
+    # --- 1. 高速経路: 全部同じ単位なら、文字列全体をまとめて処理する ---
+    # （1.5e3 のような指数表記や単位が混ざっていれば 2. に回す）
+    # 単位が全部の行の末尾にあること（"mm7" のような順番の逆転が無いこと）も確かめ、
+    # 確かめられなければ（行末に空白がある場合など）2. で1行ずつ読む
+    unit = texts[0].lower().translate(_DROP_NUMBER)
+    same_unit = joined.translate(_DROP_NUMBER) == unit * len(texts)
+    if same_unit and unit:
+        same_unit = joined.endswith(unit) and joined.count(unit + "\n") == len(texts) - 1
+    if same_unit:
+        numbers = joined.translate(_BLANK_UNIT).split()
+        if len(numbers) == len(texts):
+            try:
+                values = np.array(numbers, dtype=np.float64)
+            except ValueError:
+                values = None
+            if values is not None:
+                name = unit or default_unit
+                if not name:
+                    raise ValueError("エラー: 単位を指定してください")
+                return convert_array(values, name, to_unit, out=values)
+
+    # --- 2. 一般の経路: 正規表現で数値と単位に分け、単位ごとに係数を掛ける ---
+    matches = _QUANTITY_LINE_RE.findall(joined)
+    if len(matches) != len(texts):
+        # どこかに読めない行がある。1つずつ調べてエラーの場所を知らせる
+        for text in texts:
+            parse_quantity(text, default_unit)
+    numbers, units = zip(*matches)
+    values = np.array(numbers, dtype=np.float64)
+
+    factors = {}
+    for name in set(units):
+        if not (name or default_unit):
+            raise ValueError("エラー: 単位を指定してください")
+        factors[name] = _factor(name or default_unit, to_unit)
+    values *= np.array([factors[name] for name in units])
+    return values
+
+
+# --- ストリーミング変換（CLI） ---
+def stream_lines(lines, to_unit, default_unit=None, chunk_size=65536, precision=6):
+    """1行1値の入力を chunk_size 行ずつ変換して、出力する行を返すジェネレータ"""
+    chunk = []
+    for line in lines:
+        line = line.strip()
+        if line:
+            chunk.append(line)
+        if len(chunk) >= chunk_size:
+            yield from _format(convert_strings(chunk, to_unit, default_unit), precision)
+            chunk.clear()
+    if chunk:
+        yield from _format(convert_strings(chunk, to_unit, default_unit), precision)
+
+
+def stream_csv(f, out, column, to_unit, default_unit=None, chunk_size=65536, precision=6, header=False):
+    """CSVの指定した列だけを chunk_size 行ずつ変換して out に書き出す
+
+    header=True なら、1行目は見出しとして変換せずにそのまま書き出す。
+    """
+    reader = csv.reader(f)
+    writer = csv.writer(out)
+    if header:
+        first = next(reader, None)
+        if first is not None:
+            writer.writerow(first)
+    rows = []
+    for row in reader:
+        rows.append(row)
+        if len(rows) >= chunk_size:
+            _convert_rows(rows, column, to_unit, default_unit, precision)
+            writer.writerows(rows)
+            rows.clear()
+    if rows:
+        _convert_rows(rows, column, to_unit, default_unit, precision)
+        writer.writerows(rows)
+
+
+def _convert_rows(rows, column, to_unit, default_unit, precision):
+    values = convert_strings((row[column] for row in rows), to_unit, default_unit)
+    for row, text in zip(rows, _format(values, precision)):
+        row[column] = text
+
+
+def _format(values, precision):
+    return (f"{v:.{precision}g}" for v in values.tolist())
+
+
+# --- ベンチマーク ---
+def _per_value(text):
+    # これまでの unit_converter.py と同じ1値ずつの処理（比較用）
+    text = text.lower()
+    if text.endswith("mm"):
+        return float(text.replace("mm", "")) / 25.4
+    elif text.endswith("inch"):
+        return float(text.replace("inch", "")) * 25.4
+    raise ValueError(text)
+
+
+def benchmark(n):
+    """1値ずつの処理と、まとめて変換する処理の values/sec を比べる"""
+    rng = np.random.default_rng(0)
+    numbers = rng.uniform(0.0, 1000.0, n)
+    texts = [f"{v:.3f}mm" for v in numbers]
+
+    t0 = time.perf_counter()
+    for text in texts:
+        _per_value(text)
+    per_value = n / (time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    convert_strings(texts, "inch")
+    strings = n / (time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    convert_array(numbers, "mm", "inch")
+    array = n / (time.perf_counter() - t0)
+
+    print(f"values      : {n}")
+    print(f"per-value   : {per_value:14.0f} values/s")
+    print(f"strings     : {strings:14.0f} values/s  (x{strings / per_value:.1f})")
+    print(f"numpy array : {array:14.0f} values/s  (x{array / per_value:.1f})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Streaming bulk unit converter.")
+    parser.add_argument("files", nargs="*", help="Input files (default: stdin).")
+    parser.add_argument("--to", dest="to_unit", default="mm", help="Target unit.")
+    parser.add_argument("--from", dest="from_unit", default=None, help="Unit for values without a unit.")
+    parser.add_argument("--column", type=int, default=None, help="Treat input as CSV and convert this column.")
+    parser.add_argument("--header", action="store_true", help="Pass the first CSV row through unconverted.")
+    parser.add_argument("--chunk-size", type=int, default=65536)
+    parser.add_argument("--precision", type=int, default=6, help="Significant digits of the output.")
+    parser.add_argument("--bench", type=int, default=None, metavar="N", help="Run the benchmark with N values.")
+    args = parser.parse_args(argv)
+
+    if args.bench:
+        benchmark(args.bench)
+        return
+
+    sources = [open(path, newline="", encoding="utf-8") for path in args.files] or [sys.stdin]
+    for f in sources:
+        with f:
+            if args.column is None:
+                for line in stream_lines(f, args.to_unit, args.from_unit, args.chunk_size, args.precision):
+                    sys.stdout.write(line + "\n")
+            else:
+                stream_csv(f, sys.stdout, args.column, args.to_unit, args.from_unit,
+                           args.chunk_size, args.precision, header=args.header)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+# vec_runner.py
+#
+# CPUだけのマシンで SurrogateEnv をプロセスに分けて並列に動かすランナー。
+# 環境をワーカープロセスごとに分担し、アクション・観測・報酬・終了フラグは
+# 共有メモリ上のテンソルでやりとりする（ステップごとのpickleは無し）。
+# ワーカーはバリアで足並みをそろえ、それぞれ1つのCPUコアに固定します。
+# ランダム化は全体での環境IDで決まるので、ワーカー数を変えても環境ごとの値は同じです。
+# ワーカーが落ちたら（終了コードで）見張りのスレッドがすぐにバリアを壊し、親プロセスが例外を投げます。
+#
+# 使い方（スケーリングのベンチマーク）:
+#   python vec_runner.py --num_envs 8192 --workers 1 2 4 8 --steps 200
+
+import argparse
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+import traceback
+
+import torch
+
+from normalizer import ObservationNormalizer
+from surrogate import SurrogateEnv
+
+# ワーカーへの命令
+CMD_CLOSE, CMD_STEP, CMD_RESET = 0, 1, 2
+OBS_DIM, ACTION_DIM = 5, 3
+WATCHDOG_INTERVAL = 0.2  # ワーカーの終了を確かめる間隔 [s]
+
+
+def _worker(rank, env_slice, bufs, cmd, start_barrier, done_barrier, errors, env_kwargs, core):
+    """1つのワーカープロセス。担当する環境の範囲だけを動かす"""
+    try:
+        if core is not None and hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, {core})
+        torch.set_num_threads(1)
+
+        lo, hi = env_slice
+        env = SurrogateEnv(hi - lo, device="cpu", env_id_offset=lo, **env_kwargs)
+        env.obs_normalizer.freeze()  # 統計は親プロセスの正規化器で更新する
+        actions = bufs["actions"][lo:hi]
+        obs, reward = bufs["obs"][lo:hi], bufs["reward"][lo:hi]
+        terminated, truncated = bufs["terminated"][lo:hi], bufs["truncated"][lo:hi]
+
+        while True:
+            start_barrier.wait()
+            if cmd.value == CMD_CLOSE:
+                break
+            if cmd.value == CMD_RESET:
+                out, _ = env.reset()
+            else:
+                out, r, term, trunc, _ = env.step(actions)
+                reward.copy_(r)
+                terminated.copy_(term)
+                truncated.copy_(trunc)
+            # 正規化は親プロセスで全環境まとめて行うので、ここでは生の観測を渡す
+            obs.copy_(env.obs_buf)
+            done_barrier.wait()
+    except threading.BrokenBarrierError:
+        # 他のワーカーが落ちてバリアが壊れた。自分は静かに終わる
+        pass
+    except Exception:
+        errors.put((rank, traceback.format_exc()))
+        start_barrier.abort()
+        done_barrier.abort()
+
+
+class SharedMemoryVecEnv:
+    """SurrogateEnv を num_workers 個のプロセスに分けて、まとめて step() するクラス"""
+
+    def __init__(self, num_envs, num_workers, env_kwargs=None, seed=0, pin_cores=True, timeout=60.0):
+        self.num_envs = num_envs
+        self.num_workers = num_workers
+        self.timeout = timeout
+        env_kwargs = dict(env_kwargs or {})
+
+        # --- 1. 共有メモリ上のバッファ ---
+        self.bufs = {
+            "actions": torch.zeros((num_envs, ACTION_DIM)).share_memory_(),
+            "obs": torch.zeros((num_envs, OBS_DIM)).share_memory_(),
+            "reward": torch.zeros(num_envs).share_memory_(),
+            "terminated": torch.zeros(num_envs, dtype=torch.bool).share_memory_(),
+            "truncated": torch.zeros(num_envs, dtype=torch.bool).share_memory_(),
+        }
+
+        # --- 2. ワーカーを起動（環境はできるだけ均等に分ける） ---
+        ctx = mp.get_context("spawn")
+        self._cmd = ctx.Value("i", CMD_STEP, lock=False)
+        self._start = ctx.Barrier(num_workers + 1)
+        self._done = ctx.Barrier(num_workers + 1)
+        self._errors = ctx.Queue()
+        bounds = [num_envs * i // num_workers for i in range(num_workers + 1)]
+        cores = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else []
+        self._procs = []
+        for rank in range(num_workers):
+            core = cores[rank % len(cores)] if pin_cores and cores else None
+            p = ctx.Process(
+                target=_worker,
+                args=(rank, (bounds[rank], bounds[rank + 1]), self.bufs, self._cmd,
+                      self._start, self._done, self._errors, dict(env_kwargs, seed=seed), core),
+                daemon=True,
+            )
+            p.start()
+            self._procs.append(p)
+        self._closed = False
+        # 例外を送れずに落ちたワーカー（セグフォルト・kill など）を見つけるための見張り
+        self._watchdog = threading.Thread(target=self._watch, daemon=True)
+        self._watchdog.start()
+        # 観測の統計はワーカーごとではなく、全環境をまとめて1つ持つ
+        self.obs_normalizer = ObservationNormalizer(OBS_DIM, num_envs, device="cpu")
+
+    def _run(self, cmd):
+        """全ワーカーに命令を出し、終わるまで待つ"""
+        self._cmd.value = cmd
+        try:
+            self._start.wait(self.timeout)
+            if cmd != CMD_CLOSE:
+                self._done.wait(self.timeout)
+        except threading.BrokenBarrierError:
+            self._fail()
+
+    def _watch(self):
+        """ワーカーが終了していたらバリアを壊し、待っている親プロセスを起こす"""
+        while not self._closed:
+            if any(p.exitcode is not None for p in self._procs):
+                if not self._closed:
+                    self._start.abort()
+                    self._done.abort()
+                return
+            time.sleep(WATCHDOG_INTERVAL)
+
+    def _fail(self):
+        """ワーカーが落ちたときに、原因を集めて全体を止める"""
+        messages = []
+        while True:
+            try:
+                rank, tb = self._errors.get(timeout=1.0)
+            except queue.Empty:
+                break
+            messages.append(f"worker {rank}:\n{tb}")
+        for rank, p in enumerate(self._procs):
+            if p.exitcode not in (None, 0):
+                messages.append(f"worker {rank} exited with code {p.exitcode}")
+        self.close(force=True)
+        raise RuntimeError("A worker process failed.\n" + ("\n".join(messages) or "(timeout)"))
+
+    def reset(self):
+        self._run(CMD_RESET)
+        return {"policy": self.obs_normalizer(self.bufs["obs"])}, {}
+
+    def step(self, actions):
+        self.bufs["actions"].copy_(actions)
+        self._run(CMD_STEP)
+        b = self.bufs
+        return {"policy": self.obs_normalizer(b["obs"])}, b["reward"], b["terminated"], b["truncated"], {}
+
+    def close(self, force=False):
+        if self._closed:
+            return
+        self._closed = True
+        if not force:
+            try:
+                self._run(CMD_CLOSE)
+            except RuntimeError:
+                pass
+        for p in self._procs:
+            p.join(timeout=1.0 if not force else 0.1)
+            if p.is_alive():
+                p.terminate()
+
+
+def benchmark(num_envs, workers_list, steps, warmup=10):
+    """ワーカー数ごとの env-steps/s と、1ワーカーに対する倍率を表示する"""
+    actions = torch.rand((num_envs, ACTION_DIM)) * 2.0 - 1.0
+    base = None
+    for num_workers in workers_list:
+        vec = SharedMemoryVecEnv(num_envs, num_workers)
+        try:
+            vec.reset()
+            for _ in range(warmup):
+                vec.step(actions)
+            start = time.perf_counter()
+            for _ in range(steps):
+                vec.step(actions)
+            rate = num_envs * steps / (time.perf_counter() - start)
+        finally:
+            vec.close()
+        base = base or rate
+        print(f"workers={num_workers:3d} | {rate:12.0f} env-steps/s | x{rate / base:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scaling benchmark of the shared-memory vectorized runner.")
+    parser.add_argument("--num_envs", type=int, default=8192)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument("--steps", type=int, default=200)
+    args = parser.parse_args()
+    benchmark(args.num_envs, sorted(set(args.workers)), args.steps)
+
+
+if __name__ == "__main__":
+    main()